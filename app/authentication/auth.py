@@ -5,6 +5,7 @@ from notifications_utils import request_helper
 from sqlalchemy.exc import DataError
 from sqlalchemy.orm.exc import NoResultFound
 
+from app.authentication.service_cache import get_authenticated_service, remember_api_key
 from app.dao.services_dao import dao_fetch_service_by_id_with_api_keys
 
 
@@ -68,21 +69,23 @@ def requires_auth():
     client = __get_token_issuer(auth_token)
 
     try:
-        service = dao_fetch_service_by_id_with_api_keys(client)
+        authenticated_service = get_authenticated_service(client, dao_fetch_service_by_id_with_api_keys)
     except DataError:
         raise AuthError("Invalid token: service id is not the right data type", 403)
     except NoResultFound:
         raise AuthError("Invalid token: service not found", 403)
 
+    service = authenticated_service.service
+
     if not service.api_keys:
         raise AuthError("Invalid token: service has no API keys", 403, service_id=service.id)
 
     if not service.active:
         raise AuthError("Invalid token: service is archived", 403, service_id=service.id)
 
-    for api_key in service.api_keys:
+    for api_key in authenticated_service.api_keys():
         try:
-            decode_jwt_token(auth_token, api_key.secret)
+            decode_jwt_token(auth_token, authenticated_service.secret(api_key))
         except TokenDecodeError:
             continue
         except TokenExpiredError:
@@ -94,6 +97,7 @@ def requires_auth():
         if api_key.expiry_date:
             raise AuthError("Invalid token: API key revoked", 403, service_id=service.id, api_key_id=api_key.id)
 
+        remember_api_key(client, authenticated_service, api_key)
         g.service_id = api_key.service_id
         _request_ctx_stack.top.authenticated_service = service
         _request_ctx_stack.top.api_user = api_key
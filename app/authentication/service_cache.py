@@ -0,0 +1,61 @@
+from cachelib import SimpleCache
+from flask import current_app
+
+from app import db
+
+
+# per-worker cache of the service (with api keys and permissions) used to authenticate api requests, keyed by
+# service id. SimpleCache pickles values, so every hit hands back a fresh copy that can be merged into the session.
+service_cache = SimpleCache(threshold=1000)
+
+
+class AuthenticatedService:
+    def __init__(self, service):
+        self.service = service
+        self.api_key_secrets = {api_key.id: api_key.secret for api_key in service.api_keys}
+        self.last_used_api_key_id = None
+
+    def api_keys(self):
+        """
+        Returns the service's api keys, trying the key that last authenticated a request first.
+        """
+        return sorted(self.service.api_keys, key=lambda api_key: api_key.id != self.last_used_api_key_id)
+
+    def secret(self, api_key):
+        return self.api_key_secrets[api_key.id]
+
+
+def get_authenticated_service(service_id, fetch_service):
+    if not current_app.config['AUTH_SERVICE_CACHE_ENABLED']:
+        return AuthenticatedService(fetch_service(service_id))
+
+    authenticated_service = service_cache.get(str(service_id))
+    if authenticated_service is None:
+        authenticated_service = AuthenticatedService(fetch_service(service_id))
+        _set(service_id, authenticated_service)
+    else:
+        # attach the cached copy to this request's session without going back to the database
+        authenticated_service.service = db.session.merge(authenticated_service.service, load=False)
+
+    return authenticated_service
+
+
+def remember_api_key(service_id, authenticated_service, api_key):
+    if authenticated_service.last_used_api_key_id == api_key.id:
+        return
+
+    authenticated_service.last_used_api_key_id = api_key.id
+    if current_app.config['AUTH_SERVICE_CACHE_ENABLED']:
+        _set(service_id, authenticated_service)
+
+
+def invalidate_service_cache(service_id):
+    service_cache.delete(str(service_id))
+
+
+def _set(service_id, authenticated_service):
+    service_cache.set(
+        str(service_id),
+        authenticated_service,
+        timeout=current_app.config['AUTH_SERVICE_CACHE_TTL']
+    )
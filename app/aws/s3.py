@@ -1,3 +1,4 @@
+import codecs
 from datetime import datetime, timedelta
 
 from flask import current_app
@@ -42,6 +43,31 @@ def get_job_from_s3(service_id, job_id):
     return obj.get()['Body'].read().decode('utf-8')
 
 
+def stream_job_from_s3(service_id, job_id, chunk_size=1024 * 1024):
+    """
+    Yield the lines of a job's CSV file (including their line endings), fetching the S3 object in ranged
+    chunks of `chunk_size` bytes instead of reading the whole body into memory.
+    """
+    obj = get_s3_object(*get_job_location(service_id, job_id))
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    start = 0
+    while start < obj.content_length:
+        end = min(start + chunk_size, obj.content_length) - 1
+        body = obj.get(Range='bytes={}-{}'.format(start, end))['Body'].read()
+        start = end + 1
+
+        # a chunk can end part way through a line (or a multi-byte character), so carry the remainder over
+        lines = (pending + decoder.decode(body)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
 def get_job_metadata_from_s3(service_id, job_id):
     obj = get_s3_object(*get_job_location(service_id, job_id))
     return obj.get()['Metadata']
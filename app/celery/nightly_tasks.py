@@ -6,30 +6,34 @@ from datetime import (
 import pytz
 from flask import current_app
 from notifications_utils.statsd_decorators import statsd
+from notifications_utils.timezones import convert_utc_to_local_timezone
 from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 
 from app import notify_celery, performance_platform_client, zendesk_client
 from app.aws import s3
 from app.celery.service_callback_tasks import (
-    send_delivery_status_to_service,
+    queue_delivery_status_callbacks,
     create_delivery_status_callback_data,
 )
-from app.config import QueueNames
 from app.dao.inbound_sms_dao import delete_inbound_sms_older_than_retention
 from app.dao.jobs_dao import (
     dao_get_jobs_older_than_data_retention,
     dao_archive_job
 )
 from app.dao.notifications_dao import (
-    dao_timeout_notifications,
+    dao_create_notification_partitions,
+    dao_drop_notification_partitions_older_than,
+    dao_timeout_notifications_in_chunks,
     delete_notifications_older_than_retention_by_type,
+    notifications_are_expired_by_partition,
 )
 from app.dao.service_callback_api_dao import get_service_delivery_status_callback_api_for_service
 from app.exceptions import NotificationTechnicalFailureException
 from app.models import (
     Notification,
     NOTIFICATION_SENDING,
+    NOTIFICATION_TECHNICAL_FAILURE,
     EMAIL_TYPE,
     SMS_TYPE,
     LETTER_TYPE,
@@ -122,28 +126,63 @@ def delete_letter_notifications_older_than_retention():
         raise
 
 
+@notify_celery.task(name="manage-notification-partitions")
+@statsd(namespace="tasks")
+def manage_notification_partitions():
+    if not notifications_are_expired_by_partition():
+        return
+
+    try:
+        created = dao_create_notification_partitions(
+            datetime.utcnow().date(), current_app.config['NOTIFICATION_PARTITIONS_AHEAD']
+        )
+        seven_days_ago = get_local_timezone_midnight_in_utc(
+            convert_utc_to_local_timezone(datetime.utcnow()).date()) - timedelta(days=7)
+        dropped = dao_drop_notification_partitions_older_than(seven_days_ago)
+        current_app.logger.info(
+            "Created notification partitions {} and dropped notification partitions {}".format(created, dropped)
+        )
+    except SQLAlchemyError:
+        current_app.logger.exception("Failed to manage notification partitions")
+        raise
+
+
 @notify_celery.task(name='timeout-sending-notifications')
 @cronitor('timeout-sending-notifications')
 @statsd(namespace="tasks")
 def timeout_notifications():
-    technical_failure_notifications, temporary_failure_notifications = \
-        dao_timeout_notifications(current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD'))
-
-    notifications = technical_failure_notifications + temporary_failure_notifications
-    for notification in notifications:
-        # queue callback task only if the service_callback_api exists
-        service_callback_api = get_service_delivery_status_callback_api_for_service(service_id=notification.service_id)
-        if service_callback_api:
-            encrypted_notification = create_delivery_status_callback_data(notification, service_callback_api)
-            send_delivery_status_to_service.apply_async([str(notification.id), encrypted_notification],
-                                                        queue=QueueNames.CALLBACKS)
+    callback_apis = {}
+    timed_out_count = 0
+    technical_failure_ids = []
+    for notifications in dao_timeout_notifications_in_chunks(
+        current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD'),
+        current_app.config['TIMEOUT_NOTIFICATIONS_CHUNK_SIZE']
+    ):
+        timed_out_count += len(notifications)
+        technical_failure_ids += [
+            str(notification.id) for notification in notifications
+            if notification.status == NOTIFICATION_TECHNICAL_FAILURE
+        ]
+
+        notification_callbacks = []
+        for notification in notifications:
+            # queue callback task only if the service_callback_api exists
+            if notification.service_id not in callback_apis:
+                callback_apis[notification.service_id] = get_service_delivery_status_callback_api_for_service(
+                    service_id=notification.service_id
+                )
+            service_callback_api = callback_apis[notification.service_id]
+            if service_callback_api:
+                encrypted_notification = create_delivery_status_callback_data(notification, service_callback_api)
+                notification_callbacks.append((notification.id, encrypted_notification))
+        queue_delivery_status_callbacks(notification_callbacks)
 
     current_app.logger.info(
-        "Timeout period reached for {} notifications, status has been updated.".format(len(notifications)))
-    if technical_failure_notifications:
+        "Timeout period reached for {} notifications, status has been updated.".format(timed_out_count))
+    if technical_failure_ids:
         message = "{} notifications have been updated to technical-failure because they " \
                   "have timed out and are still in created.Notification ids: {}".format(
-                      len(technical_failure_notifications), [str(x.id) for x in technical_failure_notifications])
+                      len(technical_failure_ids), technical_failure_ids)
         raise NotificationTechnicalFailureException(message)
 
 
@@ -13,13 +13,15 @@ from notifications_utils.statsd_decorators import statsd
 from sqlalchemy.orm.exc import NoResultFound
 import enum
 import requests
-from app import notify_celery, statsd_client
+from app import notify_celery, redis_store, statsd_client
 from app.config import QueueNames
 from app.clients.email.aws_ses import get_aws_responses
 from app.dao import notifications_dao, services_dao, templates_dao
-from app.models import NOTIFICATION_SENDING, NOTIFICATION_PENDING, EMAIL_TYPE, KEY_TYPE_NORMAL
+from app.dao.service_callback_api_dao import get_service_delivery_status_callback_api_for_service
+from app.models import EMAIL_TYPE, KEY_TYPE_NORMAL
 from json import decoder
 from app.notifications import process_notifications
+from app.celery.service_callback_tasks import create_delivery_status_callback_data, queue_delivery_status_callbacks
 from app.notifications.notifications_ses_callback import (
     determine_notification_bounce_type,
     handle_complaint,
@@ -61,6 +63,8 @@ def verify_message_type(message_type: str):
 
 certificate_cache = SimpleCache()
 
+SES_RECEIPTS_BUFFER_KEY = 'ses-receipts'
+
 
 def get_certificate(url):
     res = certificate_cache.get(url)
@@ -107,13 +111,24 @@ def sns_callback_handler():
             result="success", message="SES-SNS auto-confirm callback succeeded"
         ), 200
 
-    process_ses_results.apply_async([{"Message": message.get("Message")}], queue=QueueNames.NOTIFY)
+    queue_ses_result(message.get("Message"))
 
     return jsonify(
         result="success", message="SES-SNS callback succeeded"
     ), 200
 
 
+def queue_ses_result(message):
+    if current_app.config['SES_RECEIPT_BATCHING_ENABLED'] and redis_store.active:
+        try:
+            redis_store.redis_store.rpush(SES_RECEIPTS_BUFFER_KEY, message)
+            return
+        except Exception:
+            current_app.logger.exception('Failed to buffer SES receipt, queueing it on its own')
+
+    process_ses_results.apply_async([{"Message": message}], queue=QueueNames.NOTIFY)
+
+
 @ses_smtp_callback_blueprint.route('/notifications/email/ses-smtp', methods=['POST'])
 def sns_smtp_callback_handler():
     message_type = request.headers.get('x-amz-sns-message-type')
@@ -170,23 +185,24 @@ def process_ses_results(self, response):
         notification_status = aws_response_dict['notification_status']
         reference = ses_message['mail']['messageId']
 
-        try:
-            notification = notifications_dao.dao_get_notification_by_reference(reference)
-        except NoResultFound:
-            message_time = iso8601.parse_date(ses_message['mail']['timestamp']).replace(tzinfo=None)
-            if datetime.utcnow() - message_time < timedelta(minutes=5):
-                self.retry(queue=QueueNames.RETRY)
-            else:
-                current_app.logger.warning(
-                    "notification not found for reference: {} (update to {})".format(reference, notification_status)
-                )
-            return
+        updated = notifications_dao.dao_update_notification_statuses_by_references({reference: notification_status})
+        if not updated:
+            try:
+                notification = notifications_dao.dao_get_notification_by_reference(reference)
+            except NoResultFound:
+                message_time = iso8601.parse_date(ses_message['mail']['timestamp']).replace(tzinfo=None)
+                if datetime.utcnow() - message_time < timedelta(minutes=5):
+                    self.retry(queue=QueueNames.RETRY)
+                else:
+                    current_app.logger.warning(
+                        "notification not found for reference: {} (update to {})".format(reference, notification_status)
+                    )
+                return
 
-        if notification.status not in {NOTIFICATION_SENDING, NOTIFICATION_PENDING}:
             notifications_dao._duplicate_update_warning(notification, notification_status)
             return
 
-        notifications_dao._update_notification_status(notification=notification, status=notification_status)
+        notification = updated[0]
 
         if not aws_response_dict['success']:
             current_app.logger.info(
@@ -216,6 +232,123 @@ def process_ses_results(self, response):
         self.retry(queue=QueueNames.RETRY)
 
 
+@notify_celery.task(name="process-buffered-ses-results")
+@statsd(namespace="tasks")
+def process_buffered_ses_results():
+    if not redis_store.active:
+        return
+
+    batch_size = current_app.config['SES_RECEIPT_BATCH_SIZE']
+    for _ in range(current_app.config['SES_RECEIPT_MAX_BATCHES_PER_RUN']):
+        pipeline = redis_store.redis_store.pipeline()
+        pipeline.lrange(SES_RECEIPTS_BUFFER_KEY, 0, batch_size - 1)
+        pipeline.ltrim(SES_RECEIPTS_BUFFER_KEY, batch_size, -1)
+        messages, _ = pipeline.execute()
+        if not messages:
+            return
+
+        process_ses_results_batch.apply_async(
+            [[{"Message": m.decode('utf-8') if isinstance(m, bytes) else m} for m in messages]],
+            queue=QueueNames.NOTIFY
+        )
+
+
+@notify_celery.task(bind=True, name="process-ses-results-batch", max_retries=5, default_retry_delay=300)
+@statsd(namespace="tasks")
+def process_ses_results_batch(self, responses):
+    """
+    Processes many SES delivery receipts at once: one UPDATE to move the notifications to their new statuses and
+    one callback api lookup per service. Complaints, and receipts that arrive before their notification has a
+    reference, are handed to process_ses_results one at a time.
+    """
+    try:
+        receipts = {}
+        for response in responses:
+            ses_message = json.loads(response['Message'])
+            notification_type = ses_message['notificationType']
+
+            if notification_type == 'Bounce':
+                notification_type = determine_notification_bounce_type(notification_type, ses_message)
+            elif notification_type == 'Complaint':
+                process_ses_results.apply_async([response], queue=QueueNames.NOTIFY)
+                continue
+
+            receipts[ses_message['mail']['messageId']] = (response, ses_message, get_aws_responses(notification_type))
+
+        updated_notifications = notifications_dao.dao_update_notification_statuses_by_references({
+            reference: aws_response_dict['notification_status']
+            for reference, (_, _, aws_response_dict) in receipts.items()
+        })
+        updated_at = datetime.utcnow()
+        for notification in updated_notifications:
+            statsd_client.incr('callback.ses.{}'.format(notification.status))
+            if notification.sent_at:
+                statsd_client.timing_with_dates('callback.ses.elapsed-time', updated_at, notification.sent_at)
+
+        # only the receipts that didn't move their notification on need looking at again
+        updated_references = {notification.reference for notification in updated_notifications}
+        other_references = [reference for reference in receipts if reference not in updated_references]
+        other_notifications = (
+            notifications_dao.dao_get_notifications_by_references(other_references) if other_references else []
+        )
+        for notification in other_notifications:
+            _, _, aws_response_dict = receipts[notification.reference]
+            notifications_dao._duplicate_update_warning(notification, aws_response_dict['notification_status'])
+
+        _retry_missing_ses_results(
+            receipts,
+            updated_references | {notification.reference for notification in other_notifications}
+        )
+
+        current_app.logger.info('SES callback batch updated {} of {} notifications'.format(
+            len(updated_notifications), len(responses)
+        ))
+
+        _queue_callback_tasks(updated_notifications)
+
+        return True
+
+    except Retry:
+        raise
+
+    except Exception as e:
+        current_app.logger.exception('Error processing SES results batch: {}'.format(type(e)))
+        self.retry(queue=QueueNames.RETRY)
+
+
+def _retry_missing_ses_results(receipts, found_references):
+    for reference, (response, ses_message, aws_response_dict) in receipts.items():
+        if reference in found_references:
+            continue
+        message_time = iso8601.parse_date(ses_message['mail']['timestamp']).replace(tzinfo=None)
+        if datetime.utcnow() - message_time < timedelta(minutes=5):
+            process_ses_results.apply_async(
+                [response],
+                queue=QueueNames.RETRY,
+                countdown=process_ses_results.default_retry_delay
+            )
+        else:
+            current_app.logger.warning("notification not found for reference: {} (update to {})".format(
+                reference, aws_response_dict['notification_status']
+            ))
+
+
+def _queue_callback_tasks(notifications):
+    callback_apis = {}
+    notification_callbacks = []
+    for notification in notifications:
+        if notification.service_id not in callback_apis:
+            callback_apis[notification.service_id] = get_service_delivery_status_callback_api_for_service(
+                service_id=notification.service_id
+            )
+        service_callback_api = callback_apis[notification.service_id]
+        if service_callback_api:
+            notification_callbacks.append(
+                (notification.id, create_delivery_status_callback_data(notification, service_callback_api))
+            )
+    queue_delivery_status_callbacks(notification_callbacks)
+
+
 @notify_celery.task(bind=True, name="process-ses-smtp-results", max_retries=5, default_retry_delay=300)
 @statsd(namespace="tasks")
 def process_ses_smtp_results(self, response):
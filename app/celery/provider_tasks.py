@@ -8,20 +8,21 @@ from app.config import QueueNames
 from app.dao import notifications_dao
 from app.dao.notifications_dao import update_notification_status_by_id
 from app.delivery import send_to_providers
+from app.delivery.snapshots import DeliverySnapshot
 from app.exceptions import NotificationTechnicalFailureException, MalwarePendingException
 from app.models import NOTIFICATION_TECHNICAL_FAILURE
 
 
 @notify_celery.task(bind=True, name="deliver_sms", max_retries=48, default_retry_delay=300)
 @statsd(namespace="tasks")
-def deliver_sms(self, notification_id):
+def deliver_sms(self, notification_id, delivery_snapshot=None):
+    notification = None
     try:
         current_app.logger.info("Start sending SMS for notification id: {}".format(notification_id))
-        notification = notifications_dao.get_notification_by_id(notification_id)
-        if not notification:
-            raise NoResultFound()
+        notification = _notification_to_deliver(self, notification_id, delivery_snapshot)
         send_to_providers.send_sms_to_provider(notification)
     except Exception:
+        _release_claim(notification)
         try:
             current_app.logger.exception(
                 "SMS notification delivery for id: {} failed".format(notification_id)
@@ -39,12 +40,11 @@ def deliver_sms(self, notification_id):
 
 @notify_celery.task(bind=True, name="deliver_email", max_retries=48, default_retry_delay=300)
 @statsd(namespace="tasks")
-def deliver_email(self, notification_id):
+def deliver_email(self, notification_id, delivery_snapshot=None):
+    notification = None
     try:
         current_app.logger.info("Start sending email for notification id: {}".format(notification_id))
-        notification = notifications_dao.get_notification_by_id(notification_id)
-        if not notification:
-            raise NoResultFound()
+        notification = _notification_to_deliver(self, notification_id, delivery_snapshot)
         send_to_providers.send_email_to_provider(notification)
     except InvalidEmailError as e:
         current_app.logger.exception(e)
@@ -52,8 +52,10 @@ def deliver_email(self, notification_id):
     except MalwarePendingException:
         current_app.logger.info(
             "RETRY: Email notification {} is pending malware scans".format(notification_id))
+        _release_claim(notification)
         self.retry(queue=QueueNames.RETRY, countdown=60)
     except Exception:
+        _release_claim(notification)
         try:
             current_app.logger.exception(
                 "RETRY: Email notification {} failed".format(notification_id)
@@ -65,3 +67,28 @@ def deliver_email(self, notification_id):
                       "Notification has been updated to technical-failure".format(notification_id)
             update_notification_status_by_id(notification_id, NOTIFICATION_TECHNICAL_FAILURE)
             raise NotificationTechnicalFailureException(message)
+
+
+def _notification_to_deliver(task, notification_id, delivery_snapshot):
+    # the snapshot is only trusted on the first attempt: a retry may follow a send that got further than it looks,
+    # so it checks the notification's current status in the database
+    if delivery_snapshot and task.request.retries == 0:
+        # a snapshot is always created, so claim the notification in case this message was delivered twice, or was
+        # queued again by replay_created_notifications, and it has already been sent
+        snapshot = DeliverySnapshot(delivery_snapshot)
+        if snapshot.claim():
+            return snapshot
+
+    notification = notifications_dao.get_notification_by_id(notification_id)
+    if not notification:
+        raise NoResultFound()
+    return notification
+
+
+def _release_claim(notification):
+    if not isinstance(notification, DeliverySnapshot):
+        return
+    try:
+        notification.release()
+    except Exception:
+        current_app.logger.exception("Failed to release the claim on notification {}".format(notification.id))
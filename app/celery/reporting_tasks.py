@@ -9,9 +9,9 @@ from app.config import QueueNames
 from app.cronitor import cronitor
 from app.dao.fact_billing_dao import (
     fetch_billing_data_for_day,
-    update_fact_billing
+    update_fact_billing_for_day
 )
-from app.dao.fact_notification_status_dao import fetch_notification_status_for_day, update_fact_notification_status
+from app.dao.fact_notification_status_dao import rebuild_fact_notification_status_for_day
 
 
 @notify_celery.task(name="create-nightly-billing")
@@ -48,12 +48,11 @@ def create_nightly_billing_for_day(process_day):
         (end - start).seconds)
     )
 
-    for data in transit_data:
-        update_fact_billing(data, process_day)
+    updated_rows = update_fact_billing_for_day(transit_data, process_day)
 
     current_app.logger.info(
         "create-nightly-billing-for-day task complete. {} rows updated for day: {}".format(
-            len(transit_data),
+            updated_rows,
             process_day
         )
     )
@@ -85,17 +84,11 @@ def create_nightly_notification_status_for_day(process_day):
     process_day = datetime.strptime(process_day, "%Y-%m-%d").date()
 
     start = datetime.utcnow()
-    transit_data = fetch_notification_status_for_day(process_day=process_day)
+    updated_rows = rebuild_fact_notification_status_for_day(process_day)
     end = datetime.utcnow()
-    current_app.logger.info('create-nightly-notification-status-for-day {} fetched in {} seconds'.format(
-        process_day,
-        (end - start).seconds)
-    )
-
-    update_fact_notification_status(transit_data, process_day)
 
     current_app.logger.info(
-        "create-nightly-notification-status-for-day task complete: {} rows updated for day: {}".format(
-            len(transit_data), process_day
+        "create-nightly-notification-status-for-day task complete: {} rows updated for day: {} in {} seconds".format(
+            updated_rows, process_day, (end - start).seconds
         )
     )
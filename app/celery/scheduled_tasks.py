@@ -11,14 +11,16 @@ from sqlalchemy.exc import SQLAlchemyError
 from app import notify_celery, zendesk_client
 from app.celery.tasks import process_job
 from app.config import QueueNames, TaskNames
+from app.dao.fact_notification_status_dao import fetch_notification_status_counts_for_day
 from app.dao.invited_org_user_dao import delete_org_invitations_created_more_than_two_days_ago
 from app.dao.invited_user_dao import delete_invitations_created_more_than_two_days_ago
 from app.dao.jobs_dao import dao_set_scheduled_jobs_to_pending
 from app.dao.jobs_dao import dao_update_job
 from app.dao.notifications_dao import (
+    count_undelivered_notifications_for_provider,
     is_delivery_slow_for_provider,
-    dao_get_scheduled_notifications,
-    set_scheduled_notification_to_processed,
+    dao_claim_scheduled_notifications,
+    dao_set_scheduled_notifications_to_pending,
     notifications_not_yet_sent,
     dao_precompiled_letters_still_pending_virus_check,
     dao_old_letters_with_created_status,
@@ -27,6 +29,7 @@ from app.dao.provider_details_dao import (
     get_current_provider,
     dao_toggle_sms_provider
 )
+from app.dao.services_dao import dao_fetch_all_service_ids, fetch_todays_total_message_counts_by_service
 from app.dao.users_dao import delete_codes_older_created_more_than_a_day_ago
 from app.models import (
     Job,
@@ -35,7 +38,10 @@ from app.models import (
     SMS_TYPE,
     EMAIL_TYPE,
 )
+from app.notifications import delivery_latency
 from app.notifications.process_notifications import send_notification_to_queue
+from app.notifications.sending_limits import set_daily_limit_counts
+from app.notifications.todays_stats import local_day, set_todays_stats, todays_stats_enabled
 from app.v2.errors import JobIncompleteError
 
 
@@ -43,9 +49,14 @@ from app.v2.errors import JobIncompleteError
 @statsd(namespace="tasks")
 def run_scheduled_jobs():
     try:
-        for job in dao_set_scheduled_jobs_to_pending():
-            process_job.apply_async([str(job.id)], queue=QueueNames.JOBS)
-            current_app.logger.info("Job ID {} added to process job queue".format(job.id))
+        batch_size = current_app.config['SCHEDULED_DISPATCH_BATCH_SIZE']
+        for _ in range(current_app.config['SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN']):
+            jobs = dao_set_scheduled_jobs_to_pending(limit=batch_size)
+            for job in jobs:
+                process_job.apply_async([str(job.id)], queue=QueueNames.JOBS)
+                current_app.logger.info("Job ID {} added to process job queue".format(job.id))
+            if len(jobs) < batch_size:
+                break
     except SQLAlchemyError:
         current_app.logger.exception("Failed to run scheduled jobs")
         raise
@@ -55,12 +66,24 @@ def run_scheduled_jobs():
 @statsd(namespace="tasks")
 def send_scheduled_notifications():
     try:
-        scheduled_notifications = dao_get_scheduled_notifications()
-        for notification in scheduled_notifications:
-            send_notification_to_queue(notification, notification.service.research_mode)
-            set_scheduled_notification_to_processed(notification.id)
-        current_app.logger.info(
-            "Sent {} scheduled notifications to the provider queue".format(len(scheduled_notifications)))
+        batch_size = current_app.config['SCHEDULED_DISPATCH_BATCH_SIZE']
+        sent = 0
+        for _ in range(current_app.config['SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN']):
+            scheduled_notifications = dao_claim_scheduled_notifications(batch_size)
+            for index, notification in enumerate(scheduled_notifications):
+                try:
+                    send_notification_to_queue(notification, notification.service.research_mode)
+                except Exception:
+                    # this notification and the rest of the batch were claimed but not queued, so leave them to be
+                    # sent by the next run
+                    dao_set_scheduled_notifications_to_pending(
+                        [unsent.id for unsent in scheduled_notifications[index:]]
+                    )
+                    raise
+            sent += len(scheduled_notifications)
+            if len(scheduled_notifications) < batch_size:
+                break
+        current_app.logger.info("Sent {} scheduled notifications to the provider queue".format(sent))
     except SQLAlchemyError:
         current_app.logger.exception("Failed to send scheduled notifications")
         raise
@@ -106,12 +129,27 @@ def switch_current_sms_provider_on_slow_delivery():
     if current_provider.updated_at > datetime.utcnow() - timedelta(minutes=10):
         current_app.logger.info("Slow delivery notifications provider switched less than 10 minutes ago.")
         return
-    slow_delivery_notifications = is_delivery_slow_for_provider(
-        provider=current_provider.identifier,
-        threshold=0.3,
-        created_at=datetime.utcnow() - timedelta(minutes=10),
-        delivery_time=timedelta(minutes=4),
-    )
+    if delivery_latency.delivery_latency_histograms_enabled():
+        undelivered, slow_undelivered = count_undelivered_notifications_for_provider(
+            created_at=datetime.utcnow() - timedelta(minutes=10),
+            provider=current_provider.identifier,
+            delivery_time=timedelta(minutes=4),
+        )
+        slow_delivery_notifications = delivery_latency.is_delivery_slow(
+            provider=current_provider.identifier,
+            threshold=0.3,
+            delivery_time=timedelta(minutes=4),
+            minutes=10,
+            undelivered=undelivered,
+            slow_undelivered=slow_undelivered,
+        )
+    else:
+        slow_delivery_notifications = is_delivery_slow_for_provider(
+            provider=current_provider.identifier,
+            threshold=0.3,
+            created_at=datetime.utcnow() - timedelta(minutes=10),
+            delivery_time=timedelta(minutes=4),
+        )
 
     if slow_delivery_notifications:
         current_app.logger.warning(
@@ -182,6 +220,37 @@ def replay_created_notifications():
             send_notification_to_queue(notification=n, research_mode=n.service.research_mode)
 
 
+@notify_celery.task(name='reconcile-daily-limit-counts')
+@statsd(namespace="tasks")
+def reconcile_daily_limit_counts():
+    """
+    Correct the daily message counts in Redis from the database, so the sending limits can be checked without
+    going to the database on the request path.
+    """
+    if not current_app.config['ATOMIC_SENDING_LIMITS_ENABLED'] or not current_app.config['REDIS_ENABLED']:
+        return
+
+    counts = fetch_todays_total_message_counts_by_service()
+    set_daily_limit_counts(counts)
+    current_app.logger.info("Reconciled daily limit counts for {} services".format(len(counts)))
+
+
+@notify_celery.task(name='reconcile-todays-stats')
+@statsd(namespace="tasks")
+def reconcile_todays_stats():
+    """
+    Correct any drift in the statistics for today that are counted in Redis as notifications are created and
+    change status.
+    """
+    if not todays_stats_enabled():
+        return
+
+    today = local_day(datetime.utcnow())
+    rows = fetch_notification_status_counts_for_day(today)
+    set_todays_stats(today, rows, service_ids=dao_fetch_all_service_ids())
+    current_app.logger.info("Reconciled todays statistics from {} rows".format(len(rows)))
+
+
 @notify_celery.task(name='check-precompiled-letter-state')
 @statsd(namespace="tasks")
 def check_precompiled_letter_state():
@@ -1,10 +1,13 @@
 import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import monotonic
 
 from flask import current_app
 from notifications_utils.statsd_decorators import statsd
 from requests import (
     HTTPError,
-    request,
     RequestException
 )
 
@@ -12,7 +15,10 @@ from app import (
     notify_celery,
     encryption
 )
+from app.clients.http_session import http_session
 from app.config import QueueNames
+from app.dao.service_permissions_dao import dao_fetch_service_permissions
+from app.models import BATCHED_CALLBACKS
 
 
 @notify_celery.task(bind=True, name="send-delivery-status", max_retries=5, default_retry_delay=300)
@@ -22,16 +28,7 @@ def send_delivery_status_to_service(
 ):
     status_update = encryption.decrypt(encrypted_status_update)
 
-    data = {
-        "id": str(notification_id),
-        "reference": status_update['notification_client_reference'],
-        "to": status_update['notification_to'],
-        "status": status_update['notification_status'],
-        "created_at": status_update['notification_created_at'],
-        "completed_at": status_update['notification_updated_at'],
-        "sent_at": status_update['notification_sent_at'],
-        "notification_type": status_update['notification_type']
-    }
+    data = _delivery_status_data(str(notification_id), status_update)
     _send_data_to_service_callback_api(
         self,
         data,
@@ -41,6 +38,57 @@ def send_delivery_status_to_service(
     )
 
 
+@notify_celery.task(name="send-delivery-status-batch")
+@statsd(namespace="tasks")
+def send_delivery_statuses_to_service(encrypted_status_updates):
+    """
+    Sends a batch of delivery status updates to their services' callback urls concurrently.
+
+    Updates are grouped by callback url. Each url gets at most CALLBACK_MAX_CONCURRENCY_PER_DESTINATION requests
+    in flight per worker, and a url that keeps failing is skipped until its circuit breaker resets. Services with
+    the batched_callbacks permission receive their updates as a json list instead of one request per update.
+    Updates that could not be delivered are handed back to send_delivery_status_to_service to be retried.
+    """
+    status_updates = [encryption.decrypt(status_update) for status_update in encrypted_status_updates]
+
+    updates_by_destination = defaultdict(list)
+    for status_update in status_updates:
+        updates_by_destination[
+            (status_update['service_callback_api_url'], status_update['service_callback_api_bearer_token'])
+        ].append(status_update)
+
+    requests_to_send = []
+    for (url, token), updates in updates_by_destination.items():
+        destination = _callback_destination(url)
+        if destination.circuit_breaker.is_open():
+            current_app.logger.warning(
+                "send_delivery_statuses_to_service circuit open for url: {}, requeueing {} updates".format(
+                    url, len(updates)
+                )
+            )
+            _retry_delivery_statuses(updates, countdown=current_app.config['CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS'])
+            continue
+
+        if _accepts_batched_callbacks(updates):
+            batch_size = current_app.config['CALLBACK_BATCH_SIZE']
+            requests_to_send.extend(
+                (destination, token, updates[i:i + batch_size], True) for i in range(0, len(updates), batch_size)
+            )
+        else:
+            requests_to_send.extend((destination, token, [update], False) for update in updates)
+
+    logger = current_app.logger
+    with ThreadPoolExecutor(max_workers=current_app.config['CALLBACK_DISPATCHER_THREADS']) as executor:
+        results = [
+            (updates, executor.submit(_post_delivery_statuses, destination, token, updates, batched, logger))
+            for destination, token, updates, batched in requests_to_send
+        ]
+
+    failed_updates = [update for updates, result in results if not result.result() for update in updates]
+    if failed_updates:
+        _retry_delivery_statuses(failed_updates)
+
+
 @notify_celery.task(bind=True, name="send-complaint", max_retries=5, default_retry_delay=300)
 @statsd(namespace="tasks")
 def send_complaint_to_service(self, complaint_data):
@@ -66,15 +114,14 @@ def send_complaint_to_service(self, complaint_data):
 def _send_data_to_service_callback_api(self, data, service_callback_url, token, function_name):
     notification_id = (data["notification_id"] if "notification_id" in data else data["id"])
     try:
-        response = request(
+        response = http_session.request(
             method="POST",
             url=service_callback_url,
             data=json.dumps(data),
             headers={
                 'Content-Type': 'application/json',
                 'Authorization': 'Bearer {}'.format(token)
-            },
-            timeout=60
+            }
         )
         current_app.logger.info('{} sending {} to {}, response {}'.format(
             function_name,
@@ -105,6 +152,148 @@ def _send_data_to_service_callback_api(self, data, service_callback_url, token,
                 )
 
 
+def queue_delivery_status_callbacks(notification_callbacks):
+    """
+    Queues (notification_id, encrypted_status_update) pairs on the callbacks queue, in batches for the
+    dispatcher when it's enabled.
+    """
+    if not current_app.config['CALLBACK_DISPATCHER_ENABLED']:
+        for notification_id, encrypted_status_update in notification_callbacks:
+            send_delivery_status_to_service.apply_async(
+                [str(notification_id), encrypted_status_update],
+                queue=QueueNames.CALLBACKS
+            )
+        return
+
+    batch_size = current_app.config['CALLBACK_BATCH_SIZE']
+    encrypted_status_updates = [encrypted_status_update for _, encrypted_status_update in notification_callbacks]
+    for i in range(0, len(encrypted_status_updates), batch_size):
+        send_delivery_statuses_to_service.apply_async(
+            [encrypted_status_updates[i:i + batch_size]],
+            queue=QueueNames.CALLBACKS
+        )
+
+
+def _delivery_status_data(notification_id, status_update):
+    return {
+        "id": notification_id,
+        "reference": status_update['notification_client_reference'],
+        "to": status_update['notification_to'],
+        "status": status_update['notification_status'],
+        "created_at": status_update['notification_created_at'],
+        "completed_at": status_update['notification_updated_at'],
+        "sent_at": status_update['notification_sent_at'],
+        "notification_type": status_update['notification_type']
+    }
+
+
+def _accepts_batched_callbacks(status_updates):
+    service_id = status_updates[0].get('service_id')
+    if service_id is None or len(status_updates) == 1:
+        return False
+    return BATCHED_CALLBACKS in [p.permission for p in dao_fetch_service_permissions(service_id)]
+
+
+def _post_delivery_statuses(destination, token, status_updates, batched, logger):
+    """
+    Runs on a dispatcher thread without an app context, so it only uses what it's given and the process-wide
+    http session. Returns False if the updates should be retried.
+    """
+    data = [_delivery_status_data(update['notification_id'], update) for update in status_updates]
+
+    with destination.semaphore:
+        try:
+            response = http_session.request(
+                method="POST",
+                url=destination.url,
+                data=json.dumps(data if batched else data[0]),
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': 'Bearer {}'.format(token)
+                }
+            )
+            response.raise_for_status()
+        except RequestException as e:
+            logger.warning(
+                "send_delivery_statuses_to_service request failed for {} updates and url: {}. exc: {}".format(
+                    len(status_updates),
+                    destination.url,
+                    e
+                )
+            )
+            if not isinstance(e, HTTPError) or e.response.status_code >= 500:
+                destination.circuit_breaker.record_failure()
+                return False
+
+    destination.circuit_breaker.record_success()
+    return True
+
+
+def _retry_delivery_statuses(status_updates, countdown=None):
+    if countdown is None:
+        countdown = send_delivery_status_to_service.default_retry_delay
+    for status_update in status_updates:
+        send_delivery_status_to_service.apply_async(
+            [status_update['notification_id'], encryption.encrypt(status_update)],
+            queue=QueueNames.RETRY,
+            countdown=countdown
+        )
+
+
+class CircuitBreaker:
+    """
+    Opens after CALLBACK_CIRCUIT_BREAKER_THRESHOLD consecutive failures to a callback url and stays open for
+    CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS. After that one more failure opens it again.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = Lock()
+
+    def is_open(self):
+        return self.opened_at is not None and monotonic() - self.opened_at < self.reset_seconds
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+
+class CallbackDestination:
+    def __init__(self, url, max_concurrency, circuit_breaker):
+        self.url = url
+        self.semaphore = BoundedSemaphore(max_concurrency)
+        self.circuit_breaker = circuit_breaker
+
+
+# per worker process state for each callback url, shared between dispatcher threads
+_callback_destinations = {}
+_callback_destinations_lock = Lock()
+
+
+def _callback_destination(url):
+    with _callback_destinations_lock:
+        if url not in _callback_destinations:
+            _callback_destinations[url] = CallbackDestination(
+                url,
+                current_app.config['CALLBACK_MAX_CONCURRENCY_PER_DESTINATION'],
+                CircuitBreaker(
+                    current_app.config['CALLBACK_CIRCUIT_BREAKER_THRESHOLD'],
+                    current_app.config['CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS']
+                )
+            )
+        return _callback_destinations[url]
+
+
 def create_delivery_status_callback_data(notification, service_callback_api):
     from app import DATETIME_FORMAT, encryption
     data = {
@@ -117,6 +306,7 @@ def create_delivery_status_callback_data(notification, service_callback_api):
             notification.updated_at.strftime(DATETIME_FORMAT) if notification.updated_at else None,
         "notification_sent_at": notification.sent_at.strftime(DATETIME_FORMAT) if notification.sent_at else None,
         "notification_type": notification.notification_type,
+        "service_id": str(notification.service_id),
         "service_callback_api_url": service_callback_api.url,
         "service_callback_api_bearer_token": service_callback_api.bearer_token,
     }
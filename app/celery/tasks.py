@@ -1,3 +1,4 @@
+import csv
 import json
 from datetime import datetime
 from collections import namedtuple, defaultdict
@@ -14,7 +15,6 @@ from notifications_utils.template import (
 from notifications_utils.timezones import convert_utc_to_local_timezone
 from requests import (
     HTTPError,
-    request,
     RequestException
 )
 from sqlalchemy.exc import SQLAlchemyError
@@ -28,6 +28,7 @@ from app import (
 )
 from app.aws import s3
 from app.celery import provider_tasks, letters_pdf_tasks, research_mode_tasks
+from app.clients.http_session import http_session
 from app.config import QueueNames
 from app.dao.daily_sorted_letter_dao import dao_create_or_update_daily_sorted_letter
 from app.dao.inbound_sms_dao import dao_get_inbound_sms_by_id
@@ -67,7 +68,13 @@ from app.models import (
     SMS_TYPE,
     DailySortedLetter,
 )
-from app.notifications.process_notifications import persist_notification
+from app.notifications.process_notifications import (
+    delivery_task_args,
+    persist_notification,
+    persist_notifications_bulk
+)
+from app.notifications.fair_queuing import send_queue, send_queues
+from app.notifications.sending_limits import consume_sending_allowance, OVER_DAILY_LIMIT
 from app.service.utils import service_allowed_to_send_to
 
 
@@ -103,12 +110,8 @@ def process_job(job_id, sender_id=None):
 
     current_app.logger.debug("Starting job {} processing {} notifications".format(job_id, job.notification_count))
 
-    for row in RecipientCSV(
-            s3.get_job_from_s3(str(service.id), str(job_id)),
-            template_type=template.template_type,
-            placeholders=template.placeholders
-    ).get_rows():
-        process_row(row, template, job, service, sender_id=sender_id)
+    rows = get_job_rows(job, template)
+    process_rows(rows, template, job, service, sender_id=sender_id)
 
     job_complete(job, start=start)
 
@@ -130,6 +133,83 @@ def job_complete(job, resumed=False, start=None):
         )
 
 
+def get_job_rows(job, template, start_row=0):
+    """
+    Yield the rows of a job's CSV file.
+
+    With JOB_CSV_STREAMING_ENABLED the file is streamed from S3 and parsed a few rows at a time, so large files
+    are never held in memory as a whole. Rows before `start_row` are only split into CSV records, not parsed.
+    Without it `start_row` is ignored and callers should skip rows they have already processed themselves.
+    """
+    if not current_app.config['JOB_CSV_STREAMING_ENABLED']:
+        yield from RecipientCSV(
+            s3.get_job_from_s3(str(job.service_id), str(job.id)),
+            template_type=template.template_type,
+            placeholders=template.placeholders
+        ).get_rows()
+        return
+
+    records = _csv_records(s3.stream_job_from_s3(str(job.service_id), str(job.id)))
+    header = next((record for record in records if record.strip()), None)
+    if header is None:
+        return
+
+    chunk_size = current_app.config['JOB_CSV_STREAMING_ROWS']
+    chunk_start = start_row
+    chunk = []
+    for index, record in enumerate(records):
+        if index < start_row:
+            continue
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield from _parse_csv_records(header, chunk, chunk_start, template)
+            chunk_start = index + 1
+            chunk = []
+    if chunk:
+        yield from _parse_csv_records(header, chunk, chunk_start, template)
+
+
+def _csv_records(lines):
+    # group lines into the raw text of each CSV record, so a quoted value containing a newline stays in one record
+    buffered_lines = []
+
+    def buffer_lines():
+        for line in lines:
+            buffered_lines.append(line)
+            yield line
+
+    for _ in csv.reader(buffer_lines(), quoting=csv.QUOTE_MINIMAL, skipinitialspace=True):
+        yield ''.join(buffered_lines)
+        buffered_lines.clear()
+
+
+def _parse_csv_records(header, records, first_index, template):
+    for row in RecipientCSV(
+            header + ''.join(records),
+            template_type=template.template_type,
+            placeholders=template.placeholders
+    ).get_rows():
+        # RecipientCSV numbers rows from 0, so shift them back to their position in the whole file
+        row.index += first_index
+        yield row
+
+
+def process_rows(rows, template, job, service, sender_id=None):
+    if current_app.config['BATCH_JOB_PROCESSING_ENABLED'] and template.template_type in (SMS_TYPE, EMAIL_TYPE):
+        batch_size = current_app.config['JOB_BATCH_SIZE']
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                process_row_batch(batch, template, job, service, sender_id=sender_id)
+                batch = []
+        if batch:
+            process_row_batch(batch, template, job, service, sender_id=sender_id)
+    else:
+        for row in rows:
+            process_row(row, template, job, service, sender_id=sender_id)
+
+
 def process_row(row, template, job, service, sender_id=None):
     template_type = template.template_type
     encrypted = encryption.encrypt({
@@ -138,7 +218,8 @@ def process_row(row, template, job, service, sender_id=None):
         'job': str(job.id),
         'to': row.recipient,
         'row_number': row.index,
-        'personalisation': dict(row.personalisation)
+        'personalisation': dict(row.personalisation),
+        'created_at': datetime.utcnow().strftime(DATETIME_FORMAT)
     })
 
     send_fns = {
@@ -164,10 +245,57 @@ def process_row(row, template, job, service, sender_id=None):
     )
 
 
+def process_row_batch(rows, template, job, service, sender_id=None):
+    template_type = template.template_type
+    encrypted = encryption.encrypt({
+        'template': str(template.id),
+        'template_version': job.template_version,
+        'job': str(job.id),
+        'created_at': datetime.utcnow().strftime(DATETIME_FORMAT),
+        'rows': [
+            {
+                'id': create_uuid(),
+                'to': row.recipient,
+                'row_number': row.index,
+                'personalisation': dict(row.personalisation)
+            }
+            for row in rows
+        ]
+    })
+
+    send_fns = {
+        SMS_TYPE: save_sms_batch,
+        EMAIL_TYPE: save_email_batch
+    }
+
+    send_fn = send_fns[template_type]
+
+    task_kwargs = {}
+    if sender_id:
+        task_kwargs['sender_id'] = sender_id
+
+    send_fn.apply_async(
+        (
+            str(service.id),
+            encrypted,
+        ),
+        task_kwargs,
+        queue=QueueNames.DATABASE if not service.research_mode else QueueNames.RESEARCH_MODE
+    )
+
+
 def __sending_limits_for_job_exceeded(service, job, job_id):
-    total_sent = fetch_todays_total_message_count(service.id)
+    if current_app.config['ATOMIC_SENDING_LIMITS_ENABLED'] and current_app.config['REDIS_ENABLED']:
+        # reserve the whole job against the daily limit in one go, so jobs started together can't overshoot it
+        result, _ = consume_sending_allowance(
+            service, KEY_TYPE_NORMAL, notification_count=job.notification_count, check_rate_limit=False
+        )
+        limits_exceeded = result == OVER_DAILY_LIMIT
+    else:
+        total_sent = fetch_todays_total_message_count(service.id)
+        limits_exceeded = total_sent + job.notification_count > service.message_limit
 
-    if total_sent + job.notification_count > service.message_limit:
+    if limits_exceeded:
         job.job_status = 'sending limits exceeded'
         job.processing_finished = datetime.utcnow()
         dao_update_job(job)
@@ -211,7 +339,7 @@ def save_sms(self,
             notification_type=SMS_TYPE,
             api_key_id=None,
             key_type=KEY_TYPE_NORMAL,
-            created_at=datetime.utcnow(),
+            created_at=created_at_of(notification),
             job_id=notification.get('job', None),
             job_row_number=notification.get('row_number', None),
             notification_id=notification_id,
@@ -219,8 +347,8 @@ def save_sms(self,
         )
 
         provider_tasks.deliver_sms.apply_async(
-            [str(saved_notification.id)],
-            queue=QueueNames.SEND_SMS if not service.research_mode else QueueNames.RESEARCH_MODE
+            delivery_task_args(saved_notification, service),
+            queue=send_queue(saved_notification, service) if not service.research_mode else QueueNames.RESEARCH_MODE
         )
 
         current_app.logger.debug(
@@ -265,7 +393,7 @@ def save_email(self,
             notification_type=EMAIL_TYPE,
             api_key_id=None,
             key_type=KEY_TYPE_NORMAL,
-            created_at=datetime.utcnow(),
+            created_at=created_at_of(notification),
             job_id=notification.get('job', None),
             job_row_number=notification.get('row_number', None),
             notification_id=notification_id,
@@ -273,8 +401,8 @@ def save_email(self,
         )
 
         provider_tasks.deliver_email.apply_async(
-            [str(saved_notification.id)],
-            queue=QueueNames.SEND_EMAIL if not service.research_mode else QueueNames.RESEARCH_MODE
+            delivery_task_args(saved_notification, service),
+            queue=send_queue(saved_notification, service) if not service.research_mode else QueueNames.RESEARCH_MODE
         )
 
         current_app.logger.debug("Email {} created at {}".format(saved_notification.id, saved_notification.created_at))
@@ -282,6 +410,84 @@ def save_email(self,
         handle_exception(self, notification, notification_id, e)
 
 
+@notify_celery.task(bind=True, name="save-sms-batch", max_retries=5, default_retry_delay=300)
+@statsd(namespace="tasks")
+def save_sms_batch(self, service_id, encrypted_batch, sender_id=None):
+    batch = encryption.decrypt(encrypted_batch)
+    service = dao_fetch_service_by_id(service_id)
+    template = dao_get_template_by_id(batch['template'], version=batch['template_version'])
+
+    if sender_id:
+        reply_to_text = dao_get_service_sms_senders_by_id(service_id, sender_id).sms_sender
+    else:
+        reply_to_text = template.get_reply_to_text()
+
+    save_notification_batch(self, batch, service, SMS_TYPE, reply_to_text)
+
+
+@notify_celery.task(bind=True, name="save-email-batch", max_retries=5, default_retry_delay=300)
+@statsd(namespace="tasks")
+def save_email_batch(self, service_id, encrypted_batch, sender_id=None):
+    batch = encryption.decrypt(encrypted_batch)
+    service = dao_fetch_service_by_id(service_id)
+    template = dao_get_template_by_id(batch['template'], version=batch['template_version'])
+
+    if sender_id:
+        reply_to_text = dao_get_reply_to_by_id(service_id, sender_id).email_address
+    else:
+        reply_to_text = template.get_reply_to_text()
+
+    save_notification_batch(self, batch, service, EMAIL_TYPE, reply_to_text)
+
+
+def save_notification_batch(task, batch, service, notification_type, reply_to_text):
+    created_at = created_at_of(batch)
+    notifications = []
+    for row in batch['rows']:
+        if not service_allowed_to_send_to(row['to'], service, KEY_TYPE_NORMAL):
+            current_app.logger.debug(
+                "{} {} failed as restricted service".format(notification_type, row['id'])
+            )
+            continue
+
+        notifications.append(dict(
+            template_id=batch['template'],
+            template_version=batch['template_version'],
+            recipient=row['to'],
+            service=service,
+            personalisation=row.get('personalisation'),
+            notification_type=notification_type,
+            api_key_id=None,
+            key_type=KEY_TYPE_NORMAL,
+            created_at=created_at,
+            job_id=batch['job'],
+            job_row_number=row['row_number'],
+            notification_id=row['id'],
+            reply_to_text=reply_to_text
+        ))
+
+    try:
+        # notifications that already exist were created, and queued, by an earlier delivery of this batch
+        saved_notifications = persist_notifications_bulk(notifications)
+    except SQLAlchemyError as e:
+        handle_batch_exception(task, batch, e)
+        return
+
+    deliver_task = provider_tasks.deliver_sms if notification_type == SMS_TYPE else provider_tasks.deliver_email
+    if service.research_mode:
+        queues = [QueueNames.RESEARCH_MODE] * len(saved_notifications)
+    else:
+        queues = send_queues(notification_type, service, len(saved_notifications))
+
+    for saved_notification, queue in zip(saved_notifications, queues):
+        deliver_task.apply_async(delivery_task_args(saved_notification, service), queue=queue)
+
+    current_app.logger.info(
+        "{} batch of {} notifications created at {} for job {}".format(
+            notification_type, len(saved_notifications), created_at, batch['job'])
+    )
+
+
 @notify_celery.task(bind=True, name="save-letter", max_retries=5, default_retry_delay=300)
 @statsd(namespace="tasks")
 def save_letter(
@@ -312,7 +518,7 @@ def save_letter(
             notification_type=LETTER_TYPE,
             api_key_id=None,
             key_type=KEY_TYPE_NORMAL,
-            created_at=datetime.utcnow(),
+            created_at=created_at_of(notification),
             job_id=notification['job'],
             job_row_number=notification['row_number'],
             notification_id=notification_id,
@@ -394,6 +600,32 @@ def handle_exception(task, notification, notification_id, exc):
             current_app.logger.error('Max retry failed' + retry_msg)
 
 
+def created_at_of(message):
+    """
+    When the notifications in a job row or batch message were created, so that they keep the same created_at, and
+    primary key on a partitioned notifications table, if SQS delivers the message twice.
+    """
+    if 'created_at' not in message:
+        # queued before messages carried their created_at
+        return datetime.utcnow()
+    return datetime.strptime(message['created_at'], DATETIME_FORMAT)
+
+
+def handle_batch_exception(task, batch, exc):
+    retry_msg = '{task} batch of {count} notifications for job {job} starting at row number {row}'.format(
+        task=task.__name__,
+        count=len(batch['rows']),
+        job=batch['job'],
+        row=batch['rows'][0]['row_number'] if batch['rows'] else None
+    )
+    # Batches are inserted with ON CONFLICT DO NOTHING, so it is safe to retry a batch that was partly saved.
+    current_app.logger.exception('Retry' + retry_msg)
+    try:
+        task.retry(queue=QueueNames.RETRY, exc=exc)
+    except task.MaxRetriesExceededError:
+        current_app.logger.error('Max retry failed' + retry_msg)
+
+
 def get_template_class(template_type):
     if template_type == SMS_TYPE:
         return SMSMessageTemplate
@@ -527,15 +759,14 @@ def send_inbound_sms_to_service(self, inbound_sms_id, service_id):
     }
 
     try:
-        response = request(
+        response = http_session.request(
             method="POST",
             url=inbound_api.url,
             data=json.dumps(data),
             headers={
                 'Content-Type': 'application/json',
                 'Authorization': 'Bearer {}'.format(inbound_api.bearer_token)
-            },
-            timeout=60
+            }
         )
         current_app.logger.debug('send_inbound_sms_to_service sending {} to {}, response {}'.format(
             inbound_sms_id,
@@ -598,13 +829,8 @@ def process_incomplete_job(job_id):
     TemplateClass = get_template_class(db_template.template_type)
     template = TemplateClass(db_template.__dict__)
 
-    for row in RecipientCSV(
-            s3.get_job_from_s3(str(job.service_id), str(job.id)),
-            template_type=template.template_type,
-            placeholders=template.placeholders
-    ).get_rows():
-        if row.index > resume_from_row:
-            process_row(row, template, job, job.service)
+    rows = get_job_rows(job, template, start_row=resume_from_row + 1)
+    process_rows((row for row in rows if row.index > resume_from_row), template, job, job.service)
 
     job_complete(job, resumed=True)
 
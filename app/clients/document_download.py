@@ -4,6 +4,8 @@ import requests
 
 from flask import current_app
 
+from app.clients.http_session import http_session
+
 
 class DocumentDownloadError(Exception):
     def __init__(self, message, status_code):
@@ -33,7 +35,7 @@ class DocumentDownloadClient:
 
     def upload_document(self, service_id, file_contents):
         try:
-            response = requests.post(
+            response = http_session.post(
                 self.get_upload_url(service_id),
                 headers={
                     'Authorization': "Bearer {}".format(self.auth_token),
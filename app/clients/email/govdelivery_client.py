@@ -1,11 +1,11 @@
 from time import monotonic
 
-import requests
 from flask import current_app
 from notifications_utils.recipients import InvalidEmailError
 from requests import HTTPError
 
 from app.clients.email import EmailClient, EmailClientException
+from app.clients.http_session import http_session
 
 govdelivery_status_map = {
     'sending': 'sending',
@@ -69,7 +69,7 @@ class GovdeliveryClient(EmailClient):
             }
 
             start_time = monotonic()
-            response = requests.post(
+            response = http_session.post(
                 self.govdelivery_url,
                 json=payload,
                 headers={
@@ -0,0 +1,76 @@
+import os
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    '''
+    Records whether each request reused a pooled connection or had to open a new one.
+    '''
+
+    def __init__(self, statsd_client=None, *args, **kwargs):
+        self.statsd_client = statsd_client
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        pool = self.get_connection(request.url, kwargs.get('proxies'))
+        connections_before = pool.num_connections
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            if self.statsd_client:
+                if pool.num_connections > connections_before:
+                    self.statsd_client.incr("clients.http-pool.miss")
+                else:
+                    self.statsd_client.incr("clients.http-pool.hit")
+
+
+class HTTPSession:
+    '''
+    Keep-alive session shared by the outbound http clients of a process.
+    '''
+
+    def __init__(self):
+        self.statsd_client = None
+        self.pool_connections = 10
+        self.pool_maxsize = 10
+        self.timeout = (5, 60)
+        self._session = None
+        self._pid = None
+
+    def init_app(self, app, statsd_client):
+        self.statsd_client = statsd_client
+        self.pool_connections = app.config['HTTP_POOL_CONNECTIONS']
+        self.pool_maxsize = app.config['HTTP_POOL_MAXSIZE']
+        self.timeout = (app.config['HTTP_CONNECT_TIMEOUT'], app.config['HTTP_READ_TIMEOUT'])
+        self._session = None
+
+    @property
+    def session(self):
+        # open sockets must not be shared with forked worker processes, so each process builds its own session
+        if self._session is None or self._pid != os.getpid():
+            self._session = self._create_session()
+            self._pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        session = Session()
+        adapter = PooledHTTPAdapter(
+            statsd_client=self.statsd_client,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+http_session = HTTPSession()
@@ -2,10 +2,11 @@ import base64
 import json
 
 from flask import current_app
-import requests
 
 from notifications_utils.timezones import convert_utc_to_local_timezone
 
+from app.clients.http_session import http_session
+
 
 class PerformancePlatformClient:
 
@@ -26,7 +27,7 @@ class PerformancePlatformClient:
                 'Content-Type': "application/json",
                 'Authorization': 'Bearer {}'.format(bearer_token)
             }
-            resp = requests.post(
+            resp = http_session.post(
                 self.performance_platform_url + payload['dataType'],
                 json=payload,
                 headers=headers
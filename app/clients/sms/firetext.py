@@ -2,8 +2,9 @@ import json
 import logging
 
 from time import monotonic
-from requests import request, RequestException
+from requests import RequestException
 
+from app.clients.http_session import http_session
 from app.clients.sms import (SmsClient, SmsClientResponseException)
 
 logger = logging.getLogger(__name__)
@@ -82,11 +83,10 @@ class FiretextClient(SmsClient):
 
         start_time = monotonic()
         try:
-            response = request(
+            response = http_session.request(
                 "POST",
                 self.url,
-                data=data,
-                timeout=60
+                data=data
             )
             response.raise_for_status()
             try:
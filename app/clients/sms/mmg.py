@@ -1,6 +1,7 @@
 import json
 from time import monotonic
-from requests import (request, RequestException)
+from requests import RequestException
+from app.clients.http_session import http_session
 from app.clients.sms import (SmsClient, SmsClientResponseException)
 
 mmg_response_map = {
@@ -73,15 +74,14 @@ class MMGClient(SmsClient):
 
         start_time = monotonic()
         try:
-            response = request(
+            response = http_session.request(
                 "POST",
                 self.mmg_url,
                 data=json.dumps(data),
                 headers={
                     'Content-Type': 'application/json',
                     'Authorization': 'Basic {}'.format(self.api_key)
-                },
-                timeout=60
+                }
             )
 
             response.raise_for_status()
@@ -26,7 +26,12 @@ from app.dao.fact_billing_dao import (
     delete_billing_data_for_service_for_day,
     fetch_billing_data_for_day,
     get_service_ids_that_need_billing_populated,
-    update_fact_billing,
+    update_fact_billing_for_day,
+)
+from app.dao.notifications_dao import (
+    dao_create_notification_partitions,
+    dao_partition_notifications_table,
+    is_notifications_table_partitioned,
 )
 from app.dao.organisation_dao import dao_get_organisation_by_email_address, dao_add_service_to_organisation
 
@@ -461,10 +466,8 @@ def rebuild_ft_billing_for_day(service_id, day):
             process_day
         ))
         transit_data = fetch_billing_data_for_day(process_day=process_day, service_id=service)
-        # transit_data = every row that should exist
-        for data in transit_data:
-            # upsert existing rows
-            update_fact_billing(data, process_day)
+        # transit_data = every row that should exist, upsert them all at once
+        update_fact_billing_for_day(transit_data, process_day)
         current_app.logger.info('added/updated {} billing rows for {} on {}'.format(
             len(transit_data),
             service,
@@ -899,3 +902,20 @@ def fix_billable_units():
         )
     db.session.commit()
     print("End fix_billable_units")
+
+
+@notify_command(name='partition-notifications-table')
+@click.option('-d', '--days-ahead', required=False, default=3, type=int,
+              help="How many days of partitions to create after today")
+def partition_notifications_table(days_ahead):
+    """
+    Partition the notifications table by the day notifications were created, so that the
+    manage-notification-partitions task can expire them by dropping whole days
+    """
+    if is_notifications_table_partitioned():
+        print("notifications is already partitioned")
+        return
+
+    dao_partition_notifications_table()
+    created = dao_create_notification_partitions(datetime.utcnow().date() + timedelta(days=1), days_ahead)
+    print("Partitioned notifications, created partitions {}".format(created))
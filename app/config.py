@@ -24,6 +24,8 @@ class QueueNames(object):
     DATABASE = 'database-tasks'
     SEND_SMS = 'send-sms-tasks'
     SEND_EMAIL = 'send-email-tasks'
+    BULK_SMS = 'bulk-sms-tasks'
+    BULK_EMAIL = 'bulk-email-tasks'
     RESEARCH_MODE = 'research-mode-tasks'
     REPORTING = 'reporting-tasks'
     JOBS = 'job-tasks'
@@ -43,6 +45,8 @@ class QueueNames(object):
             QueueNames.DATABASE,
             QueueNames.SEND_SMS,
             QueueNames.SEND_EMAIL,
+            QueueNames.BULK_SMS,
+            QueueNames.BULK_EMAIL,
             QueueNames.RESEARCH_MODE,
             QueueNames.REPORTING,
             QueueNames.JOBS,
@@ -153,9 +157,44 @@ class Config(object):
     SQLALCHEMY_STATEMENT_TIMEOUT = 1200
     PAGE_SIZE = 50
     API_PAGE_SIZE = 250
+    BULK_NOTIFICATIONS_MAX_RECIPIENTS = int(os.getenv('BULK_NOTIFICATIONS_MAX_RECIPIENTS', 1000))
+    AUTH_SERVICE_CACHE_TTL = int(os.getenv('AUTH_SERVICE_CACHE_TTL', 30))
+    PROVIDER_CACHE_TTL = int(os.getenv('PROVIDER_CACHE_TTL', 10))
+
+    # Outbound HTTP connection pooling, shared by the provider and callback clients
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+
+    # Service callback dispatcher
+    CALLBACK_BATCH_SIZE = int(os.getenv('CALLBACK_BATCH_SIZE', 50))
+    CALLBACK_DISPATCHER_THREADS = int(os.getenv('CALLBACK_DISPATCHER_THREADS', 10))
+    CALLBACK_MAX_CONCURRENCY_PER_DESTINATION = int(os.getenv('CALLBACK_MAX_CONCURRENCY_PER_DESTINATION', 4))
+    CALLBACK_CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CALLBACK_CIRCUIT_BREAKER_THRESHOLD', 5))
+    CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS = int(os.getenv('CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS', 60))
+
+    SES_RECEIPT_BATCH_SIZE = int(os.getenv('SES_RECEIPT_BATCH_SIZE', 100))
+    SES_RECEIPT_MAX_BATCHES_PER_RUN = int(os.getenv('SES_RECEIPT_MAX_BATCHES_PER_RUN', 50))
+
+    SCHEDULED_DISPATCH_BATCH_SIZE = int(os.getenv('SCHEDULED_DISPATCH_BATCH_SIZE', 500))
+    SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN = int(os.getenv('SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN', 20))
+
+    SENT_STATUS_BUFFER_SIZE = int(os.getenv('SENT_STATUS_BUFFER_SIZE', 100))
+    SENT_STATUS_BUFFER_INTERVAL_MS = int(os.getenv('SENT_STATUS_BUFFER_INTERVAL_MS', 500))
+    SENT_STATUS_BUFFER_MAX_SIZE = int(os.getenv('SENT_STATUS_BUFFER_MAX_SIZE', 10000))
+
+    FAIR_QUEUING_MAX_LAG_SECONDS = int(os.getenv('FAIR_QUEUING_MAX_LAG_SECONDS', 60))
+
+    NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv('NOTIFICATION_PARTITIONS_AHEAD', 3))
+
+    DAILY_LIMIT_COUNT_TTL = int(os.getenv('DAILY_LIMIT_COUNT_TTL', 90000))
+
     TEST_MESSAGE_FILENAME = 'Test message'
     ONE_OFF_MESSAGE_FILENAME = 'Report'
     MAX_VERIFY_CODE_COUNT = 10
+    JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', 500))
+    JOB_CSV_STREAMING_ROWS = int(os.getenv('JOB_CSV_STREAMING_ROWS', 1000))
 
     # be careful increasing this size without being sure that we won't see slowness in pysftp
     MAX_LETTER_PDF_ZIP_FILESIZE = 40 * 1024 * 1024  # 40mb
@@ -209,7 +248,12 @@ class Config(object):
             # app/celery/scheduled_tasks.py
             'run-scheduled-jobs': {
                 'task': 'run-scheduled-jobs',
-                'schedule': crontab(minute=1),
+                'schedule': timedelta(seconds=10),
+                'options': {'queue': QueueNames.PERIODIC}
+            },
+            'send-scheduled-notifications': {
+                'task': 'send-scheduled-notifications',
+                'schedule': timedelta(seconds=10),
                 'options': {'queue': QueueNames.PERIODIC}
             },
             'delete-verify-codes': {
@@ -237,6 +281,22 @@ class Config(object):
                 'schedule': crontab(minute='0, 15, 30, 45'),
                 'options': {'queue': QueueNames.PERIODIC}
             },
+            'reconcile-daily-limit-counts': {
+                'task': 'reconcile-daily-limit-counts',
+                'schedule': crontab(minute='*/5'),
+                'options': {'queue': QueueNames.PERIODIC}
+            },
+            'reconcile-todays-stats': {
+                'task': 'reconcile-todays-stats',
+                'schedule': crontab(minute='*/10'),
+                'options': {'queue': QueueNames.PERIODIC}
+            },
+            # app/celery/process_ses_receipts_tasks.py
+            'process-buffered-ses-results': {
+                'task': 'process-buffered-ses-results',
+                'schedule': timedelta(seconds=10),
+                'options': {'queue': QueueNames.PERIODIC}
+            },
             # app/celery/nightly_tasks.py
             'timeout-sending-notifications': {
                 'task': 'timeout-sending-notifications',
@@ -268,6 +328,11 @@ class Config(object):
                 'schedule': crontab(hour=4, minute=45),  # after 'create-nightly-notification-status'
                 'options': {'queue': QueueNames.PERIODIC}
             },
+            'manage-notification-partitions': {
+                'task': 'manage-notification-partitions',
+                'schedule': crontab(hour=5, minute=0),  # after the delete-*-notifications tasks
+                'options': {'queue': QueueNames.PERIODIC}
+            },
             'delete-inbound-sms': {
                 'task': 'delete-inbound-sms',
                 'schedule': crontab(hour=1, minute=40),
@@ -333,6 +398,7 @@ class Config(object):
     STATSD_ENABLED = bool(STATSD_HOST)
 
     SENDING_NOTIFICATIONS_TIMEOUT_PERIOD = 259200  # 3 days
+    TIMEOUT_NOTIFICATIONS_CHUNK_SIZE = int(os.getenv('TIMEOUT_NOTIFICATIONS_CHUNK_SIZE', 5000))
 
     SIMULATED_EMAIL_ADDRESSES = (
         'simulate-delivered@notifications.va.gov',
@@ -387,6 +453,20 @@ class Config(object):
     GOVDELIVERY_EMAIL_CLIENT_ENABLED = True
     API_RATE_LIMIT_ENABLED = False
     API_MESSAGE_LIMIT_ENABLED = False
+    BATCH_JOB_PROCESSING_ENABLED = os.getenv('BATCH_JOB_PROCESSING_ENABLED') == '1'
+    JOB_CSV_STREAMING_ENABLED = os.getenv('JOB_CSV_STREAMING_ENABLED') == '1'
+    AUTH_SERVICE_CACHE_ENABLED = os.getenv('AUTH_SERVICE_CACHE_ENABLED') == '1'
+    TEMPLATE_CACHE_ENABLED = os.getenv('TEMPLATE_CACHE_ENABLED') == '1'
+    PROVIDER_CACHE_ENABLED = os.getenv('PROVIDER_CACHE_ENABLED') == '1'
+    CALLBACK_DISPATCHER_ENABLED = os.getenv('CALLBACK_DISPATCHER_ENABLED') == '1'
+    SES_RECEIPT_BATCHING_ENABLED = os.getenv('SES_RECEIPT_BATCHING_ENABLED') == '1'
+    NOTIFICATION_PARTITIONING_ENABLED = os.getenv('NOTIFICATION_PARTITIONING_ENABLED') == '1'
+    ATOMIC_SENDING_LIMITS_ENABLED = os.getenv('ATOMIC_SENDING_LIMITS_ENABLED') == '1'
+    TODAYS_STATS_CACHE_ENABLED = os.getenv('TODAYS_STATS_CACHE_ENABLED') == '1'
+    DELIVERY_LATENCY_HISTOGRAMS_ENABLED = os.getenv('DELIVERY_LATENCY_HISTOGRAMS_ENABLED') == '1'
+    DELIVERY_SNAPSHOTS_ENABLED = os.getenv('DELIVERY_SNAPSHOTS_ENABLED') == '1'
+    SENT_STATUS_BUFFER_ENABLED = os.getenv('SENT_STATUS_BUFFER_ENABLED') == '1'
+    FAIR_QUEUING_ENABLED = os.getenv('FAIR_QUEUING_ENABLED') == '1'
 
 
 ######################
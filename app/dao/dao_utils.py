@@ -1,6 +1,9 @@
 import itertools
 from functools import wraps
 
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
 from app import db
 from app.history_meta import create_history
 
@@ -75,3 +78,22 @@ def version_class(*version_options):
 
 def dao_rollback():
     db.session.rollback()
+
+
+class _ExplainJSON(Executable, ClauseElement):
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJSON)
+def _compile_explain_json(element, compiler, **kwargs):
+    return 'EXPLAIN (FORMAT JSON) {}'.format(compiler.process(element.statement, **kwargs))
+
+
+def estimate_row_count(query):
+    """
+    Returns the query planner's estimate of how many rows a query would return. This is much cheaper than
+    counting them on large tables, but only as accurate as the table's statistics.
+    """
+    plan = db.session.execute(_ExplainJSON(query.order_by(None).statement)).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -3,7 +3,7 @@ from datetime import datetime, timedelta, time, date
 from flask import current_app
 from notifications_utils.timezones import convert_local_timezone_to_utc, convert_utc_to_local_timezone
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import func, case, desc, Date, Integer, and_
+from sqlalchemy import func, case, desc, Date, Integer, and_, or_
 
 from app import db
 from app.dao.date_util import (
@@ -305,41 +305,27 @@ def fetch_billing_data_for_day(process_day, service_id=None):
     # use notification_history if process day is older than 7 days
     # this is useful if we need to rebuild the ft_billing table for a date older than 7 days ago.
     current_app.logger.info("Populate ft_billing for {} to {}".format(start_date, end_date))
-    transit_data = []
-    if not service_id:
-        service_ids = [x.id for x in Service.query.all()]
-    else:
-        service_ids = [service_id]
-    for id_of_service in service_ids:
-        for notification_type in (SMS_TYPE, EMAIL_TYPE, LETTER_TYPE):
-            results = _query_for_billing_data(
-                table=Notification,
-                notification_type=notification_type,
-                start_date=start_date,
-                end_date=end_date,
-                service_id=id_of_service
-            )
-            # If data has been purged from Notification then use NotificationHistory
-            if len(results) == 0:
-                results = _query_for_billing_data(
-                    table=NotificationHistory,
-                    notification_type=notification_type,
-                    start_date=start_date,
-                    end_date=end_date,
-                    service_id=id_of_service
-                )
-
-            transit_data = transit_data + results
-
-    return transit_data
-
-
-def _query_for_billing_data(table, notification_type, start_date, end_date, service_id):
-    billable_type_list = {
-        SMS_TYPE: NOTIFICATION_STATUS_TYPES_BILLABLE,
-        EMAIL_TYPE: NOTIFICATION_STATUS_TYPES_BILLABLE,
-        LETTER_TYPE: NOTIFICATION_STATUS_TYPES_BILLABLE_FOR_LETTERS
-    }
+    transit_data = _query_for_billing_data(
+        table=Notification,
+        start_date=start_date,
+        end_date=end_date,
+        service_id=service_id
+    )
+    # If data has been purged from Notification then use NotificationHistory for those services and types
+    found_in_notifications = {(row.service_id, row.notification_type) for row in transit_data}
+    history_data = _query_for_billing_data(
+        table=NotificationHistory,
+        start_date=start_date,
+        end_date=end_date,
+        service_id=service_id
+    )
+
+    return transit_data + [
+        row for row in history_data if (row.service_id, row.notification_type) not in found_in_notifications
+    ]
+
+
+def _query_for_billing_data(table, start_date, end_date, service_id=None):
     query = db.session.query(
         table.template_id,
         table.service_id,
@@ -364,12 +350,19 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
         Service.crown,
         func.coalesce(table.postage, 'none').label('postage')
     ).filter(
-        table.status.in_(billable_type_list[notification_type]),
+        or_(
+            and_(
+                table.notification_type.in_([SMS_TYPE, EMAIL_TYPE]),
+                table.status.in_(NOTIFICATION_STATUS_TYPES_BILLABLE)
+            ),
+            and_(
+                table.notification_type == LETTER_TYPE,
+                table.status.in_(NOTIFICATION_STATUS_TYPES_BILLABLE_FOR_LETTERS)
+            ),
+        ),
         table.key_type != KEY_TYPE_TEST,
         table.created_at >= start_date,
         table.created_at < end_date,
-        table.notification_type == notification_type,
-        table.service_id == service_id
     ).group_by(
         table.template_id,
         table.service_id,
@@ -383,6 +376,8 @@ def _query_for_billing_data(table, notification_type, start_date, end_date, serv
     ).join(
         Service
     )
+    if service_id:
+        query = query.filter(table.service_id == service_id)
     return query.all()
 
 
@@ -433,15 +428,64 @@ def get_rate(
 
 
 def update_fact_billing(data, process_day):
+    update_fact_billing_for_day([data], process_day)
+
+
+def update_fact_billing_for_day(transit_data, process_day):
+    """
+    Upserts the ft_billing rows for a day in a single statement, looking the rates up once for the whole day.
+
+    Returns how many rows were inserted or updated
+    """
+    if not transit_data:
+        return 0
+
     non_letter_rates, letter_rates = get_rates_for_billing()
-    rate = get_rate(non_letter_rates,
-                    letter_rates,
-                    data.notification_type,
-                    process_day,
-                    data.crown,
-                    data.letter_page_count,
-                    data.postage)
-    billing_record = create_billing_record(data, rate, process_day)
+    rates = {}
+    billing_records = {}
+    for data in transit_data:
+        rate_key = (data.notification_type, data.crown, data.letter_page_count, data.postage)
+        if rate_key not in rates:
+            rates[rate_key] = get_rate(non_letter_rates,
+                                       letter_rates,
+                                       data.notification_type,
+                                       process_day,
+                                       data.crown,
+                                       data.letter_page_count,
+                                       data.postage)
+        billing_record = create_billing_record(data, rates[rate_key], process_day)
+
+        # rows that only differ by a column outside the primary key (e.g. the letter page count) have to be
+        # combined, as a single upsert can't touch the same row twice
+        primary_key = (
+            billing_record.template_id,
+            billing_record.service_id,
+            billing_record.notification_type,
+            billing_record.provider,
+            billing_record.rate_multiplier,
+            billing_record.international,
+            billing_record.rate,
+            billing_record.postage,
+        )
+        if primary_key in billing_records:
+            merged = billing_records[primary_key]
+            merged['billable_units'] = (merged['billable_units'] or 0) + (billing_record.billable_units or 0)
+            merged['notifications_sent'] += billing_record.notifications_sent
+            continue
+
+        billing_records[primary_key] = dict(
+            bst_date=billing_record.bst_date,
+            template_id=billing_record.template_id,
+            service_id=billing_record.service_id,
+            provider=billing_record.provider,
+            rate_multiplier=billing_record.rate_multiplier,
+            notification_type=billing_record.notification_type,
+            international=billing_record.international,
+            billable_units=billing_record.billable_units,
+            notifications_sent=billing_record.notifications_sent,
+            rate=billing_record.rate,
+            postage=billing_record.postage,
+        )
 
     table = FactBilling.__table__
     '''
@@ -450,19 +494,7 @@ def update_fact_billing(data, process_day):
        rejected.
        http://docs.sqlalchemy.org/en/latest/dialects/postgresql.html#insert-on-conflict-upsert
     '''
-    stmt = insert(table).values(
-        bst_date=billing_record.bst_date,
-        template_id=billing_record.template_id,
-        service_id=billing_record.service_id,
-        provider=billing_record.provider,
-        rate_multiplier=billing_record.rate_multiplier,
-        notification_type=billing_record.notification_type,
-        international=billing_record.international,
-        billable_units=billing_record.billable_units,
-        notifications_sent=billing_record.notifications_sent,
-        rate=billing_record.rate,
-        postage=billing_record.postage,
-    )
+    stmt = insert(table).values(list(billing_records.values()))
 
     stmt = stmt.on_conflict_do_update(
         constraint="ft_billing_pkey",
@@ -474,6 +506,8 @@ def update_fact_billing(data, process_day):
     db.session.connection().execute(stmt)
     db.session.commit()
 
+    return len(billing_records)
+
 
 def create_billing_record(data, rate, process_day):
     billing_record = FactBilling(
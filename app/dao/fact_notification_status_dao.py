@@ -2,12 +2,13 @@ from datetime import datetime, timedelta, time
 
 from flask import current_app
 from notifications_utils.timezones import convert_local_timezone_to_utc
-from sqlalchemy import case, func, Date
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import and_, case, exists, func, select, Date
+from sqlalchemy.dialects.postgresql import insert, UUID
 from sqlalchemy.sql.expression import literal, extract
 from sqlalchemy.types import DateTime, Integer
 
 from app import db
+from app.dao.dao_utils import transactional
 from app.models import (
     ApiKey,
     EMAIL_TYPE,
@@ -30,6 +31,7 @@ from app.models import (
     SMS_TYPE,
     Template,
 )
+from app.notifications.todays_stats import count_by, get_todays_stats_for_service, todays_stats_enabled
 from app.utils import (
     get_local_timezone_midnight_in_utc,
     midnight_n_days_ago,
@@ -120,6 +122,84 @@ def update_fact_notification_status(data, process_day):
         db.session.commit()
 
 
+@transactional
+def rebuild_fact_notification_status_for_day(process_day):
+    """
+    Replaces the ft_notification_status rows for a day with a single INSERT ... SELECT, aggregating notifications
+    and, for the services and notification types that have already been purged from it, notification_history.
+    The delete and the insert are committed together, so dashboards never see a half-built day.
+
+    Returns how many rows were inserted
+    """
+    start_date = convert_local_timezone_to_utc(datetime.combine(process_day, time.min))
+    end_date = convert_local_timezone_to_utc(datetime.combine(process_day + timedelta(days=1), time.min))
+    current_app.logger.info("Rebuild ft_notification_status for {} to {}".format(start_date, end_date))
+
+    purged_from_notifications = ~exists().where(
+        and_(
+            Notification.service_id == NotificationHistory.service_id,
+            Notification.notification_type == NotificationHistory.notification_type,
+            Notification.created_at >= start_date,
+            Notification.created_at < end_date,
+            Notification.key_type != KEY_TYPE_TEST
+        )
+    )
+    day_data = _select_fact_status_data(Notification, process_day, start_date, end_date).union_all(
+        _select_fact_status_data(NotificationHistory, process_day, start_date, end_date).where(
+            purged_from_notifications
+        )
+    )
+
+    FactNotificationStatus.query.filter(
+        FactNotificationStatus.bst_date == process_day
+    ).delete(synchronize_session=False)
+
+    table = FactNotificationStatus.__table__
+    stmt = insert(table).from_select(
+        [
+            table.c.bst_date,
+            table.c.template_id,
+            table.c.service_id,
+            table.c.job_id,
+            table.c.notification_type,
+            table.c.key_type,
+            table.c.notification_status,
+            table.c.notification_count,
+            table.c.created_at,
+        ],
+        day_data
+    )
+    return db.session.execute(stmt).rowcount
+
+
+def _select_fact_status_data(table, process_day, start_date, end_date):
+    job_id = func.coalesce(table.job_id, '00000000-0000-0000-0000-000000000000')
+    return select([
+        literal(process_day, type_=Date),
+        table.template_id,
+        table.service_id,
+        job_id,
+        table.notification_type,
+        table.key_type,
+        table.status,
+        func.count(),
+        literal(datetime.utcnow(), type_=DateTime),
+    ]).where(
+        and_(
+            table.created_at >= start_date,
+            table.created_at < end_date,
+            table.key_type != KEY_TYPE_TEST
+        )
+    ).group_by(
+        table.template_id,
+        table.service_id,
+        job_id,
+        table.notification_type,
+        table.key_type,
+        table.status
+    )
+
+
 def fetch_notification_status_for_service_by_month(start_date, end_date, service_id):
     return db.session.query(
         func.date_trunc('month', FactNotificationStatus.bst_date).label('month'),
@@ -171,22 +251,25 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
         FactNotificationStatus.key_type != KEY_TYPE_TEST
     )
 
-    stats_for_today = db.session.query(
-        Notification.notification_type.cast(db.Text),
-        Notification.status,
-        *([Notification.template_id] if by_template else []),
-        func.count().label('count')
-    ).filter(
-        Notification.created_at >= get_local_timezone_midnight(now),
-        Notification.service_id == service_id,
-        Notification.key_type != KEY_TYPE_TEST
-    ).group_by(
-        Notification.notification_type,
-        *([Notification.template_id] if by_template else []),
-        Notification.status
-    )
+    stats_for_today = _cached_stats_for_today(service_id, by_template)
+    if stats_for_today is None:
+        stats_for_today = [db.session.query(
+            Notification.notification_type.cast(db.Text),
+            Notification.status,
+            *([Notification.template_id] if by_template else []),
+            func.count().label('count')
+        ).filter(
+            Notification.created_at >= get_local_timezone_midnight(now),
+            Notification.service_id == service_id,
+            Notification.key_type != KEY_TYPE_TEST
+        ).group_by(
+            Notification.notification_type,
+            *([Notification.template_id] if by_template else []),
+            Notification.status
+        )]
 
-    all_stats_table = stats_for_7_days.union_all(stats_for_today).subquery()
+    all_stats = stats_for_7_days.union_all(*stats_for_today) if stats_for_today else stats_for_7_days
+    all_stats_table = all_stats.subquery()
 
     query = db.session.query(
         *([
@@ -209,6 +292,50 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
     ).all()
 
 
+def _cached_stats_for_today(service_id, by_template):
+    """
+    Today's counts from the statistics kept up to date in Redis, as one row of literals each to union with the fact
+    table, or None if they aren't available.
+    """
+    if not todays_stats_enabled():
+        return None
+
+    todays_stats = get_todays_stats_for_service(service_id)
+    if todays_stats is None:
+        return None
+
+    fields = ('notification_type', 'status') + (('template_id',) if by_template else ())
+    return [
+        db.session.query(
+            literal(row.notification_type, db.Text),
+            literal(row.status, db.Text),
+            *([literal(row.template_id, UUID)] if by_template else []),
+            literal(row.count, Integer)
+        )
+        for row in count_by((stat for stat in todays_stats if stat.key_type != KEY_TYPE_TEST), *fields)
+    ]
+
+
+def fetch_notification_status_counts_for_day(bst_day):
+    return db.session.query(
+        Notification.service_id,
+        Notification.template_id,
+        Notification.notification_type.cast(db.Text).label('notification_type'),
+        Notification.key_type,
+        Notification.status.label('status'),
+        func.count().label('count')
+    ).filter(
+        Notification.created_at >= get_local_timezone_midnight_in_utc(bst_day),
+        Notification.created_at < get_local_timezone_midnight_in_utc(bst_day + timedelta(days=1))
+    ).group_by(
+        Notification.service_id,
+        Notification.template_id,
+        Notification.notification_type,
+        Notification.key_type,
+        Notification.status
+    ).all()
+
+
 def get_total_notifications_sent_for_api_key(api_key_id):
     """
     SELECT count(*) as total_send_attempts, notification_type
@@ -75,22 +75,24 @@ def dao_archive_job(job):
     db.session.commit()
 
 
-def dao_set_scheduled_jobs_to_pending():
+def dao_set_scheduled_jobs_to_pending(limit=None):
     """
-    Sets all past scheduled jobs to pending, and then returns them for further processing.
+    Sets past scheduled jobs to pending, oldest first, and then returns them for further processing.
 
-    this is used in the run_scheduled_jobs task, so we put a FOR UPDATE lock on the job table for the duration of
-    the transaction so that if the task is run more than once concurrently, one task will block the other select
-    from completing until it commits.
+    this is used in the run_scheduled_jobs task, which runs every few seconds and can run on more than one node at
+    once. The jobs are selected FOR UPDATE SKIP LOCKED, so a concurrent run claims the next jobs along rather than
+    waiting for this one to commit, and no job is claimed twice.
     """
-    jobs = Job.query \
+    query = Job.query \
         .filter(
             Job.job_status == JOB_STATUS_SCHEDULED,
             Job.scheduled_for < datetime.utcnow()
         ) \
         .order_by(asc(Job.scheduled_for)) \
-        .with_for_update() \
-        .all()
+        .with_for_update(skip_locked=True)
+    if limit:
+        query = query.limit(limit)
+    jobs = query.all()
 
     for job in jobs:
         job.job_status = JOB_STATUS_PENDING
@@ -1,4 +1,5 @@
 import functools
+import re
 import string
 from datetime import (
     datetime,
@@ -10,24 +11,28 @@ from flask import current_app
 from notifications_utils.international_billing_rates import INTERNATIONAL_BILLING_RATES
 from notifications_utils.recipients import (
     validate_and_format_email_address,
+    validate_and_format_phone_number,
     InvalidEmailError,
+    InvalidPhoneError,
     try_validate_and_format_phone_number
 )
 from notifications_utils.statsd_decorators import statsd
 from notifications_utils.timezones import convert_local_timezone_to_utc, convert_utc_to_local_timezone
-from sqlalchemy import (desc, func, asc)
+from sqlalchemy import (and_, desc, func, asc, inspect, or_, update, text, tuple_)
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import functions
-from sqlalchemy.sql.expression import case
+from sqlalchemy.sql.expression import case, column, select, table
 from sqlalchemy.dialects.postgresql import insert
 from werkzeug.datastructures import MultiDict
 
 from app import db, create_uuid
 from app.aws.s3 import remove_s3_object, get_s3_bucket_objects
-from app.dao.dao_utils import transactional
+from app.dao.dao_utils import estimate_row_count, transactional
 from app.errors import InvalidRequest
 from app.letters.utils import LETTERS_PDF_FILE_LOCATION_STRUCTURE
+from app.notifications.delivery_latency import record_delivery_latencies
+from app.notifications.todays_stats import record_notifications_created, record_status_changes
 from app.models import (
     Notification,
     NotificationHistory,
@@ -77,6 +82,55 @@ def dao_create_notification(notification):
         notification.status = NOTIFICATION_CREATED
 
     db.session.add(notification)
+    record_notifications_created([notification])
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_create_notifications(notifications):
+    """
+    Insert many notifications with a single multi-row INSERT rather than one INSERT per notification.
+
+    Notifications that already exist (for example when SQS delivers the same batch twice) are skipped.
+    Returns the ids of the notifications that were inserted.
+    """
+    if not notifications:
+        return []
+
+    # a partitioned table's primary key has to include created_at, so a notification is only recognised as already
+    # existing if it's inserted again with the same created_at
+    if is_notifications_table_partitioned():
+        conflict_target = [Notification.id, Notification.created_at]
+    else:
+        conflict_target = [Notification.id]
+
+    stmt = insert(Notification).values([
+        _notification_insert_values(notification) for notification in notifications
+    ]).on_conflict_do_nothing(
+        index_elements=conflict_target
+    ).returning(Notification.id)
+
+    created_ids = [row.id for row in db.session.execute(stmt)]
+    created = set(map(str, created_ids))
+    record_notifications_created(n for n in notifications if str(n.id) in created)
+    return created_ids
+
+
+def _notification_insert_values(notification):
+    if not notification.id:
+        notification.id = create_uuid()
+    if not notification.status:
+        notification.status = NOTIFICATION_CREATED
+
+    values = {}
+    for table_column in Notification.__table__.columns:
+        value = getattr(notification, table_column.key)
+        # a multi-row INSERT needs every row to have the same keys, so apply scalar defaults ourselves
+        if value is None and table_column.default is not None and table_column.default.is_scalar:
+            value = table_column.default.arg
+            setattr(notification, table_column.key, value)
+        values[table_column.key] = value
+    return values
 
 
 def _decide_permanent_temporary_failure(current_status, status):
@@ -92,73 +146,285 @@ def country_records_delivery(phone_prefix):
     return dlr and dlr.lower() == 'yes'
 
 
+PHONE_PREFIXES_WITH_DELIVERY_RECEIPTS = [
+    phone_prefix for phone_prefix in INTERNATIONAL_BILLING_RATES if country_records_delivery(phone_prefix)
+]
+
+# The statuses a notification can still be moved on from, by how its status update finds it. Delivery receipts from
+# the email providers find notifications by reference, everything else finds them by id.
+UPDATABLE_STATUSES = {
+    'id': [
+        NOTIFICATION_CREATED,
+        NOTIFICATION_SENDING,
+        NOTIFICATION_PENDING,
+        NOTIFICATION_SENT,
+        NOTIFICATION_PENDING_VIRUS_CHECK,
+    ],
+    'reference': [
+        NOTIFICATION_SENDING,
+        NOTIFICATION_PENDING,
+    ],
+}
+
+
 def _update_notification_status(notification, status):
     status = _decide_permanent_temporary_failure(current_status=notification.status, status=status)
     notification.status = status
     dao_update_notification(notification)
+    record_delivery_latencies([notification])
     return notification
 
 
+def _transition_notification_statuses(lookup, statuses, sent_by=None):
+    """
+    Moves notifications to their new statuses with a single conditional UPDATE ... RETURNING, rather than reading
+    each notification and checking its status first.
+
+    `statuses` maps the id or reference of each notification, as given by `lookup`, to its new status. Notifications
+    that are no longer in one of the UPDATABLE_STATUSES for the lookup are left as they are, as are notifications
+    found by id that were sent to a country that doesn't send delivery receipts. Returns the updated notifications.
+    """
+    key_column = getattr(Notification, lookup)
+    statuses = {str(key): status for key, status in statuses.items()}
+
+    filters = [
+        key_column.in_(list(statuses)),
+        Notification.status.in_(UPDATABLE_STATUSES[lookup]),
+    ]
+    if lookup == 'id':
+        filters.append(or_(
+            Notification.international.is_(False),
+            Notification.phone_prefix.in_(PHONE_PREFIXES_WITH_DELIVERY_RECEIPTS)
+        ))
+    current = db.session.query(
+        Notification.id,
+        Notification.status.label('status')
+    ).filter(*filters).with_for_update().subquery()
+
+    new_status = case(statuses, value=key_column)
+    values = {
+        # the same rule as _decide_permanent_temporary_failure, against the status the notification is updated from
+        'status': case(
+            [(
+                and_(Notification.status == NOTIFICATION_PENDING, new_status == NOTIFICATION_PERMANENT_FAILURE),
+                NOTIFICATION_TEMPORARY_FAILURE
+            )],
+            else_=new_status
+        ),
+        'updated_at': datetime.utcnow(),
+    }
+    if sent_by:
+        values['sent_by'] = func.coalesce(Notification.sent_by, sent_by)
+
+    old_status = current.c.status.label('old_status')
+    stmt = update(Notification).where(
+        Notification.id == current.c.id
+    ).values(
+        **values
+    ).returning(
+        *Notification.__table__.columns,
+        old_status
+    )
+    updated = [
+        (notification, previous_status)
+        for notification, previous_status in db.session.query(
+            Notification, old_status
+        ).populate_existing().instances(db.session.execute(stmt))
+    ]
+
+    notifications = [notification for notification, _ in updated]
+    record_status_changes(updated)
+    record_delivery_latencies(notifications)
+    return notifications
+
+
 @statsd(namespace="dao")
 @transactional
 def update_notification_status_by_id(notification_id, status, sent_by=None):
-    notification = Notification.query.with_for_update().filter(Notification.id == notification_id).first()
+    updated = _transition_notification_statuses('id', {notification_id: status}, sent_by=sent_by)
+    if updated:
+        return updated[0]
 
+    notification = Notification.query.filter(Notification.id == notification_id).first()
     if not notification:
         current_app.logger.info('notification not found for id {} (update to status {})'.format(
             notification_id,
             status
         ))
-        return None
-
-    if notification.status not in {
-        NOTIFICATION_CREATED,
-        NOTIFICATION_SENDING,
-        NOTIFICATION_PENDING,
-        NOTIFICATION_SENT,
-        NOTIFICATION_PENDING_VIRUS_CHECK
-    }:
+    elif notification.status not in UPDATABLE_STATUSES['id']:
         _duplicate_update_warning(notification, status)
-        return None
-
-    if notification.international and not country_records_delivery(notification.phone_prefix):
-        return None
-    if not notification.sent_by and sent_by:
-        notification.sent_by = sent_by
-    return _update_notification_status(
-        notification=notification,
-        status=status
-    )
+    # otherwise it was sent to a country that doesn't send delivery receipts, so its status is left as it is
+    return None
 
 
 @statsd(namespace="dao")
 @transactional
 def update_notification_status_by_reference(reference, status):
     # this is used to update letters and emails
-    notification = Notification.query.filter(Notification.reference == reference).first()
+    updated = _transition_notification_statuses('reference', {reference: status})
+    if updated:
+        return updated[0]
 
+    notification = Notification.query.filter(Notification.reference == reference).first()
     if not notification:
         current_app.logger.error('notification not found for reference {} (update to {})'.format(reference, status))
-        return None
-
-    if notification.status not in {
-        NOTIFICATION_SENDING,
-        NOTIFICATION_PENDING
-    }:
+    else:
         _duplicate_update_warning(notification, status)
-        return None
+    return None
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_update_notification_statuses_by_references(statuses_by_reference):
+    """
+    Moves many notifications, found by reference, to their new statuses in a single UPDATE. Notifications that have
+    already moved on are left as they are.
+
+    Returns the updated notifications, detached from the session so that they are not expired by the commit.
+    """
+    if not statuses_by_reference:
+        return []
+
+    notifications = _transition_notification_statuses('reference', statuses_by_reference)
+    for notification in notifications:
+        db.session.expunge(notification)
+    return notifications
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_update_notification_statuses(statuses_by_id):
+    """
+    Moves each notification that is still sending or pending to its new status in a single UPDATE, and returns the
+    ids of the notifications that were updated. Notifications that have already moved on are left as they are.
+    """
+    if not statuses_by_id:
+        return []
 
-    return _update_notification_status(
-        notification=notification,
-        status=status
+    statuses_by_id = {str(notification_id): status for notification_id, status in statuses_by_id.items()}
+    current = db.session.query(
+        Notification.id,
+        Notification.status.label('status')
+    ).filter(
+        Notification.id.in_(list(statuses_by_id)),
+        Notification.status.in_(UPDATABLE_STATUSES['reference'])
+    ).with_for_update().subquery()
+
+    stmt = update(Notification).where(
+        Notification.id == current.c.id
+    ).values(
+        status=case(statuses_by_id, value=Notification.id),
+        updated_at=datetime.utcnow()
+    ).returning(
+        Notification.id,
+        Notification.service_id,
+        Notification.template_id,
+        Notification.notification_type,
+        Notification.key_type,
+        Notification.created_at,
+        Notification.sent_by,
+        Notification.sent_at,
+        Notification.updated_at,
+        Notification.status.label('status'),
+        current.c.status.label('old_status'),
     )
+    updated = db.session.execute(stmt).fetchall()
+    record_status_changes((row, row.old_status) for row in updated)
+    record_delivery_latencies(updated)
+    return [row.id for row in updated]
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_update_sent_notifications(sent_notifications):
+    """
+    Writes what happened when many notifications were sent to their provider in a single UPDATE. Each of
+    `sent_notifications` has the notification's id, sent_at, sent_by, status, reference and billable_units.
+
+    A notification that has already moved on from created, or from sending if it was claimed for delivery, for example
+    because its delivery receipt arrived before this was written, keeps its status. Returns the number of
+    notifications updated.
+    """
+    if not sent_notifications:
+        return 0
+
+    sent_by_id = {str(sent.id): sent for sent in sent_notifications}
+
+    def sent_values(field):
+        return case({notification_id: getattr(sent, field) for notification_id, sent in sent_by_id.items()},
+                    value=Notification.id)
+
+    current = db.session.query(
+        Notification.id,
+        Notification.status.label('status')
+    ).filter(
+        Notification.id.in_(list(sent_by_id))
+    ).with_for_update().subquery()
+
+    stmt = update(Notification).where(
+        Notification.id == current.c.id
+    ).values(
+        # a notification sent from its delivery snapshot was claimed by moving it to sending before it was sent
+        status=case(
+            [(Notification.status.in_([NOTIFICATION_CREATED, NOTIFICATION_SENDING]), sent_values('status'))],
+            else_=Notification.status
+        ),
+        sent_at=sent_values('sent_at'),
+        sent_by=sent_values('sent_by'),
+        reference=sent_values('reference'),
+        billable_units=sent_values('billable_units'),
+        updated_at=datetime.utcnow()
+    ).returning(
+        Notification.id,
+        Notification.service_id,
+        Notification.template_id,
+        Notification.notification_type,
+        Notification.key_type,
+        Notification.created_at,
+        Notification.status.label('status'),
+        current.c.status.label('old_status'),
+    )
+    updated = db.session.execute(stmt).fetchall()
+    record_status_changes((row, row.old_status) for row in updated)
+    return len(updated)
 
 
 @statsd(namespace="dao")
 @transactional
 def dao_update_notification(notification):
     notification.updated_at = datetime.utcnow()
+    status_history = inspect(notification).attrs.status.history
     db.session.add(notification)
+    if status_history.deleted and status_history.added:
+        record_status_changes([(notification, status_history.deleted[0])])
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_update_notification_if_status(notification, from_status, fields):
+    """
+    Writes the given fields of a notification that wasn't read from the database, such as a delivery snapshot, with a
+    single UPDATE that only applies while the notification still has `from_status`. Returns whether it was updated.
+
+    The notification can be any object with the notification's id, service_id, template_id, notification_type,
+    key_type, created_at and the fields to write.
+    """
+    updated_at = datetime.utcnow()
+    values = {field: getattr(notification, field) for field in fields}
+    updated = Notification.query.filter(
+        Notification.id == notification.id,
+        Notification.status == from_status
+    ).update(
+        dict(values, updated_at=updated_at),
+        synchronize_session=False
+    )
+    if not updated:
+        return False
+
+    notification.updated_at = updated_at
+    if notification.status != from_status:
+        record_status_changes([(notification, from_status)])
+    return True
 
 
 @statsd(namespace="dao")
@@ -210,6 +476,7 @@ def get_notifications_for_service(
         page=1,
         page_size=None,
         count_pages=True,
+        estimate_count=False,
         limit_days=None,
         key_type=None,
         personalisation=False,
@@ -228,9 +495,12 @@ def get_notifications_for_service(
         filters.append(Notification.created_at >= midnight_n_days_ago(limit_days))
 
     if older_than is not None:
+        # seek past the given notification rather than using an offset, so that every page costs the same
         older_than_created_at = db.session.query(
             Notification.created_at).filter(Notification.id == older_than).as_scalar()
-        filters.append(Notification.created_at < older_than_created_at)
+        filters.append(
+            tuple_(Notification.created_at, Notification.id) < tuple_(older_than_created_at, str(older_than))
+        )
 
     if not include_jobs:
         filters.append(Notification.job_id == None)  # noqa
@@ -253,11 +523,14 @@ def get_notifications_for_service(
             joinedload('template')
         )
 
-    return query.order_by(desc(Notification.created_at)).paginate(
+    pagination = query.order_by(desc(Notification.created_at), desc(Notification.id)).paginate(
         page=page,
         per_page=page_size,
-        count=count_pages
+        count=count_pages and not estimate_count
     )
+    if count_pages and estimate_count:
+        pagination.total = estimate_row_count(query)
+    return pagination
 
 
 def _filter_query(query, filter_dict=None):
@@ -304,6 +577,11 @@ def delete_notifications_older_than_retention_by_type(notification_type, qry_lim
             "Deleting {} notifications for service id: {}".format(notification_type, f.service_id))
         deleted += _delete_notifications(notification_type, days_of_retention, f.service_id, qry_limit)
 
+    if notification_type != LETTER_TYPE and notifications_are_expired_by_partition():
+        # the manage-notification-partitions task drops these once they're past the default retention
+        current_app.logger.info('Finished deleting {} notifications'.format(notification_type))
+        return deleted
+
     current_app.logger.info(
         'Deleting {} notifications for services without flexible data retention'.format(notification_type))
 
@@ -372,6 +650,11 @@ def insert_update_notification_history(notification_type, date_to_delete_from, s
         Notification.created_at < date_to_delete_from,
         Notification.key_type != KEY_TYPE_TEST
     )
+    _insert_update_notification_history_from_select(notifications)
+    db.session.commit()
+
+
+def _insert_update_notification_history_from_select(notifications):
     stmt = insert(NotificationHistory).from_select(
         NotificationHistory.__table__.c,
         notifications
@@ -388,7 +671,144 @@ def insert_update_notification_history(notification_type, date_to_delete_from, s
               }
     )
     db.session.connection().execute(stmt)
-    db.session.commit()
+
+
+def notifications_are_expired_by_partition():
+    return current_app.config['NOTIFICATION_PARTITIONING_ENABLED'] and is_notifications_table_partitioned()
+
+
+def is_notifications_table_partitioned():
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'notifications'::regclass)"
+    )).scalar()
+
+
+def notification_partition_name(day):
+    return 'notifications_p{}'.format(day.strftime('%Y%m%d'))
+
+
+def dao_get_notification_partitions():
+    """
+    Returns the (name, upper bound) of each range partition of notifications, oldest first. The default
+    partition has no bounds and is left out.
+    """
+    partitions = db.session.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'notifications'::regclass
+    """)).fetchall()
+
+    bounded_partitions = []
+    for name, bounds in partitions:
+        upper_bound = re.search(r"TO \('([^']+)'\)", bounds)
+        if upper_bound:
+            bounded_partitions.append((name, datetime.strptime(upper_bound.group(1)[:19], '%Y-%m-%d %H:%M:%S')))
+    return sorted(bounded_partitions, key=lambda partition: partition[1])
+
+
+@transactional
+def dao_partition_notifications_table():
+    """
+    Replaces notifications with a table partitioned by the day the notification was created. The existing table
+    becomes the partition for everything created up to the end of today, so no rows are copied.
+    """
+    today = datetime.utcnow().date()
+    db.session.execute(text("ALTER TABLE notifications RENAME TO notifications_unpartitioned"))
+    db.session.execute(text("ALTER INDEX notifications_pkey RENAME TO notifications_unpartitioned_pkey"))
+    db.session.execute(text("""
+        CREATE TABLE notifications (LIKE notifications_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (created_at)
+    """))
+    # unique constraints on a partitioned table have to include the partition key
+    db.session.execute(text("ALTER TABLE notifications ADD PRIMARY KEY (id, created_at)"))
+
+    index_definitions = db.session.execute(text(
+        "SELECT indexdef FROM pg_indexes "
+        "WHERE tablename = 'notifications_unpartitioned' AND indexdef NOT LIKE 'CREATE UNIQUE%'"
+    )).fetchall()
+    for index_definition, in index_definitions:
+        db.session.execute(text("CREATE INDEX ON notifications {}".format(
+            index_definition[index_definition.index(' USING '):]
+        )))
+
+    foreign_keys = db.session.execute(text(
+        "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = 'notifications_unpartitioned'::regclass AND contype = 'f'"
+    )).fetchall()
+    for foreign_key, in foreign_keys:
+        db.session.execute(text("ALTER TABLE notifications ADD {}".format(foreign_key)))
+
+    db.session.execute(text(
+        "ALTER TABLE notifications ATTACH PARTITION notifications_unpartitioned "
+        "FOR VALUES FROM (MINVALUE) TO ('{}')".format((today + timedelta(days=1)).isoformat())
+    ))
+    db.session.execute(text("CREATE TABLE notifications_default PARTITION OF notifications DEFAULT"))
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_create_notification_partitions(start_day, number_of_days):
+    """
+    Creates a partition for each utc day from start_day that isn't already covered by an existing partition.
+    """
+    partitions = dao_get_notification_partitions()
+    covered_until = partitions[-1][1] if partitions else datetime.min
+
+    created = []
+    for day in (start_day + timedelta(days=i) for i in range(number_of_days)):
+        day_start = datetime.combine(day, datetime.min.time())
+        if day_start < covered_until:
+            continue
+        name = notification_partition_name(day)
+        db.session.execute(text(
+            "CREATE TABLE {} PARTITION OF notifications FOR VALUES FROM ('{}') TO ('{}')".format(
+                name, day_start.isoformat(), (day_start + timedelta(days=1)).isoformat()
+            )
+        ))
+        created.append(name)
+    return created
+
+
+@statsd(namespace="dao")
+def dao_drop_notification_partitions_older_than(date_to_delete_from):
+    """
+    Drops every partition whose rows were all created before date_to_delete_from, returning their names.
+    """
+    dropped = []
+    for name, upper_bound in dao_get_notification_partitions():
+        if upper_bound > date_to_delete_from:
+            break
+        _drop_notification_partition(name)
+        dropped.append(name)
+    return dropped
+
+
+@transactional
+def _drop_notification_partition(name):
+    partition = table(name, *[column(c.name) for c in NotificationHistory.__table__.c])
+    _insert_update_notification_history_from_select(
+        select([partition.c[c.name] for c in NotificationHistory.__table__.c]).where(
+            partition.c.key_type != KEY_TYPE_TEST
+        )
+    )
+
+    db.session.execute(text(
+        "DELETE FROM scheduled_notifications WHERE notification_id IN (SELECT id FROM {})".format(name)
+    ))
+    db.session.execute(text("ALTER TABLE notifications DETACH PARTITION {}".format(name)))
+    # services with their own data retention, and letters (which have pdfs to remove from s3), are still expired
+    # row by row, so their notifications are put back through the default partition before the day is dropped
+    db.session.execute(text("""
+        INSERT INTO notifications
+        SELECT * FROM {partition} AS expired
+        WHERE expired.notification_type = :letter_type OR EXISTS (
+            SELECT 1 FROM service_data_retention
+            WHERE service_data_retention.service_id = expired.service_id
+            AND service_data_retention.notification_type = expired.notification_type
+        )
+    """.format(partition=name)), {'letter_type': LETTER_TYPE})
+    db.session.execute(text("DROP TABLE {}".format(name)))
 
 
 def _delete_letters_from_s3(
@@ -431,24 +851,50 @@ def dao_delete_notifications_by_id(notification_id):
     ).delete(synchronize_session='fetch')
 
 
-def _timeout_notifications(current_statuses, new_status, timeout_start, updated_at):
-    notifications = Notification.query.filter(
-        Notification.created_at < timeout_start,
-        Notification.status.in_(current_statuses),
-        Notification.notification_type != LETTER_TYPE
-    ).all()
-    Notification.query.filter(
+@statsd(namespace="dao")
+@transactional
+def dao_delete_notifications_by_ids(notification_ids):
+    db.session.query(Notification).filter(
+        Notification.id.in_(notification_ids)
+    ).delete(synchronize_session='fetch')
+
+
+def _timeout_notifications(current_statuses, new_status, timeout_start, updated_at, chunk_size):
+    timed_out = db.session.query(
+        Notification.id
+    ).filter(
         Notification.created_at < timeout_start,
         Notification.status.in_(current_statuses),
         Notification.notification_type != LETTER_TYPE
-    ).update(
-        {'status': new_status, 'updated_at': updated_at},
-        synchronize_session=False
+    ).limit(
+        chunk_size
+    ).with_for_update(
+        skip_locked=True
+    ).subquery()
+
+    stmt = update(Notification).where(
+        Notification.id.in_(timed_out)
+    ).values(
+        status=new_status,
+        updated_at=updated_at
+    ).returning(
+        # everything create_delivery_status_callback_data needs, so the rows don't have to be loaded again
+        Notification.id,
+        Notification.service_id,
+        Notification.client_reference,
+        Notification.to,
+        Notification.status.label('status'),
+        Notification.notification_type,
+        Notification.created_at,
+        Notification.updated_at,
+        Notification.sent_at,
     )
+    notifications = db.session.execute(stmt).fetchall()
+    db.session.commit()
     return notifications
 
 
-def dao_timeout_notifications(timeout_period_in_seconds):
+def dao_timeout_notifications_in_chunks(timeout_period_in_seconds, chunk_size):
     """
     Timeout SMS and email notifications by the following rules:
 
@@ -460,19 +906,42 @@ def dao_timeout_notifications(timeout_period_in_seconds):
         pending -> temporary-failure
 
     Letter notifications are not timed out
+
+    Notifications are updated and committed chunk_size at a time, skipping any that are locked by another
+    transaction, and each chunk of updated rows is yielded once it has been committed.
     """
     timeout_start = datetime.utcnow() - timedelta(seconds=timeout_period_in_seconds)
     updated_at = datetime.utcnow()
-    timeout = functools.partial(_timeout_notifications, timeout_start=timeout_start, updated_at=updated_at)
-
-    # Notifications still in created status are marked with a technical-failure:
-    technical_failure_notifications = timeout([NOTIFICATION_CREATED], NOTIFICATION_TECHNICAL_FAILURE)
-
-    # Notifications still in sending or pending status are marked with a temporary-failure:
-    temporary_failure_notifications = timeout([NOTIFICATION_SENDING, NOTIFICATION_PENDING],
-                                              NOTIFICATION_TEMPORARY_FAILURE)
+    timeout = functools.partial(
+        _timeout_notifications, timeout_start=timeout_start, updated_at=updated_at, chunk_size=chunk_size
+    )
 
-    db.session.commit()
+    for current_statuses, new_status in [
+        # Notifications still in created status are marked with a technical-failure:
+        ([NOTIFICATION_CREATED], NOTIFICATION_TECHNICAL_FAILURE),
+        # Notifications still in sending or pending status are marked with a temporary-failure:
+        ([NOTIFICATION_SENDING, NOTIFICATION_PENDING], NOTIFICATION_TEMPORARY_FAILURE),
+    ]:
+        notifications = timeout(current_statuses, new_status)
+        while notifications:
+            yield notifications
+            if len(notifications) < chunk_size:
+                break
+            notifications = timeout(current_statuses, new_status)
+
+
+def dao_timeout_notifications(timeout_period_in_seconds, chunk_size=None):
+    if chunk_size is None:
+        chunk_size = current_app.config['TIMEOUT_NOTIFICATIONS_CHUNK_SIZE']
+
+    technical_failure_notifications = []
+    temporary_failure_notifications = []
+    for notifications in dao_timeout_notifications_in_chunks(timeout_period_in_seconds, chunk_size):
+        for notification in notifications:
+            if notification.status == NOTIFICATION_TECHNICAL_FAILURE:
+                technical_failure_notifications.append(notification)
+            else:
+                temporary_failure_notifications.append(notification)
 
     return technical_failure_notifications, temporary_failure_notifications
 
@@ -513,6 +982,23 @@ def is_delivery_slow_for_provider(
         return False
 
 
+def count_undelivered_notifications_for_provider(created_at, provider, delivery_time):
+    """
+    Returns how many notifications created since `created_at` and sent by `provider` are still waiting to be
+    delivered, and how many of those were sent at least `delivery_time` ago.
+    """
+    return db.session.query(
+        func.count(),
+        func.count().filter(Notification.sent_at <= datetime.utcnow() - delivery_time)
+    ).filter(
+        Notification.created_at >= created_at,
+        Notification.sent_at.isnot(None),
+        Notification.status.in_([NOTIFICATION_PENDING, NOTIFICATION_SENDING]),
+        Notification.sent_by == provider,
+        Notification.key_type != KEY_TYPE_TEST
+    ).one()
+
+
 @statsd(namespace="dao")
 @transactional
 def dao_update_notifications_by_reference(references, update_dict):
@@ -536,7 +1022,17 @@ def dao_update_notifications_by_reference(references, update_dict):
 
 
 @statsd(namespace="dao")
-def dao_get_notifications_by_to_field(service_id, search_term, notification_type=None, statuses=None):
+def dao_get_notifications_by_to_field(
+    service_id, search_term, notification_type=None, statuses=None, page_size=None, older_than=None
+):
+    """
+    Searches a service's notifications by recipient, newest first, returning at most page_size of them. Pass the
+    id of the last notification returned as older_than to get the next page.
+
+    A full phone number or email address is matched exactly, using the (service_id, normalised_to) index. Anything
+    else, or a full recipient that matches nothing exactly, is matched anywhere in the recipient, which the trigram
+    index on normalised_to supports.
+    """
     if notification_type is None:
         notification_type = guess_notification_type(search_term)
 
@@ -548,11 +1044,19 @@ def dao_get_notifications_by_to_field(service_id, search_term, notification_type
 
         normalised = normalised.lstrip('+0')
 
+        try:
+            formatted = validate_and_format_phone_number(search_term, international=True)
+            exact_recipients = {formatted, formatted.lstrip('+')}
+        except InvalidPhoneError:
+            exact_recipients = set()
+
     elif notification_type == EMAIL_TYPE:
         try:
             normalised = validate_and_format_email_address(search_term)
+            exact_recipients = {normalised}
         except InvalidEmailError:
             normalised = search_term.lower()
+            exact_recipients = set()
 
     else:
         raise InvalidRequest("Only email and SMS can use search by recipient", 400)
@@ -561,7 +1065,6 @@ def dao_get_notifications_by_to_field(service_id, search_term, notification_type
 
     filters = [
         Notification.service_id == service_id,
-        Notification.normalised_to.like("%{}%".format(normalised)),
         Notification.key_type != KEY_TYPE_TEST,
     ]
 
@@ -570,8 +1073,26 @@ def dao_get_notifications_by_to_field(service_id, search_term, notification_type
     if notification_type:
         filters.append(Notification.notification_type == notification_type)
 
-    results = db.session.query(Notification).filter(*filters).order_by(desc(Notification.created_at)).all()
-    return results
+    exact_match = Notification.normalised_to.in_(exact_recipients)
+    if exact_recipients and db.session.query(
+        db.session.query(Notification).filter(*filters, exact_match).exists()
+    ).scalar():
+        filters.append(exact_match)
+    else:
+        filters.append(Notification.normalised_to.like("%{}%".format(normalised)))
+
+    if older_than is not None:
+        older_than_created_at = db.session.query(
+            Notification.created_at).filter(Notification.id == older_than).as_scalar()
+        filters.append(
+            tuple_(Notification.created_at, Notification.id) < tuple_(older_than_created_at, str(older_than))
+        )
+
+    return db.session.query(Notification).filter(*filters).order_by(
+        desc(Notification.created_at), desc(Notification.id)
+    ).limit(
+        page_size or current_app.config['API_PAGE_SIZE']
+    ).all()
 
 
 @statsd(namespace="dao")
@@ -611,7 +1132,7 @@ def dao_created_scheduled_notification(scheduled_notification):
 @statsd(namespace="dao")
 def dao_get_scheduled_notifications():
     notifications = Notification.query.join(
-        ScheduledNotification
+        Notification.scheduled_notification
     ).filter(
         ScheduledNotification.scheduled_for < datetime.utcnow(),
         ScheduledNotification.pending).all()
@@ -619,6 +1140,65 @@ def dao_get_scheduled_notifications():
     return notifications
 
 
+@statsd(namespace="dao")
+def dao_claim_scheduled_notifications(limit):
+    """
+    Marks up to `limit` due scheduled notifications as processed, earliest first, in a single UPDATE and returns
+    their notifications.
+
+    The scheduled notifications are selected FOR UPDATE SKIP LOCKED, so concurrent runs claim different notifications
+    without waiting for each other, and no notification is claimed twice.
+    """
+    due = db.session.query(
+        ScheduledNotification.id
+    ).filter(
+        ScheduledNotification.pending,
+        ScheduledNotification.scheduled_for < datetime.utcnow()
+    ).order_by(
+        asc(ScheduledNotification.scheduled_for)
+    ).limit(
+        limit
+    ).with_for_update(skip_locked=True)
+
+    stmt = update(ScheduledNotification).where(
+        ScheduledNotification.id.in_(due)
+    ).values(
+        pending=False
+    ).returning(
+        ScheduledNotification.notification_id
+    )
+    notification_ids = [row.notification_id for row in db.session.execute(stmt)]
+    db.session.commit()
+
+    if not notification_ids:
+        return []
+    return Notification.query.options(
+        joinedload('service')
+    ).filter(
+        Notification.id.in_(notification_ids)
+    ).order_by(
+        asc(Notification.created_at)
+    ).all()
+
+
+@statsd(namespace="dao")
+@transactional
+def dao_set_scheduled_notifications_to_pending(notification_ids):
+    """
+    Puts claimed scheduled notifications back to be claimed again, for those that couldn't be queued.
+    """
+    if not notification_ids:
+        return
+    # failing to queue a notification can leave the session's transaction failed, for example if the notification
+    # couldn't be deleted afterwards
+    db.session.rollback()
+    ScheduledNotification.query.filter(
+        ScheduledNotification.notification_id.in_(notification_ids)
+    ).update(
+        {'pending': True}, synchronize_session=False
+    )
+
+
 def set_scheduled_notification_to_processed(notification_id):
     db.session.query(ScheduledNotification).filter(
         ScheduledNotification.notification_id == notification_id
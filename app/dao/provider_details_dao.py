@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from cachelib import SimpleCache
 from flask import current_app
 from notifications_utils.timezones import convert_utc_to_local_timezone
 from sqlalchemy import asc, desc, func
@@ -13,6 +14,9 @@ from app.provider_details.switch_providers import (
 from app.models import FactBilling, ProviderDetails, ProviderDetailsHistory, SMS_TYPE, User
 from app import db
 
+# identifiers of the active providers in priority order, keyed by notification type and international support
+provider_cache = SimpleCache()
+
 
 def get_provider_details_by_id(provider_details_id):
     return ProviderDetails.query.get(provider_details_id)
@@ -52,6 +56,7 @@ def dao_get_provider_versions(provider_id):
 
 @transactional
 def dao_toggle_sms_provider(identifier):
+    invalidate_provider_cache()
     alternate_provider = get_alternative_sms_provider(identifier)
     if alternate_provider:
         dao_switch_sms_provider_to_provider_with_identifier(alternate_provider.identifier)
@@ -68,6 +73,8 @@ def dao_switch_sms_provider_to_provider_with_identifier(identifier):
     if provider_is_inactive(new_provider):
         return
 
+    invalidate_provider_cache()
+
     # Check first to see if there is another provider with the same priority
     # as this needs to be updated differently
     conflicting_provider = dao_get_sms_provider_with_equal_priority(new_provider.identifier, new_provider.priority)
@@ -94,6 +101,27 @@ def get_provider_details_by_notification_type(notification_type, supports_intern
     return ProviderDetails.query.filter(*filters).order_by(asc(ProviderDetails.priority)).all()
 
 
+def dao_get_active_provider_identifiers(notification_type, supports_international=False):
+    cache_key = '{}-{}'.format(notification_type, supports_international)
+    identifiers = provider_cache.get(cache_key)
+    if identifiers is None:
+        identifiers = [
+            provider.identifier
+            for provider in get_provider_details_by_notification_type(notification_type, supports_international)
+            if provider.active
+        ]
+        provider_cache.set(cache_key, identifiers, timeout=current_app.config['PROVIDER_CACHE_TTL'])
+    return identifiers
+
+
+def invalidate_provider_cache():
+    """
+    Clears this worker's cached providers. The cache is per process, so other workers keep using the providers they
+    have cached, including one that has just been deactivated or reprioritised, for up to PROVIDER_CACHE_TTL seconds.
+    """
+    provider_cache.clear()
+
+
 @transactional
 def dao_update_provider_details(provider_details):
     provider_details.version += 1
@@ -101,6 +129,7 @@ def dao_update_provider_details(provider_details):
     history = ProviderDetailsHistory.from_original(provider_details)
     db.session.add(provider_details)
     db.session.add(history)
+    invalidate_provider_cache()
 
 
 def dao_get_sms_provider_with_equal_priority(identifier, priority):
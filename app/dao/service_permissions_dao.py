@@ -1,4 +1,5 @@
 from app import db
+from app.authentication.service_cache import invalidate_service_cache
 from app.dao.dao_utils import transactional
 from app.models import ServicePermission
 
@@ -12,6 +13,7 @@ def dao_fetch_service_permissions(service_id):
 def dao_add_service_permission(service_id, permission):
     service_permission = ServicePermission(service_id=service_id, permission=permission)
     db.session.add(service_permission)
+    invalidate_service_cache(service_id)
 
 
 def dao_remove_service_permission(service_id, permission):
@@ -19,4 +21,5 @@ def dao_remove_service_permission(service_id, permission):
         ServicePermission.service_id == service_id,
         ServicePermission.permission == permission).delete()
     db.session.commit()
+    invalidate_service_cache(service_id)
     return deleted
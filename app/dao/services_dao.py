@@ -1,4 +1,5 @@
 import uuid
+from collections import Counter, namedtuple
 from datetime import date, datetime, timedelta
 
 from notifications_utils.statsd_decorators import statsd
@@ -7,6 +8,7 @@ from sqlalchemy.orm import joinedload
 from flask import current_app
 
 from app import db
+from app.authentication.service_cache import invalidate_service_cache
 from app.dao.date_util import get_current_financial_year
 from app.dao.dao_utils import (
     transactional,
@@ -17,6 +19,12 @@ from app.dao.organisation_dao import dao_get_organisation_by_email_address
 from app.dao.service_sms_sender_dao import insert_service_sms_sender
 from app.dao.service_user_dao import dao_get_service_user
 from app.dao.template_folder_dao import dao_get_valid_template_folders_by_id
+from app.notifications.todays_stats import (
+    count_by,
+    get_todays_stats_for_service,
+    get_todays_stats_for_services,
+    todays_stats_enabled,
+)
 from app.models import (
     AnnualBilling,
     ApiKey,
@@ -38,6 +46,8 @@ from app.models import (
     VerifyCode,
     EMAIL_TYPE,
     INTERNATIONAL_SMS_TYPE,
+    JOB_STATUS_CANCELLED,
+    JOB_STATUS_SENDING_LIMITS_EXCEEDED,
     KEY_TYPE_TEST,
     SMS_TYPE,
 )
@@ -66,6 +76,10 @@ def dao_fetch_all_services(only_active=False):
     return query.all()
 
 
+def dao_fetch_all_service_ids():
+    return [service_id for service_id, in db.session.query(Service.id)]
+
+
 def get_services_by_partial_name(service_name):
     service_name = escape_special_characters(service_name)
     return Service.query.filter(Service.name.ilike("%{}%".format(service_name))).all()
@@ -196,7 +210,8 @@ def dao_fetch_service_by_id_with_api_keys(service_id, only_active=False):
     query = Service.query.filter_by(
         id=service_id
     ).options(
-        joinedload('api_keys')
+        joinedload('api_keys'),
+        joinedload('permissions'),
     )
 
     if only_active:
@@ -248,6 +263,8 @@ def dao_archive_service(service_id):
         if not api_key.expiry_date:
             api_key.expiry_date = datetime.utcnow()
 
+    invalidate_service_cache(service_id)
+
 
 def dao_fetch_service_by_id_and_user(service_id, user_id):
     return Service.query.filter(
@@ -312,6 +329,7 @@ def dao_create_service(
 @version_class(Service)
 def dao_update_service(service):
     db.session.add(service)
+    invalidate_service_cache(service.id)
 
 
 def dao_add_user_to_service(service, user, permissions=None, folder_permissions=None):
@@ -396,6 +414,13 @@ def dao_fetch_stats_for_service(service_id, limit_days):
 
 @statsd(namespace="dao")
 def dao_fetch_todays_stats_for_service(service_id):
+    if todays_stats_enabled():
+        todays_stats = get_todays_stats_for_service(service_id)
+        if todays_stats is not None:
+            return count_by(
+                (stat for stat in todays_stats if stat.key_type != KEY_TYPE_TEST), 'notification_type', 'status'
+            )
+
     return _stats_for_service_query(service_id).filter(
         func.date(Notification.created_at) == date.today()
     ).all()
@@ -415,6 +440,41 @@ def fetch_todays_total_message_count(service_id):
     return 0 if result is None else result.count
 
 
+def fetch_todays_total_message_counts_by_service():
+    """
+    Returns how much of its daily message limit each service has used today, as a Counter keyed by service id.
+
+    A job uses up its whole size when it starts processing, so jobs count in full rather than by the notifications
+    that have been created for them so far.
+    """
+    counts = Counter()
+
+    notification_counts = db.session.query(
+        Notification.service_id,
+        func.count(Notification.id)
+    ).filter(
+        Notification.key_type != KEY_TYPE_TEST,
+        Notification.job_id.is_(None),
+        func.date(Notification.created_at) == date.today()
+    ).group_by(
+        Notification.service_id
+    )
+
+    job_counts = db.session.query(
+        Job.service_id,
+        func.sum(Job.notification_count)
+    ).filter(
+        Job.job_status.notin_([JOB_STATUS_CANCELLED, JOB_STATUS_SENDING_LIMITS_EXCEEDED]),
+        func.date(Job.processing_started) == date.today()
+    ).group_by(
+        Job.service_id
+    )
+
+    for service_id, count in notification_counts.all() + job_counts.all():
+        counts[service_id] += int(count)
+    return counts
+
+
 def _stats_for_service_query(service_id):
     return db.session.query(
         Notification.notification_type,
@@ -429,8 +489,54 @@ def _stats_for_service_query(service_id):
     )
 
 
+TodaysServiceStats = namedtuple('TodaysServiceStats', [
+    'service_id', 'name', 'restricted', 'research_mode', 'active', 'created_at', 'notification_type', 'status', 'count'
+])
+
+
+def _todays_stats_for_all_services(include_from_test_key, only_active):
+    services = db.session.query(
+        Service.id,
+        Service.name,
+        Service.restricted,
+        Service.research_mode,
+        Service.active,
+        Service.created_at,
+    ).order_by(Service.id)
+
+    if only_active:
+        services = services.filter(Service.active)
+
+    services = services.all()
+    todays_stats = get_todays_stats_for_services([service.id for service in services])
+    if todays_stats is None or any(stats is None for stats in todays_stats.values()):
+        return None
+
+    rows = []
+    for service in services:
+        service_stats = count_by(
+            (stat for stat in todays_stats[service.id] if include_from_test_key or stat.key_type != KEY_TYPE_TEST),
+            'notification_type',
+            'status'
+        )
+        # like the outer join of the database query, services with no notifications still get a row
+        for stat in service_stats or [None]:
+            rows.append(TodaysServiceStats(
+                *service,
+                notification_type=stat and stat.notification_type,
+                status=stat and stat.status,
+                count=stat and stat.count
+            ))
+    return rows
+
+
 @statsd(namespace='dao')
 def dao_fetch_todays_stats_for_all_services(include_from_test_key=True, only_active=True):
+    if todays_stats_enabled():
+        rows = _todays_stats_for_all_services(include_from_test_key, only_active)
+        if rows is not None:
+            return rows
+
     today = date.today()
     start_date = get_local_timezone_midnight_in_utc(today)
     end_date = get_local_timezone_midnight_in_utc(today + timedelta(days=1))
@@ -492,6 +598,7 @@ def dao_suspend_service(service_id):
             api_key.expiry_date = datetime.utcnow()
 
     service.active = False
+    invalidate_service_cache(service_id)
 
 
 @transactional
@@ -499,6 +606,7 @@ def dao_suspend_service(service_id):
 def dao_resume_service(service_id):
     service = Service.query.get(service_id)
     service.active = True
+    invalidate_service_cache(service_id)
 
 
 def dao_fetch_active_users_for_service(service_id):
@@ -1,8 +1,10 @@
 from datetime import datetime
 import uuid
 
+from cachelib import SimpleCache
 from flask import current_app
 from sqlalchemy import asc, desc
+from sqlalchemy.orm.exc import NoResultFound
 
 from app import db
 from app.models import (
@@ -19,6 +21,10 @@ from app.dao.dao_utils import (
 )
 from app.dao.users_dao import get_user_by_id
 
+# template history rows are never changed once written, so each version can be cached for the life of the worker.
+# SimpleCache pickles values, so every hit hands back a fresh copy that can be merged into the session.
+template_history_cache = SimpleCache(threshold=1000, default_timeout=0)
+
 
 @transactional
 @version_class(
@@ -94,6 +100,11 @@ def dao_redact_template(template, user_id):
 
 def dao_get_template_by_id_and_service_id(template_id, service_id, version=None):
     if version is not None:
+        if current_app.config['TEMPLATE_CACHE_ENABLED']:
+            template = dao_get_template_history(template_id, version)
+            if template.hidden or str(template.service_id) != str(service_id):
+                raise NoResultFound()
+            return template
         return TemplateHistory.query.filter_by(
             id=template_id,
             hidden=False,
@@ -104,12 +115,25 @@ def dao_get_template_by_id_and_service_id(template_id, service_id, version=None)
 
 def dao_get_template_by_id(template_id, version=None):
     if version is not None:
+        if current_app.config['TEMPLATE_CACHE_ENABLED']:
+            return dao_get_template_history(template_id, version)
         return TemplateHistory.query.filter_by(
             id=template_id,
             version=version).one()
     return Template.query.filter_by(id=template_id).one()
 
 
+def dao_get_template_history(template_id, version):
+    cache_key = '{}-{}'.format(template_id, version)
+    template = template_history_cache.get(cache_key)
+    if template is not None:
+        return db.session.merge(template, load=False)
+
+    template = TemplateHistory.query.filter_by(id=template_id, version=version).one()
+    template_history_cache.set(cache_key, template)
+    return template
+
+
 def dao_get_all_templates_for_service(service_id, template_type=None):
     if template_type is not None:
         return Template.query.filter_by(
@@ -54,11 +54,25 @@ def create_user_code(user, code, code_type):
 
 
 def get_user_code(user, code, code_type):
-    # Get the most recent codes to try and reduce the
-    # time searching for the correct code.
-    codes = VerifyCode.query.filter_by(
-        user=user, code_type=code_type).order_by(
-        VerifyCode.created_at.desc())
+    verify_code = VerifyCode.query.filter(
+        VerifyCode.user == user,
+        VerifyCode.code_type == code_type,
+        VerifyCode.code_digest == VerifyCode.digest(code)
+    ).order_by(
+        VerifyCode.created_at.desc()
+    ).first()
+    if verify_code:
+        return verify_code
+
+    # Codes saved before they had a digest can only be found by checking their bcrypt hashes
+    # one at a time. Get the most recent codes to try and reduce the time searching for the correct code.
+    codes = VerifyCode.query.filter(
+        VerifyCode.user == user,
+        VerifyCode.code_type == code_type,
+        VerifyCode.code_digest.is_(None)
+    ).order_by(
+        VerifyCode.created_at.desc()
+    )
     return next((x for x in codes if x.check_code(code)), None)
 
 
@@ -15,11 +15,14 @@ from app.dao.notifications_dao import (
     dao_update_notification
 )
 from app.dao.provider_details_dao import (
+    dao_get_active_provider_identifiers,
     get_provider_details_by_notification_type,
     dao_toggle_sms_provider
 )
 from app.celery.research_mode_tasks import send_sms_response, send_email_response
 from app.dao.templates_dao import dao_get_template_by_id
+from app.delivery.sent_status_buffer import sent_status_buffer, sent_status_buffer_enabled
+from app.delivery.snapshots import DeliverySnapshot
 from app.exceptions import NotificationTechnicalFailureException, MalwarePendingException
 from app.feature_flags import is_provider_enabled
 from app.models import (
@@ -70,7 +73,7 @@ def send_sms_to_provider(notification):
                 )
             except Exception as e:
                 notification.billable_units = template.fragment_count
-                dao_update_notification(notification)
+                _update_notification(notification)
                 dao_toggle_sms_provider(provider.name)
                 raise e
             else:
@@ -183,22 +186,38 @@ def send_email_to_provider(notification):
         statsd_client.timing("email.total-time", delta_milliseconds)
 
 
+def _update_notification(notification):
+    # a delivery snapshot wasn't read from the database, so only the fields that sending changes are written back
+    if isinstance(notification, DeliverySnapshot):
+        notification.save()
+    else:
+        dao_update_notification(notification)
+
+
 def update_notification_to_sending(notification, provider):
     notification.sent_at = datetime.utcnow()
     notification.sent_by = provider.get_name()
     # We currently have no callback method for SNS
     # notification.status = NOTIFICATION_SENT if notification.international else NOTIFICATION_SENDING
     notification.status = NOTIFICATION_SENT if notification.notification_type == "sms" else NOTIFICATION_SENDING
-    dao_update_notification(notification)
+    if sent_status_buffer_enabled():
+        sent_status_buffer.add(notification)
+    else:
+        _update_notification(notification)
 
 
-def should_use_provider(provider):
-    return provider.active and is_provider_enabled(current_app, provider.identifier)
+def active_provider_identifiers(notification_type, international=False):
+    if current_app.config['PROVIDER_CACHE_ENABLED']:
+        return dao_get_active_provider_identifiers(notification_type, international)
+    return [
+        p.identifier for p in get_provider_details_by_notification_type(notification_type, international) if p.active
+    ]
 
 
 def provider_to_use(notification_type, notification_id, international=False):
     active_providers_in_order = [
-        p for p in get_provider_details_by_notification_type(notification_type, international) if should_use_provider(p)
+        identifier for identifier in active_provider_identifiers(notification_type, international)
+        if is_provider_enabled(current_app, identifier)
     ]
 
     if not active_providers_in_order:
@@ -207,7 +226,7 @@ def provider_to_use(notification_type, notification_id, international=False):
         )
         raise Exception("No active {} providers".format(notification_type))
 
-    return clients.get_client_by_name_and_type(active_providers_in_order[0].identifier, notification_type)
+    return clients.get_client_by_name_and_type(active_providers_in_order[0], notification_type)
 
 
 def get_logo_url(base_url, logo_file):
@@ -241,7 +260,7 @@ def get_html_email_options(service):
 
 def technical_failure(notification):
     notification.status = NOTIFICATION_TECHNICAL_FAILURE
-    dao_update_notification(notification)
+    _update_notification(notification)
     raise NotificationTechnicalFailureException(
         "Send {} for notification id {} to provider is not allowed: service {} is inactive".format(
             notification.notification_type,
@@ -251,7 +270,7 @@ def technical_failure(notification):
 
 def malware_failure(notification):
     notification.status = NOTIFICATION_VIRUS_SCAN_FAILED
-    dao_update_notification(notification)
+    _update_notification(notification)
     raise NotificationTechnicalFailureException(
         "Send {} for notification id {} to provider is not allowed. Notification contains malware".format(
             notification.notification_type,
@@ -271,7 +290,7 @@ def contains_pii(notification, text_content):
 
 def fail_pii(notification, pii_type):
     notification.status = NOTIFICATION_CONTAINS_PII
-    dao_update_notification(notification)
+    _update_notification(notification)
     raise NotificationTechnicalFailureException(
         "Send {} for notification id {} to provider is not allowed. Notification contains PII: {}".format(
             notification.notification_type,
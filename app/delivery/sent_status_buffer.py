@@ -0,0 +1,99 @@
+import threading
+from collections import namedtuple
+
+from celery.signals import worker_process_shutdown
+from flask import current_app
+
+from app import db
+from app.dao.notifications_dao import dao_update_sent_notifications
+from app.models import Notification
+
+
+SentStatus = namedtuple('SentStatus', ['id', 'sent_at', 'sent_by', 'status', 'reference', 'billable_units'])
+
+
+def sent_status_buffer_enabled():
+    return current_app.config['SENT_STATUS_BUFFER_ENABLED']
+
+
+class SentStatusBuffer:
+    '''
+    Collects what happened when this worker process sent notifications to their provider, and writes it with one
+    UPDATE for every `SENT_STATUS_BUFFER_SIZE` notifications, or `SENT_STATUS_BUFFER_INTERVAL_MS` after the first one
+    was collected, whichever comes first.
+
+    Notifications whose status is lost before it is written, if the process dies, are still created in the database,
+    so replay_created_notifications sends them again.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statuses = []
+        self._timer = None
+        self._app = None
+
+    def add(self, notification):
+        if isinstance(notification, Notification) and notification in db.session:
+            # the changes are written by the next flush, so stop the session writing them as well
+            db.session.expunge(notification)
+
+        with self._lock:
+            self._statuses.append(SentStatus(
+                notification.id,
+                notification.sent_at,
+                notification.sent_by,
+                notification.status,
+                notification.reference,
+                notification.billable_units,
+            ))
+            self._app = current_app._get_current_object()
+            full = len(self._statuses) >= current_app.config['SENT_STATUS_BUFFER_SIZE']
+            if not full:
+                self._start_timer()
+
+        if full:
+            self.flush()
+
+    def _start_timer(self):
+        # called with the lock held
+        if self._timer is None:
+            self._timer = threading.Timer(
+                self._app.config['SENT_STATUS_BUFFER_INTERVAL_MS'] / 1000, self._flush_in_app_context
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            statuses, self._statuses = self._statuses, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not statuses:
+            return
+
+        try:
+            dao_update_sent_notifications(statuses)
+        except Exception:
+            current_app.logger.exception('Failed to write the sent statuses of {} notifications'.format(len(statuses)))
+            with self._lock:
+                # keep them to try again, rather than leave the notifications to be sent again, unless so many have
+                # failed that the oldest are better left to replay_created_notifications
+                max_size = current_app.config['SENT_STATUS_BUFFER_MAX_SIZE']
+                self._statuses = (statuses + self._statuses)[-max_size:]
+                if self._statuses:
+                    self._start_timer()
+
+    def _flush_in_app_context(self):
+        with self._app.app_context():
+            self.flush()
+
+
+sent_status_buffer = SentStatusBuffer()
+
+
+@worker_process_shutdown.connect
+def flush_sent_status_buffer(**kwargs):
+    if sent_status_buffer._app is not None:
+        sent_status_buffer._flush_in_app_context()
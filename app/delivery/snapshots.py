@@ -0,0 +1,118 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+
+from app import DATETIME_FORMAT, encryption
+from app.dao.notifications_dao import dao_update_notification_if_status
+from app.models import EMAIL_TYPE, NOTIFICATION_CREATED, NOTIFICATION_SENDING
+
+
+def delivery_snapshots_enabled():
+    return current_app.config['DELIVERY_SNAPSHOTS_ENABLED']
+
+
+def create_delivery_snapshot(notification, service):
+    """
+    Everything a provider task needs to send a notification, encrypted to go in its task message, so that the
+    notification, service, branding and template don't have to be read from the database again to send it.
+
+    The template is referred to by id and version, which never change once saved.
+    """
+    email_branding = service.email_branding if notification.notification_type == EMAIL_TYPE else None
+    return encryption.encrypt({
+        'id': str(notification.id),
+        'notification_type': notification.notification_type,
+        'to': notification.to,
+        'international': notification.international,
+        'personalisation': notification.personalisation,
+        'template_id': str(notification.template_id),
+        'template_version': notification.template_version,
+        'reply_to_text': notification.reply_to_text,
+        'key_type': notification.key_type,
+        'billable_units': notification.billable_units,
+        'created_at': notification.created_at.strftime(DATETIME_FORMAT),
+        'service': {
+            'id': str(service.id),
+            'name': service.name,
+            'active': service.active,
+            'research_mode': service.research_mode,
+            'prefix_sms': service.prefix_sms,
+            'sending_domain': service.sending_domain,
+            'email_from': service.email_from,
+            'email_branding': {
+                'brand_type': email_branding.brand_type,
+                'colour': email_branding.colour,
+                'logo': email_branding.logo,
+                'text': email_branding.text,
+                'name': email_branding.name,
+            } if email_branding else None,
+        },
+    })
+
+
+class DeliverySnapshot:
+    '''
+    A notification as it was when it was queued for delivery, which can be sent in place of the notification itself.
+
+    Only the fields that sending changes are written back, and only while the notification is still created, or
+    still sending if it was claimed.
+    '''
+
+    SAVED_FIELDS = ('status', 'billable_units', 'reference', 'sent_at', 'sent_by')
+
+    def __init__(self, encrypted_snapshot):
+        snapshot = encryption.decrypt(encrypted_snapshot)
+        service = snapshot['service']
+
+        self.id = snapshot['id']
+        self.notification_type = snapshot['notification_type']
+        self.to = snapshot['to']
+        self.international = snapshot['international']
+        self.personalisation = snapshot['personalisation'] or {}
+        self.template_id = snapshot['template_id']
+        self.template_version = snapshot['template_version']
+        self.reply_to_text = snapshot['reply_to_text']
+        self.key_type = snapshot['key_type']
+        self.created_at = datetime.strptime(snapshot['created_at'], DATETIME_FORMAT)
+        self.service_id = service['id']
+        self.service = SimpleNamespace(**dict(
+            service,
+            email_branding=SimpleNamespace(**service['email_branding']) if service['email_branding'] else None
+        ))
+
+        self.billable_units = snapshot['billable_units']
+        self.status = NOTIFICATION_CREATED
+        self.reference = None
+        self.sent_at = None
+        self.sent_by = None
+        self.claimed = False
+
+    def claim(self):
+        '''
+        Moves the notification from created to sending before it's sent, and returns whether it was still created.
+
+        The change is committed straight away, so no lock is held while the provider is called, and a second delivery
+        of the same notification finds that it has already been claimed.
+        '''
+        self.status = NOTIFICATION_SENDING
+        self.claimed = dao_update_notification_if_status(self, NOTIFICATION_CREATED, ('status',))
+        self.status = NOTIFICATION_CREATED
+        return self.claimed
+
+    def release(self):
+        '''
+        Puts a claimed notification that wasn't sent back to created, so that a retry, which reads the notification
+        from the database, sends it.
+        '''
+        if self.claimed and not self.sent_at:
+            dao_update_notification_if_status(self, NOTIFICATION_SENDING, ('status',))
+
+    def save(self):
+        from_status = NOTIFICATION_SENDING if self.claimed else NOTIFICATION_CREATED
+        if not dao_update_notification_if_status(self, from_status, self.SAVED_FIELDS):
+            current_app.logger.warning(
+                "{} {} was no longer created when its delivery was saved as {}".format(
+                    self.notification_type, self.id, self.status
+                )
+            )
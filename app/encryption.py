@@ -1,3 +1,6 @@
+import hashlib
+import hmac
+
 from flask_bcrypt import generate_password_hash, check_password_hash
 
 from itsdangerous import URLSafeSerializer
@@ -22,3 +25,8 @@ def hashpw(password):
 def check_hash(password, hashed_password):
     # If salt is invalid throws a 500 should add try/catch here
     return check_password_hash(hashed_password, password)
+
+
+def hmac_digest(value, key):
+    # for short lived secrets that are looked up by their digest, where bcrypt would be too slow to check them all
+    return hmac.new(key.encode('UTF-8'), value.encode('UTF-8'), hashlib.sha256).hexdigest()
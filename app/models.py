@@ -1,3 +1,4 @@
+import hmac
 import itertools
 import uuid
 import datetime
@@ -30,7 +31,8 @@ from notifications_utils.timezones import convert_local_timezone_to_utc, convert
 
 from app.encryption import (
     hashpw,
-    check_hash
+    check_hash,
+    hmac_digest
 )
 from app import (
     db,
@@ -306,6 +308,7 @@ PRECOMPILED_LETTER = 'precompiled_letter'
 UPLOAD_DOCUMENT = 'upload_document'
 EDIT_FOLDER_PERMISSIONS = 'edit_folder_permissions'
 UPLOAD_LETTERS = 'upload_letters'
+BATCHED_CALLBACKS = 'batched_callbacks'
 
 SERVICE_PERMISSION_TYPES = [
     EMAIL_TYPE,
@@ -319,6 +322,7 @@ SERVICE_PERMISSION_TYPES = [
     UPLOAD_DOCUMENT,
     EDIT_FOLDER_PERMISSIONS,
     UPLOAD_LETTERS,
+    BATCHED_CALLBACKS,
 ]
 
 
@@ -1230,7 +1234,9 @@ class VerifyCode(db.Model):
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), index=True, nullable=False)
     user = db.relationship('User', backref=db.backref('verify_codes', lazy='dynamic'))
-    _code = db.Column(db.String, nullable=False)
+    # bcrypt hash of codes saved before they were looked up by code_digest
+    _code = db.Column(db.String, nullable=True)
+    code_digest = db.Column(db.String, nullable=True)
     code_type = db.Column(db.Enum(*VERIFY_CODE_TYPES, name='verify_code_types'),
                           index=False, unique=False, nullable=False)
     expiry_datetime = db.Column(db.DateTime, nullable=False)
@@ -1242,15 +1248,25 @@ class VerifyCode(db.Model):
         nullable=False,
         default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        Index('ix_verify_codes_user_id_code_digest', 'user_id', 'code_digest'),
+    )
+
+    @staticmethod
+    def digest(cde):
+        return hmac_digest(cde, current_app.config['SECRET_KEY'])
+
     @property
     def code(self):
         raise AttributeError("Code not readable")
 
     @code.setter
     def code(self, cde):
-        self._code = hashpw(cde)
+        self.code_digest = VerifyCode.digest(cde)
 
     def check_code(self, cde):
+        if self.code_digest:
+            return hmac.compare_digest(self.code_digest, VerifyCode.digest(cde))
         return check_hash(cde, self._code)
 
 
@@ -1403,7 +1419,11 @@ class Notification(db.Model):
     client_reference = db.Column(db.String, index=True, nullable=True)
     _personalisation = db.Column(db.String, nullable=True)
 
-    scheduled_notification = db.relationship('ScheduledNotification', uselist=False)
+    scheduled_notification = db.relationship(
+        'ScheduledNotification',
+        primaryjoin='Notification.id == foreign(ScheduledNotification.notification_id)',
+        uselist=False
+    )
 
     client_reference = db.Column(db.String, index=True, nullable=True)
 
@@ -1714,11 +1734,20 @@ class ScheduledNotification(db.Model):
     __tablename__ = 'scheduled_notifications'
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    notification_id = db.Column(UUID(as_uuid=True), db.ForeignKey('notifications.id'), index=True, nullable=False)
-    notification = db.relationship('Notification', uselist=False)
+    # not a foreign key, as a partitioned notifications table can't be referenced by id alone
+    notification_id = db.Column(UUID(as_uuid=True), index=True, nullable=False)
+    notification = db.relationship(
+        'Notification',
+        primaryjoin='foreign(ScheduledNotification.notification_id) == Notification.id',
+        uselist=False
+    )
     scheduled_for = db.Column(db.DateTime, index=False, nullable=False)
     pending = db.Column(db.Boolean, nullable=False, default=True)
 
+    __table_args__ = (
+        Index('ix_scheduled_notifications_pending_scheduled_for', 'scheduled_for', postgresql_where=pending),
+    )
+
 
 INVITE_PENDING = 'pending'
 INVITE_ACCEPTED = 'accepted'
@@ -0,0 +1,136 @@
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import redis_store
+from app.models import KEY_TYPE_TEST, NOTIFICATION_DELIVERED
+
+
+# upper bounds, in seconds, of the histogram buckets that sent-to-delivered times are counted in
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 30, 60, 120, 180, 240, 300, 600, 1200, 1800, 3600, 7200]
+OVERFLOW_BUCKET = '+Inf'
+
+# each histogram covers one minute of deliveries, and is kept for an hour
+HISTOGRAM_TTL = 60 * 60
+
+
+def delivery_latency_histograms_enabled():
+    return current_app.config['DELIVERY_LATENCY_HISTOGRAMS_ENABLED'] and current_app.config['REDIS_ENABLED']
+
+
+def delivery_latency_cache_key(provider, minute):
+    return 'delivery-latency-{}-{}'.format(provider, minute.strftime('%Y-%m-%dT%H:%M'))
+
+
+def _bucket(latency_in_seconds):
+    index = bisect_right(LATENCY_BUCKETS, latency_in_seconds)
+    return str(LATENCY_BUCKETS[index]) if index < len(LATENCY_BUCKETS) else OVERFLOW_BUCKET
+
+
+def record_delivery_latencies(notifications):
+    """
+    Count how long each delivered notification took from being sent to the provider to being delivered, in the
+    histogram of its provider for the current minute.
+
+    The notifications can be any objects with the notification's status, key_type, sent_by, sent_at and updated_at.
+    """
+    counts = Counter(
+        (notification.sent_by, _bucket((notification.updated_at - notification.sent_at).total_seconds()))
+        for notification in notifications
+        if notification.status == NOTIFICATION_DELIVERED
+        and notification.key_type != KEY_TYPE_TEST
+        and notification.sent_by
+        and notification.sent_at
+        and notification.updated_at
+    )
+    if not counts or not delivery_latency_histograms_enabled():
+        return
+
+    minute = datetime.utcnow()
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        for (provider, bucket), count in counts.items():
+            cache_key = delivery_latency_cache_key(provider, minute)
+            pipeline.hincrby(cache_key, bucket, count)
+            pipeline.expire(cache_key, HISTOGRAM_TTL)
+        pipeline.execute()
+    except Exception:
+        current_app.logger.exception('Failed to record delivery latencies for providers {}'.format(
+            {provider for provider, _ in counts}
+        ))
+
+
+def get_delivery_latency_histogram(provider, minutes):
+    """
+    Returns a Counter of deliveries by the upper bound of their latency bucket, over the last `minutes` minutes.
+    """
+    now = datetime.utcnow()
+    pipeline = redis_store.redis_store.pipeline(transaction=False)
+    for minutes_ago in range(minutes):
+        pipeline.hgetall(delivery_latency_cache_key(provider, now - timedelta(minutes=minutes_ago)))
+
+    histogram = Counter()
+    for buckets in pipeline.execute():
+        for bucket, count in buckets.items():
+            bucket = bucket.decode('utf-8') if isinstance(bucket, bytes) else bucket
+            histogram[bucket] += int(count)
+    return histogram
+
+
+def _ordered_buckets(histogram):
+    for bound in LATENCY_BUCKETS:
+        yield bound, histogram.get(str(bound), 0)
+    yield float('inf'), histogram.get(OVERFLOW_BUCKET, 0)
+
+
+def latency_percentile(histogram, percentile):
+    """
+    The upper bound, in seconds, of the bucket that the given percentile of deliveries falls in, or None if there
+    were no deliveries. Deliveries slower than the largest bucket give infinity.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    running_total = 0
+    for bound, count in _ordered_buckets(histogram):
+        running_total += count
+        if running_total >= total * percentile / 100:
+            return bound
+
+
+def slow_delivery_ratio(histogram, delivery_time):
+    """
+    The fraction of deliveries that took at least `delivery_time`, which must be one of the bucket bounds.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return 0
+
+    delivery_seconds = delivery_time.total_seconds()
+    fast = sum(count for bound, count in _ordered_buckets(histogram) if bound <= delivery_seconds)
+    return (total - fast) / total
+
+
+def is_delivery_slow(provider, threshold, delivery_time, minutes, undelivered=0, slow_undelivered=0):
+    """
+    Whether at least `threshold` of the notifications sent by a provider in the last `minutes` minutes were slow.
+
+    The histogram only has delivered notifications, so `undelivered` and `slow_undelivered` count the ones still
+    waiting for a receipt, and how many of them have been waiting at least `delivery_time`. Without them a provider
+    that stopped sending receipts altogether would never look slow.
+    """
+    histogram = get_delivery_latency_histogram(provider, minutes)
+    delivered = sum(histogram.values())
+    total = delivered + undelivered
+    if not total:
+        return False
+
+    slow = slow_delivery_ratio(histogram, delivery_time) * delivered + slow_undelivered
+    ratio = slow / total
+    current_app.logger.info("Slow delivery notifications ratio for provider {}: {} out of {} notifications".format(
+        provider, ratio, total
+    ))
+    return ratio >= threshold
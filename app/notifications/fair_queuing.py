@@ -0,0 +1,83 @@
+import time
+
+from flask import current_app
+
+from app import redis_store
+from app.config import QueueNames
+from app.models import EMAIL_TYPE, SMS_TYPE
+from app.notifications.sending_limits import RATE_LIMIT_INTERVAL
+
+
+SEND_QUEUES = {SMS_TYPE: QueueNames.SEND_SMS, EMAIL_TYPE: QueueNames.SEND_EMAIL}
+BULK_QUEUES = {SMS_TYPE: QueueNames.BULK_SMS, EMAIL_TYPE: QueueNames.BULK_EMAIL}
+
+# Advances a service's virtual clock by the time its notifications take to send at its fair share of the send queues,
+# starting from now if the clock has fallen behind, and returns how far ahead of now the clock was beforehand. The
+# key expires once the clock would have fallen behind anyway.
+#
+# KEYS: virtual clock
+# ARGV: notification count, notifications per second, now
+VIRTUAL_CLOCK_SCRIPT = """
+local now = tonumber(ARGV[3])
+local clock = math.max(now, tonumber(redis.call('GET', KEYS[1]) or '0'))
+local lag = clock - now
+clock = clock + tonumber(ARGV[1]) / tonumber(ARGV[2])
+redis.call('SET', KEYS[1], tostring(clock), 'EX', math.ceil(clock - now) + 1)
+return tostring(lag)
+"""
+
+
+def fair_queuing_enabled():
+    return current_app.config['FAIR_QUEUING_ENABLED'] and current_app.config['REDIS_ENABLED']
+
+
+def virtual_clock_cache_key(service_id, notification_type):
+    return 'service-{}-{}-virtual-clock'.format(service_id, notification_type)
+
+
+def send_queues(notification_type, service, notification_count=1):
+    """
+    Returns the queue each of `notification_count` notifications of a service should be sent to for delivery.
+
+    Each service has a virtual clock for each notification type, which every notification moves on by the time it
+    takes to send at the service's rate limit. A service sending within its rate limit keeps its clock close to now,
+    so its notifications go to the send queue. Notifications from a service whose clock is more than
+    FAIR_QUEUING_MAX_LAG_SECONDS ahead, like the rows of a large job, go to the bulk queue instead, so they don't hold
+    up other services' notifications behind them.
+
+    Only job rows move the clock on. Notifications sent through the API or one at a time always go to the send queue,
+    so a service's own 2FA codes and password resets never wait behind its jobs.
+
+    Workers take tasks from the send and bulk queues in turn, so the bulk queue always gets a share of the workers and
+    all of them when nothing else is waiting. If Redis can't be reached every notification goes to the send queue.
+    """
+    send_queue, bulk_queue = SEND_QUEUES[notification_type], BULK_QUEUES[notification_type]
+    if not fair_queuing_enabled():
+        return [send_queue] * notification_count
+
+    notifications_per_second = max(service.rate_limit, 1) / RATE_LIMIT_INTERVAL
+    try:
+        advance_clock = redis_store.redis_store.register_script(VIRTUAL_CLOCK_SCRIPT)
+        lag = float(advance_clock(
+            keys=[virtual_clock_cache_key(service.id, notification_type)],
+            args=[notification_count, repr(notifications_per_second), repr(time.time())]
+        ))
+    except Exception:
+        current_app.logger.exception('Failed to advance the virtual clock of service {}'.format(service.id))
+        return [send_queue] * notification_count
+
+    max_lag = current_app.config['FAIR_QUEUING_MAX_LAG_SECONDS']
+    # the lag before the nth notification is its clock's lag plus n times the time it takes to send one
+    within_share = 0 if lag > max_lag else min(notification_count, int((max_lag - lag) * notifications_per_second) + 1)
+    return [send_queue] * within_share + [bulk_queue] * (notification_count - within_share)
+
+
+def send_queue(notification, service=None):
+    """
+    The queue a notification should be sent to for delivery, from send_queues if it's a job row.
+    """
+    if not fair_queuing_enabled() or not notification.job_id:
+        return SEND_QUEUES[notification.notification_type]
+
+    queue, = send_queues(notification.notification_type, service or notification.service)
+    return queue
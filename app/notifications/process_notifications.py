@@ -1,4 +1,5 @@
 import uuid
+from collections import Counter
 from datetime import datetime
 
 from flask import current_app
@@ -15,6 +16,7 @@ from app import redis_store
 from app.celery import provider_tasks
 from app.celery.letters_pdf_tasks import create_letters_pdf
 from app.config import QueueNames
+from app.delivery.snapshots import create_delivery_snapshot, delivery_snapshots_enabled
 
 from app.models import (
     EMAIL_TYPE,
@@ -27,7 +29,9 @@ from app.models import (
 )
 from app.dao.notifications_dao import (
     dao_create_notification,
+    dao_create_notifications,
     dao_delete_notifications_by_id,
+    dao_delete_notifications_by_ids,
     dao_created_scheduled_notification
 )
 
@@ -48,7 +52,7 @@ def check_placeholders(template_object):
         raise BadRequestError(fields=[{'template': message}], message=message)
 
 
-def persist_notification(
+def build_notification(
     *,
     template_id,
     template_version,
@@ -64,7 +68,6 @@ def persist_notification(
     reference=None,
     client_reference=None,
     notification_id=None,
-    simulated=False,
     created_by_id=None,
     status=NOTIFICATION_CREATED,
     reply_to_text=None,
@@ -109,20 +112,89 @@ def persist_notification(
     elif notification_type == LETTER_TYPE:
         notification.postage = postage or template_postage
 
+    return notification
+
+
+def persist_notification(*, simulated=False, **kwargs):
+    notification = build_notification(**kwargs)
+
     # if simulated create a Notification model to return but do not persist the Notification to the dB
     if not simulated:
         dao_create_notification(notification)
-        if key_type != KEY_TYPE_TEST:
-            if redis_store.get(redis.daily_limit_cache_key(service.id)):
-                redis_store.incr(redis.daily_limit_cache_key(service.id))
+        # with atomic sending limits the daily count is added to when the limits are checked, not here
+        if notification.key_type != KEY_TYPE_TEST and not current_app.config['ATOMIC_SENDING_LIMITS_ENABLED']:
+            if redis_store.get(redis.daily_limit_cache_key(notification.service_id)):
+                redis_store.incr(redis.daily_limit_cache_key(notification.service_id))
 
         current_app.logger.info(
-            "{} {} created at {}".format(notification_type, notification_id, notification_created_at)
+            "{} {} created at {}".format(notification.notification_type, notification.id, notification.created_at)
         )
     return notification
 
 
-def send_notification_to_queue(notification, research_mode, queue=None):
+def persist_notifications_bulk(notifications):
+    """
+    Build and save many notifications with a single multi-row INSERT and a single commit.
+
+    `notifications` is a list of dicts of the keyword arguments taken by `persist_notification`. Notifications whose
+    id already exists are skipped, so a batch can safely be retried. Returns the notifications that were created.
+    """
+    notifications = [build_notification(**kwargs) for kwargs in notifications]
+    created_ids = {str(notification_id) for notification_id in dao_create_notifications(notifications)}
+    created_notifications = [n for n in notifications if str(n.id) in created_ids]
+
+    increment_daily_limit_counts(Counter(
+        notification.service_id for notification in created_notifications if notification.key_type != KEY_TYPE_TEST
+    ))
+
+    current_app.logger.info(
+        "{} notifications created out of a batch of {}".format(len(created_notifications), len(notifications))
+    )
+    return created_notifications
+
+
+# Only increment the daily count if it is already cached - it is populated from the database with an expiry
+# by check_service_over_daily_message_limit, and creating it here would leave a partial count that never expires.
+INCREMENT_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+def increment_daily_limit_counts(counts_by_service_id):
+    """
+    Add to the cached daily message count of each service in one Redis round trip, rather than a GET and an INCR
+    per notification.
+    """
+    if not counts_by_service_id or not redis_store.active or current_app.config['ATOMIC_SENDING_LIMITS_ENABLED']:
+        return
+
+    try:
+        client = redis_store.redis_store
+        increment_if_exists = client.register_script(INCREMENT_IF_EXISTS_SCRIPT)
+        pipeline = client.pipeline(transaction=False)
+        for service_id, count in counts_by_service_id.items():
+            increment_if_exists(keys=[redis.daily_limit_cache_key(service_id)], args=[count], client=pipeline)
+        pipeline.execute()
+    except Exception:
+        current_app.logger.exception('Failed to increment daily limit counts for services {}'.format(
+            list(counts_by_service_id)
+        ))
+
+
+def delivery_task_args(notification, service=None):
+    """
+    The arguments for the deliver_sms or deliver_email task of a notification, which include a snapshot of everything
+    needed to send it when delivery snapshots are enabled.
+    """
+    if delivery_snapshots_enabled():
+        return [str(notification.id), create_delivery_snapshot(notification, service or notification.service)]
+    return [str(notification.id)]
+
+
+def _delivery_task(notification, research_mode, queue=None):
     if research_mode or notification.key_type == KEY_TYPE_TEST:
         queue = QueueNames.RESEARCH_MODE
 
@@ -139,8 +211,19 @@ def send_notification_to_queue(notification, research_mode, queue=None):
             queue = QueueNames.CREATE_LETTERS_PDF
         deliver_task = create_letters_pdf
 
+    if notification.notification_type == LETTER_TYPE:
+        args = [str(notification.id)]
+    else:
+        args = delivery_task_args(notification)
+
+    return deliver_task, args, queue
+
+
+def send_notification_to_queue(notification, research_mode, queue=None):
+    deliver_task, args, queue = _delivery_task(notification, research_mode, queue)
+
     try:
-        deliver_task.apply_async([str(notification.id)], queue=queue)
+        deliver_task.apply_async(args, queue=queue)
     except Exception:
         dao_delete_notifications_by_id(notification.id)
         raise
@@ -151,6 +234,30 @@ def send_notification_to_queue(notification, research_mode, queue=None):
                                                          queue))
 
 
+def send_notifications_to_queue(notifications, research_mode, queue=None):
+    """
+    Queue a batch of notifications for delivery, stopping at the first one that can't be queued.
+
+    The notifications that weren't queued are deleted, so none are left saved with nothing to send them. Returns the
+    ids of the notifications that were queued.
+    """
+    queued_ids = []
+    try:
+        for notification in notifications:
+            deliver_task, args, notification_queue = _delivery_task(notification, research_mode, queue)
+            deliver_task.apply_async(args, queue=notification_queue)
+            queued_ids.append(notification.id)
+    except Exception:
+        current_app.logger.exception(
+            "Failed to queue {} of a batch of {} notifications for delivery".format(
+                len(notifications) - len(queued_ids), len(notifications))
+        )
+        dao_delete_notifications_by_ids([notification.id for notification in notifications[len(queued_ids):]])
+
+    current_app.logger.debug("{} notifications sent to the queue for delivery".format(len(queued_ids)))
+    return queued_ids
+
+
 def simulated_recipient(to_address, notification_type):
     if notification_type == SMS_TYPE:
         formatted_simulated_numbers = [
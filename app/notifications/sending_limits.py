@@ -0,0 +1,120 @@
+import time
+import uuid
+
+from flask import current_app
+from notifications_utils.clients.redis import daily_limit_cache_key, rate_limit_cache_key
+
+from app import redis_store
+
+
+RATE_LIMIT_INTERVAL = 60
+
+WITHIN_LIMITS = 0
+OVER_RATE_LIMIT = 1
+OVER_DAILY_LIMIT = 2
+
+# Checks a service's daily message count and its token bucket for the per minute rate limit, and only if neither is
+# exceeded takes one token for each notification from the bucket and adds the notifications to the daily count.
+# Running it as one script makes the check and the update a single atomic round trip.
+#
+# KEYS: daily count, token bucket
+# ARGV: notification count, daily limit (-1 to skip), daily count ttl, rate limit (-1 to skip), interval, now
+SENDING_LIMITS_SCRIPT = """
+local notification_count = tonumber(ARGV[1])
+local daily_limit = tonumber(ARGV[2])
+local rate_limit = tonumber(ARGV[4])
+local sent = tonumber(redis.call('GET', KEYS[1]) or '0')
+
+if daily_limit >= 0 and sent + notification_count > daily_limit then
+    return {2, sent}
+end
+
+if rate_limit >= 0 then
+    local interval = tonumber(ARGV[5])
+    local now = tonumber(ARGV[6])
+    local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or rate_limit
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(rate_limit, tokens + math.max(0, now - updated_at) * rate_limit / interval)
+    if tokens < notification_count then
+        return {1, sent}
+    end
+    redis.call('HMSET', KEYS[2], 'tokens', tostring(tokens - notification_count), 'updated_at', ARGV[6])
+    redis.call('EXPIRE', KEYS[2], interval)
+end
+
+if daily_limit >= 0 then
+    sent = redis.call('INCRBY', KEYS[1], notification_count)
+    if redis.call('TTL', KEYS[1]) < 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+    end
+end
+
+return {0, sent}
+"""
+
+
+def rate_limit_bucket_key(service_id, key_type):
+    # kept apart from the sorted set used by redis_store.exceeded_rate_limit so the two can run side by side
+    return '{}-bucket'.format(rate_limit_cache_key(service_id, key_type))
+
+
+def exceeded_rate_limit_for_notifications(cache_key, limit, interval, notification_count):
+    """
+    Like redis_store.exceeded_rate_limit, but counts one request in the sorted set for each of `notification_count`
+    notifications sent by a single request.
+    """
+    now = int(time.time() * 1000)
+    try:
+        pipeline = redis_store.redis_store.pipeline()
+        # members have to be unique for each notification to be counted, even when sent in the same millisecond
+        pipeline.zadd(cache_key, {'{}-{}'.format(now, uuid.uuid4()): now for _ in range(notification_count)})
+        pipeline.zremrangebyscore(cache_key, '-inf', now - interval * 1000)
+        pipeline.zcard(cache_key)
+        pipeline.expire(cache_key, interval)
+        return pipeline.execute()[2] > limit
+    except Exception:
+        current_app.logger.exception('Failed to check the rate limit {}'.format(cache_key))
+        return False
+
+
+def consume_sending_allowance(service, key_type, notification_count=1, check_rate_limit=True, check_daily_limit=True):
+    """
+    Uses up `notification_count` of both a service's rate limit and its daily message limit, unless that would exceed
+    either of them.
+
+    Returns one of WITHIN_LIMITS, OVER_RATE_LIMIT or OVER_DAILY_LIMIT, and the service's message count for today. If
+    Redis can't be reached the service is let through, and the count is None.
+    """
+    try:
+        client = redis_store.redis_store
+        consume = client.register_script(SENDING_LIMITS_SCRIPT)
+        result, sent = consume(
+            keys=[daily_limit_cache_key(service.id), rate_limit_bucket_key(service.id, key_type)],
+            args=[
+                notification_count,
+                service.message_limit if check_daily_limit else -1,
+                current_app.config['DAILY_LIMIT_COUNT_TTL'],
+                service.rate_limit if check_rate_limit else -1,
+                RATE_LIMIT_INTERVAL,
+                repr(time.time()),
+            ]
+        )
+    except Exception:
+        current_app.logger.exception('Failed to check sending limits for service {}'.format(service.id))
+        return WITHIN_LIMITS, None
+
+    return int(result), int(sent)
+
+
+def set_daily_limit_counts(counts_by_service_id):
+    """
+    Overwrite the cached daily message count of each service, in one Redis round trip.
+    """
+    if not counts_by_service_id:
+        return
+
+    pipeline = redis_store.redis_store.pipeline(transaction=False)
+    for service_id, count in counts_by_service_id.items():
+        pipeline.set(daily_limit_cache_key(service_id), count, ex=current_app.config['DAILY_LIMIT_COUNT_TTL'])
+    pipeline.execute()
@@ -0,0 +1,160 @@
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from flask import current_app
+from notifications_utils.timezones import convert_utc_to_local_timezone
+
+from app import redis_store
+
+
+TODAYS_STATS_TTL = 2 * 24 * 60 * 60
+
+# set in each service's hash when it is counted from the database, so that a hash that is missing, or was only
+# started by counting new notifications after being lost, isn't mistaken for the full day's statistics
+RECONCILED_FIELD = 'reconciled'
+
+TodaysStat = namedtuple('TodaysStat', ['template_id', 'notification_type', 'key_type', 'status', 'count'])
+
+
+def todays_stats_enabled():
+    return current_app.config['TODAYS_STATS_CACHE_ENABLED'] and current_app.config['REDIS_ENABLED']
+
+
+def todays_stats_cache_key(service_id, day):
+    return 'service-{}-notification-statuses-{}'.format(service_id, day.strftime('%Y-%m-%d'))
+
+
+def local_day(created_at):
+    return convert_utc_to_local_timezone(created_at).date()
+
+
+def _field(template_id, notification_type, key_type, status):
+    return '{}:{}:{}:{}'.format(template_id, notification_type, key_type, status)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def record_notifications_created(notifications):
+    """
+    Count new notifications in their service's statistics for the day they were created.
+    """
+    _increment(Counter(
+        (
+            notification.service_id,
+            local_day(notification.created_at or datetime.utcnow()),
+            _field(notification.template_id, notification.notification_type, notification.key_type, notification.status)
+        )
+        for notification in notifications
+    ))
+
+
+def record_status_changes(changes):
+    """
+    Move notifications from their old status to their new one in their service's statistics.
+
+    `changes` is an iterable of (notification, old_status) pairs, where the notification can be any object with the
+    notification's service_id, template_id, notification_type, key_type, created_at and new status.
+    """
+    counts = Counter()
+    for notification, old_status in changes:
+        if old_status == notification.status:
+            continue
+        key = (notification.service_id, local_day(notification.created_at))
+        counts[key + (_field(
+            notification.template_id, notification.notification_type, notification.key_type, old_status
+        ),)] -= 1
+        counts[key + (_field(
+            notification.template_id, notification.notification_type, notification.key_type, notification.status
+        ),)] += 1
+    _increment(counts)
+
+
+def _increment(counts):
+    counts = {key: count for key, count in counts.items() if count}
+    if not counts or not todays_stats_enabled():
+        return
+
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        for (service_id, day, field), count in counts.items():
+            cache_key = todays_stats_cache_key(service_id, day)
+            pipeline.hincrby(cache_key, field, count)
+            pipeline.expire(cache_key, TODAYS_STATS_TTL)
+        pipeline.execute()
+    except Exception:
+        current_app.logger.exception('Failed to update todays notification statistics')
+
+
+def get_todays_stats_for_services(service_ids):
+    """
+    Returns a dict of each service's TodaysStat rows for the current local day, or None if they can't be read.
+
+    A service's rows are None if its statistics haven't been counted from the database today by set_todays_stats,
+    for example because Redis was flushed or they have only just been enabled.
+    """
+    today = local_day(datetime.utcnow())
+    try:
+        pipeline = redis_store.redis_store.pipeline(transaction=False)
+        for service_id in service_ids:
+            pipeline.hgetall(todays_stats_cache_key(service_id, today))
+        results = pipeline.execute()
+    except Exception:
+        current_app.logger.exception('Failed to read todays notification statistics')
+        return None
+
+    stats = {}
+    for service_id, fields in zip(service_ids, results):
+        fields = {_decode(field): count for field, count in fields.items()}
+        if RECONCILED_FIELD not in fields:
+            stats[service_id] = None
+            continue
+
+        stats[service_id] = []
+        for field, count in fields.items():
+            count = int(count)
+            if field != RECONCILED_FIELD and count > 0:
+                template_id, notification_type, key_type, status = field.split(':')
+                stats[service_id].append(TodaysStat(template_id, notification_type, key_type, status, count))
+    return stats
+
+
+def get_todays_stats_for_service(service_id):
+    stats = get_todays_stats_for_services([service_id])
+    return None if stats is None else stats[service_id]
+
+
+def count_by(stats, *fields):
+    """
+    Sum TodaysStat rows into rows of the given fields and a count.
+    """
+    Row = namedtuple('Row', fields + ('count',))
+    counts = Counter()
+    for stat in stats:
+        counts[tuple(getattr(stat, field) for field in fields)] += stat.count
+    return [Row(*key, count) for key, count in counts.items()]
+
+
+def set_todays_stats(day, rows, service_ids=()):
+    """
+    Overwrite the statistics of every service in `rows` or `service_ids` for a day. Each row has a service_id,
+    template_id, notification_type, key_type, status and count. Services in `service_ids` without any rows are saved
+    as having no notifications.
+    """
+    fields_by_service_id = {service_id: {RECONCILED_FIELD: 1} for service_id in service_ids}
+    for row in rows:
+        fields_by_service_id.setdefault(row.service_id, {RECONCILED_FIELD: 1})[
+            _field(row.template_id, row.notification_type, row.key_type, row.status)
+        ] = row.count
+
+    if not fields_by_service_id:
+        return
+
+    pipeline = redis_store.redis_store.pipeline(transaction=True)
+    for service_id, fields in fields_by_service_id.items():
+        cache_key = todays_stats_cache_key(service_id, day)
+        pipeline.delete(cache_key)
+        pipeline.hset(cache_key, mapping=fields)
+        pipeline.expire(cache_key, TODAYS_STATS_TTL)
+    pipeline.execute()
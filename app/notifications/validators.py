@@ -18,22 +18,77 @@ from app.service.utils import service_allowed_to_send_to
 from app.v2.errors import TooManyRequestsError, BadRequestError, RateLimitError
 from app import redis_store
 from app.notifications.process_notifications import create_content_for_notification
+from app.notifications.sending_limits import (
+    consume_sending_allowance,
+    exceeded_rate_limit_for_notifications,
+    OVER_DAILY_LIMIT,
+    OVER_RATE_LIMIT,
+    RATE_LIMIT_INTERVAL,
+)
 from app.utils import get_public_notify_type_text
 from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
 from app.dao.service_letter_contact_dao import dao_get_letter_contact_by_id
 
 
-def check_service_over_api_rate_limit(service, api_key):
+def check_service_over_api_rate_limit(service, api_key, notification_count=1):
     if current_app.config['API_RATE_LIMIT_ENABLED'] and current_app.config['REDIS_ENABLED']:
         cache_key = rate_limit_cache_key(service.id, api_key.key_type)
         rate_limit = service.rate_limit
         interval = 60
-        if redis_store.exceeded_rate_limit(cache_key, rate_limit, interval):
+        if notification_count == 1:
+            exceeded = redis_store.exceeded_rate_limit(cache_key, rate_limit, interval)
+        else:
+            exceeded = exceeded_rate_limit_for_notifications(cache_key, rate_limit, interval, notification_count)
+        if exceeded:
             current_app.logger.info("service {} has been rate limited for throughput".format(service.id))
             raise RateLimitError(rate_limit, interval, api_key.key_type)
 
 
-def check_service_over_daily_message_limit(key_type, service):
+def atomic_sending_limits_enabled():
+    return current_app.config['ATOMIC_SENDING_LIMITS_ENABLED'] and current_app.config['REDIS_ENABLED']
+
+
+def check_sending_limits(service, key_type, notification_count=1, check_rate_limit=True):
+    """
+    Check, and use up, a service's rate limit and daily message limit in a single Redis call.
+    """
+    check_rate_limit = check_rate_limit and current_app.config['API_RATE_LIMIT_ENABLED']
+    check_daily_limit = current_app.config['API_MESSAGE_LIMIT_ENABLED'] and key_type != KEY_TYPE_TEST
+    if not check_rate_limit and not check_daily_limit:
+        return
+
+    result, service_stats = consume_sending_allowance(
+        service,
+        key_type,
+        notification_count=notification_count,
+        check_rate_limit=check_rate_limit,
+        check_daily_limit=check_daily_limit
+    )
+
+    if result == OVER_RATE_LIMIT:
+        current_app.logger.info("service {} has been rate limited for throughput".format(service.id))
+        raise RateLimitError(service.rate_limit, RATE_LIMIT_INTERVAL, key_type)
+
+    if result == OVER_DAILY_LIMIT:
+        current_app.logger.info(
+            "service {} has been rate limited for daily use sent {} limit {}".format(
+                service.id, service_stats, service.message_limit)
+        )
+        raise TooManyRequestsError(service.message_limit)
+
+    if check_daily_limit and service_stats is not None and service.message_limit - service_stats <= 100:
+        current_app.logger.info('service {} nearing daily limit {} - {}'.format(
+            service.id,
+            service.message_limit,
+            service_stats
+        ))
+
+
+def check_service_over_daily_message_limit(key_type, service, notification_count=1):
+    if atomic_sending_limits_enabled():
+        check_sending_limits(service, key_type, notification_count=notification_count, check_rate_limit=False)
+        return
+
     if current_app.config['API_MESSAGE_LIMIT_ENABLED'] \
             and key_type != KEY_TYPE_TEST \
             and current_app.config['REDIS_ENABLED']:
@@ -50,7 +105,7 @@ def check_service_over_daily_message_limit(key_type, service):
                 service_stats
             ))
 
-        if int(service_stats) >= service.message_limit:
+        if int(service_stats) + notification_count > service.message_limit:
             current_app.logger.info(
                 "service {} has been rate limited for daily use sent {} limit {}".format(
                     service.id, int(service_stats), service.message_limit)
@@ -58,9 +113,13 @@ def check_service_over_daily_message_limit(key_type, service):
             raise TooManyRequestsError(service.message_limit)
 
 
-def check_rate_limiting(service, api_key):
-    check_service_over_api_rate_limit(service, api_key)
-    check_service_over_daily_message_limit(api_key.key_type, service)
+def check_rate_limiting(service, api_key, notification_count=1):
+    if atomic_sending_limits_enabled():
+        check_sending_limits(service, api_key.key_type, notification_count=notification_count)
+        return
+
+    check_service_over_api_rate_limit(service, api_key, notification_count=notification_count)
+    check_service_over_daily_message_limit(api_key.key_type, service, notification_count=notification_count)
 
 
 def check_template_is_for_notification_type(notification_type, template_type):
@@ -131,7 +190,7 @@ def check_sms_content_char_count(content_count):
         raise BadRequestError(message=message)
 
 
-def validate_template(template_id, personalisation, service, notification_type):
+def validate_template_for_service(template_id, service, notification_type):
     try:
         template = templates_dao.dao_get_template_by_id_and_service_id(
             template_id=template_id,
@@ -144,6 +203,11 @@ def validate_template(template_id, personalisation, service, notification_type):
 
     check_template_is_for_notification_type(notification_type, template.template_type)
     check_template_is_active(template)
+    return template
+
+
+def validate_template(template_id, personalisation, service, notification_type):
+    template = validate_template_for_service(template_id, service, notification_type)
     template_with_content = create_content_for_notification(template, personalisation)
     if template.template_type == SMS_TYPE:
         check_sms_content_char_count(template_with_content.content_count)
@@ -8,6 +8,12 @@ from app.dao.provider_details_dao import (
     dao_get_provider_versions
 )
 from app.dao.users_dao import get_user_by_id
+from app.notifications.delivery_latency import (
+    delivery_latency_histograms_enabled,
+    get_delivery_latency_histogram,
+    latency_percentile,
+    OVERFLOW_BUCKET,
+)
 from app.errors import (
     register_errors,
     InvalidRequest
@@ -54,6 +60,35 @@ def get_provider_versions(provider_details_id):
     return jsonify(data=data)
 
 
+@provider_details.route('/<uuid:provider_details_id>/delivery-latency', methods=['GET'])
+def get_provider_delivery_latency(provider_details_id):
+    if not delivery_latency_histograms_enabled():
+        raise InvalidRequest('Delivery latency histograms are not enabled', status_code=400)
+
+    minutes = request.args.get('minutes', 10, type=int)
+    if not 1 <= minutes <= 60:
+        raise InvalidRequest({'minutes': ['Must be between 1 and 60']}, status_code=400)
+
+    provider = get_provider_details_by_id(provider_details_id)
+    if not provider:
+        raise InvalidRequest('Provider not found', status_code=404)
+    histogram = get_delivery_latency_histogram(provider.identifier, minutes)
+
+    def percentile(value):
+        bound = latency_percentile(histogram, value)
+        return OVERFLOW_BUCKET if bound == float('inf') else bound
+
+    return jsonify(data={
+        'identifier': provider.identifier,
+        'minutes': minutes,
+        'deliveries': sum(histogram.values()),
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'histogram': histogram,
+    })
+
+
 @provider_details.route('/<uuid:provider_details_id>', methods=['POST'])
 def update_provider_details(provider_details_id):
     valid_keys = {'priority', 'created_by', 'active'}
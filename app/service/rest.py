@@ -5,6 +5,7 @@ from flask import (
     jsonify,
     request,
     current_app,
+    url_for,
     Blueprint
 )
 from notifications_utils.letter_timings import letter_can_be_cancelled
@@ -374,10 +375,13 @@ def get_all_notifications_for_service(service_id):
     data = notifications_filter_schema.load(request.args).data
     if data.get('to'):
         notification_type = data.get('template_type')[0] if data.get('template_type') else None
+        max_page_size = current_app.config.get('API_PAGE_SIZE')
         return search_for_notification_by_to_field(service_id=service_id,
                                                    search_term=data['to'],
                                                    statuses=data.get('status'),
-                                                   notification_type=notification_type)
+                                                   notification_type=notification_type,
+                                                   page_size=min(data.get('page_size', max_page_size), max_page_size),
+                                                   older_than=data.get('older_than'))
     page = data['page'] if 'page' in data else 1
     page_size = data['page_size'] if 'page_size' in data else current_app.config.get('PAGE_SIZE')
     limit_days = data.get('limit_days')
@@ -385,7 +389,10 @@ def get_all_notifications_for_service(service_id):
     include_from_test_key = data.get('include_from_test_key', False)
     include_one_off = data.get('include_one_off', True)
 
-    count_pages = data.get('count_pages', True)
+    older_than = data.get('older_than')
+    # keyset pages only count the notifications if asked to, so that every page costs the same
+    count_pages = data.get('count_pages', older_than is None)
+    estimate_count = data.get('estimate_count', False)
 
     pagination = notifications_dao.get_notifications_for_service(
         service_id,
@@ -393,15 +400,30 @@ def get_all_notifications_for_service(service_id):
         page=page,
         page_size=page_size,
         count_pages=count_pages,
+        estimate_count=estimate_count,
+        older_than=older_than,
         limit_days=limit_days,
         include_jobs=include_jobs,
         include_from_test_key=include_from_test_key,
         include_one_off=include_one_off
     )
 
-    kwargs = request.args.to_dict()
+    # keep every value of repeated arguments, like status, so later pages are filtered the same way
+    kwargs = request.args.to_dict(flat=False)
     kwargs['service_id'] = service_id
 
+    if older_than:
+        links = {}
+        if len(pagination.items) == page_size:
+            kwargs['older_than'] = pagination.items[-1].id
+            links['next'] = url_for('.get_all_notifications_for_service', **kwargs)
+    else:
+        links = pagination_links(
+            pagination,
+            '.get_all_notifications_for_service',
+            **kwargs
+        )
+
     if data.get('format_for_csv'):
         notifications = [notification.serialize_for_csv() for notification in pagination.items]
     else:
@@ -410,11 +432,7 @@ def get_all_notifications_for_service(service_id):
         notifications=notifications,
         page_size=page_size,
         total=pagination.total,
-        links=pagination_links(
-            pagination,
-            '.get_all_notifications_for_service',
-            **kwargs
-        )
+        links=links
     ), 200
 
 
@@ -456,15 +474,27 @@ def cancel_notification_for_service(service_id, notification_id):
     ), 200
 
 
-def search_for_notification_by_to_field(service_id, search_term, statuses, notification_type):
+def search_for_notification_by_to_field(
+    service_id, search_term, statuses, notification_type, page_size=None, older_than=None
+):
     results = notifications_dao.dao_get_notifications_by_to_field(
         service_id=service_id,
         search_term=search_term,
         statuses=statuses,
-        notification_type=notification_type
+        notification_type=notification_type,
+        page_size=page_size,
+        older_than=older_than
     )
+
+    links = {}
+    if page_size and len(results) == page_size:
+        # keep every value of repeated arguments, like status, so page two is filtered the same way
+        next_query_params = dict(request.args.to_dict(flat=False), service_id=service_id, older_than=results[-1].id)
+        links['next'] = url_for('.get_all_notifications_for_service', **next_query_params)
+
     return jsonify(
-        notifications=notification_with_template_schema.dump(results, many=True).data
+        notifications=notification_with_template_schema.dump(results, many=True).data,
+        links=links
     ), 200
 
 
@@ -28,6 +28,14 @@ def create_post_letter_response_from_notification(notification, content, subject
     return noti
 
 
+def create_post_bulk_response_from_notification(notification, row, queued, url_root):
+    noti = __create_notification_response(notification, url_root, scheduled_for=None)
+    del noti['scheduled_for']
+    noti['row'] = row
+    noti['queued'] = queued
+    return noti
+
+
 def __create_notification_response(notification, url_root, scheduled_for):
     return {
         "id": notification.id,
@@ -218,6 +218,97 @@ post_email_response = {
     "required": ["id", "content", "uri", "template"]
 }
 
+post_bulk_sms_request = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "POST bulk sms notification schema",
+    "type": "object",
+    "title": "POST v2/notifications/sms/bulk",
+    "properties": {
+        "template_id": uuid,
+        "sms_sender_id": uuid,
+        "recipients": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "reference": {"type": "string"},
+                    "phone_number": {"type": "string"},
+                    "personalisation": personalisation
+                },
+                "required": ["phone_number"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["template_id", "recipients"],
+    "additionalProperties": False
+}
+
+post_bulk_email_request = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "POST bulk email notification schema",
+    "type": "object",
+    "title": "POST v2/notifications/email/bulk",
+    "properties": {
+        "template_id": uuid,
+        "email_reply_to_id": uuid,
+        "recipients": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "reference": {"type": "string"},
+                    "email_address": {"type": "string"},
+                    "personalisation": personalisation
+                },
+                "required": ["email_address"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["template_id", "recipients"],
+    "additionalProperties": False
+}
+
+post_bulk_response = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "description": "POST bulk notification response schema",
+    "type": "object",
+    "title": "response v2/notifications/{sms,email}/bulk",
+    "properties": {
+        "notifications": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "row": {"type": "integer"},
+                    "id": uuid,
+                    "reference": {"type": ["string", "null"]},
+                    "uri": {"type": "string", "format": "uri"},
+                    "template": template,
+                    "queued": {"type": "boolean"}
+                },
+                "required": ["row", "id", "uri", "template", "queued"]
+            }
+        },
+        "errors": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "row": {"type": "integer"},
+                    "error": {"type": "string"},
+                    "message": {"type": "string"}
+                },
+                "required": ["row", "error", "message"]
+            }
+        }
+    },
+    "required": ["notifications", "errors"]
+}
+
 post_letter_request = {
     "$schema": "http://json-schema.org/draft-04/schema#",
     "description": "POST letter notification schema",
@@ -1,9 +1,10 @@
 import base64
 import functools
+import uuid
 
 import werkzeug
 from flask import request, jsonify, current_app, abort
-from notifications_utils.recipients import try_validate_and_format_phone_number
+from notifications_utils.recipients import InvalidEmailError, try_validate_and_format_phone_number
 
 from app import api_user, authenticated_service, notify_celery, document_download_client
 from app.celery.letters_pdf_tasks import create_letters_pdf, process_virus_scan_passed
@@ -30,9 +31,13 @@ from app.notifications.process_letter_notifications import (
     create_letter_notification
 )
 from app.notifications.process_notifications import (
+    build_notification,
+    check_placeholders,
     persist_notification,
+    persist_notifications_bulk,
     persist_scheduled_notification,
     send_notification_to_queue,
+    send_notifications_to_queue,
     simulated_recipient
 )
 from app.notifications.validators import (
@@ -41,18 +46,24 @@ from app.notifications.validators import (
     check_service_can_schedule_notification,
     check_service_has_permission,
     validate_template,
+    validate_template_for_service,
     check_service_email_reply_to_id,
-    check_service_sms_sender_id
+    check_service_sms_sender_id,
+    check_sms_content_char_count
 )
 from app.schema_validation import validate
+from app.utils import get_template_instance
 from app.v2.errors import BadRequestError
 from app.v2.notifications import v2_notification_blueprint
 from app.v2.notifications.create_response import (
+    create_post_bulk_response_from_notification,
     create_post_sms_response_from_notification,
     create_post_email_response_from_notification,
     create_post_letter_response_from_notification
 )
 from app.v2.notifications.notification_schemas import (
+    post_bulk_email_request,
+    post_bulk_sms_request,
     post_sms_request,
     post_email_request,
     post_letter_request,
@@ -185,6 +196,150 @@ def post_notification(notification_type):
     return jsonify(resp), 201
 
 
+@v2_notification_blueprint.route('/<notification_type>/bulk', methods=['POST'])
+def post_bulk_notifications(notification_type):
+    try:
+        request_json = request.get_json()
+    except werkzeug.exceptions.BadRequest as e:
+        raise BadRequestError(message="Error decoding arguments: {}".format(e.description),
+                              status_code=400)
+
+    if notification_type == EMAIL_TYPE:
+        form = validate(request_json, post_bulk_email_request)
+    elif notification_type == SMS_TYPE:
+        form = validate(request_json, post_bulk_sms_request)
+    else:
+        abort(404)
+
+    max_recipients = current_app.config['BULK_NOTIFICATIONS_MAX_RECIPIENTS']
+    if len(form['recipients']) > max_recipients:
+        raise BadRequestError(message="Too many recipients: a request can contain at most {}".format(max_recipients))
+
+    check_service_has_permission(notification_type, authenticated_service.permissions)
+
+    template = validate_template_for_service(form['template_id'], authenticated_service, notification_type)
+
+    reply_to = get_reply_to_text(notification_type, form, template)
+
+    to_persist, simulated_rows, errors = validate_bulk_sms_or_email_notifications(
+        recipients=form['recipients'],
+        notification_type=notification_type,
+        api_key=api_user,
+        template=template,
+        service=authenticated_service,
+        reply_to_text=reply_to
+    )
+
+    # only the rows that will be saved use up the service's allowance
+    if to_persist:
+        check_rate_limiting(authenticated_service, api_user, notification_count=len(to_persist))
+
+    rows, queue_errors = process_bulk_sms_or_email_notifications(
+        to_persist=to_persist,
+        simulated_rows=simulated_rows,
+        template=template,
+        service=authenticated_service
+    )
+
+    resp = {
+        'notifications': [
+            create_post_bulk_response_from_notification(
+                notification, row=row, queued=queued, url_root=request.url_root
+            )
+            for row, notification, queued in rows
+        ],
+        'errors': sorted(errors + queue_errors, key=lambda error: error['row'])
+    }
+    if rows:
+        return jsonify(resp), 201
+    return jsonify(resp), 500 if queue_errors else 400
+
+
+def validate_bulk_sms_or_email_notifications(*, recipients, notification_type, api_key, template, service,
+                                             reply_to_text=None):
+    """
+    Validate each recipient against one template instance.
+
+    Returns a list of (row, persist_notification keyword arguments) tuples for the recipients to save, a list of
+    (row, notification) tuples for simulated recipients, which aren't saved, and a list of errors for the rest.
+    """
+    recipient_field = 'email_address' if notification_type == EMAIL_TYPE else 'phone_number'
+    # parse the template once and only swap its values for each recipient
+    template_with_content = get_template_instance(template.__dict__, None)
+
+    errors, to_persist, simulated_rows = [], [], []
+    for row, recipient in enumerate(recipients):
+        form_send_to = recipient[recipient_field]
+        try:
+            send_to = validate_and_format_recipient(send_to=form_send_to,
+                                                    key_type=api_key.key_type,
+                                                    service=service,
+                                                    notification_type=notification_type)
+
+            template_with_content.values = recipient.get('personalisation', {})
+            check_placeholders(template_with_content)
+            if notification_type == SMS_TYPE:
+                check_sms_content_char_count(template_with_content.content_count)
+
+            simulated = simulated_recipient(send_to, notification_type)
+            personalisation = process_document_uploads(recipient.get('personalisation'), service, simulated=simulated)
+        except (BadRequestError, InvalidEmailError) as e:
+            errors.append({
+                'row': row,
+                'error': e.__class__.__name__,
+                'message': getattr(e, 'message', str(e))
+            })
+            continue
+
+        notification_kwargs = dict(
+            template_id=template.id,
+            template_version=template.version,
+            recipient=form_send_to,
+            service=service,
+            personalisation=personalisation,
+            notification_type=notification_type,
+            api_key_id=api_key.id,
+            key_type=api_key.key_type,
+            client_reference=recipient.get('reference', None),
+            notification_id=uuid.uuid4(),
+            reply_to_text=reply_to_text
+        )
+        if simulated:
+            # Do not persist or send notification to the queue if it is a simulated recipient
+            simulated_rows.append((row, build_notification(**notification_kwargs)))
+        else:
+            to_persist.append((row, notification_kwargs))
+
+    return to_persist, simulated_rows, errors
+
+
+def process_bulk_sms_or_email_notifications(*, to_persist, simulated_rows, template, service):
+    """
+    Save the validated notifications in a single transaction, then queue them all for delivery.
+
+    Returns a list of (row, notification, queued) tuples, and a list of errors for the notifications that couldn't
+    be queued, which are deleted rather than left with nothing to send them.
+    """
+    notifications = persist_notifications_bulk([notification_kwargs for _, notification_kwargs in to_persist])
+
+    queue_name = QueueNames.PRIORITY if template.process_type == PRIORITY else None
+    queued_ids = set(send_notifications_to_queue(notifications, research_mode=service.research_mode, queue=queue_name))
+
+    rows_by_id = {notification_kwargs['notification_id']: row for row, notification_kwargs in to_persist}
+    rows, errors = [(row, notification, False) for row, notification in simulated_rows], []
+    for notification in notifications:
+        if notification.id in queued_ids:
+            rows.append((rows_by_id[notification.id], notification, True))
+        else:
+            errors.append({
+                'row': rows_by_id[notification.id],
+                'error': 'QueueError',
+                'message': 'Notification could not be queued for delivery, it was not saved'
+            })
+    rows.sort(key=lambda row_notification_and_queued: row_notification_and_queued[0])
+    return rows, errors
+
+
 def process_sms_or_email_notification(*, form, notification_type, api_key, template, service, reply_to_text=None):
     form_send_to = form['email_address'] if notification_type == EMAIL_TYPE else form['phone_number']
 
@@ -0,0 +1,21 @@
+"""
+
+Revision ID: 0311_batched_callbacks_permission
+Revises: 0310a_make_email_from_nullable
+Create Date: 2026-10-18 10:12:41.228913
+
+"""
+from alembic import op
+
+
+revision = '0311_batched_callbacks_permission'
+down_revision = '0310a_make_email_from_nullable'
+
+
+def upgrade():
+    op.execute("INSERT INTO service_permission_types VALUES ('batched_callbacks')")
+
+
+def downgrade():
+    op.execute("DELETE FROM service_permissions WHERE permission = 'batched_callbacks'")
+    op.execute("DELETE FROM service_permission_types WHERE name = 'batched_callbacks'")
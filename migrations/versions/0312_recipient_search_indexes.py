@@ -0,0 +1,33 @@
+"""
+
+Revision ID: 0312_recipient_search_indexes
+Revises: 0311_batched_callbacks_permission
+Create Date: 2026-10-18 14:02:17.519034
+
+"""
+from alembic import op
+
+revision = '0312_recipient_search_indexes'
+down_revision = '0311_batched_callbacks_permission'
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # built concurrently, which can't happen in a transaction, so that sending isn't blocked while they're built
+    with op.get_context().autocommit_block():
+        conn.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_service_id_normalised_to "
+            "ON notifications (service_id, normalised_to)"
+        )
+        conn.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_normalised_to_trgm "
+            "ON notifications USING gin (normalised_to gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        conn.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_normalised_to_trgm")
+        conn.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_notifications_service_id_normalised_to")
@@ -0,0 +1,26 @@
+"""
+
+Revision ID: 0313_verify_code_digests
+Revises: 0312_recipient_search_indexes
+Create Date: 2026-10-18 16:41:52.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0313_verify_code_digests'
+down_revision = '0312_recipient_search_indexes'
+
+
+def upgrade():
+    op.add_column('verify_codes', sa.Column('code_digest', sa.String(), nullable=True))
+    op.create_index('ix_verify_codes_user_id_code_digest', 'verify_codes', ['user_id', 'code_digest'])
+    op.alter_column('verify_codes', '_code', nullable=True)
+
+
+def downgrade():
+    # codes only live for a day, so codes without a bcrypt hash can be dropped rather than kept
+    op.execute("DELETE FROM verify_codes WHERE _code IS NULL")
+    op.alter_column('verify_codes', '_code', nullable=False)
+    op.drop_index('ix_verify_codes_user_id_code_digest', table_name='verify_codes')
+    op.drop_column('verify_codes', 'code_digest')
@@ -0,0 +1,22 @@
+"""
+
+Revision ID: 0314_scheduled_notifications_due
+Revises: 0313_verify_code_digests
+Create Date: 2026-10-18 17:26:03.851342
+
+"""
+from alembic import op
+
+revision = '0314_scheduled_notifications_due'
+down_revision = '0313_verify_code_digests'
+
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_scheduled_notifications_pending_scheduled_for "
+        "ON scheduled_notifications (scheduled_for) WHERE pending"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_scheduled_notifications_pending_scheduled_for")
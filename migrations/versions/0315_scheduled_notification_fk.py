@@ -0,0 +1,28 @@
+"""
+
+Revision ID: 0315_scheduled_notification_fk
+Revises: 0314_scheduled_notifications_due
+Create Date: 2026-10-18 18:02:37.512904
+
+"""
+from alembic import op
+
+revision = '0315_scheduled_notification_fk'
+down_revision = '0314_scheduled_notifications_due'
+
+
+def upgrade():
+    # a partitioned notifications table can't be referenced by id alone
+    op.execute(
+        "ALTER TABLE scheduled_notifications DROP CONSTRAINT IF EXISTS scheduled_notifications_notification_id_fkey"
+    )
+
+
+def downgrade():
+    op.create_foreign_key(
+        'scheduled_notifications_notification_id_fkey',
+        'scheduled_notifications',
+        'notifications',
+        ['notification_id'],
+        ['id']
+    )
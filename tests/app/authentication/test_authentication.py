@@ -13,6 +13,8 @@ from app import api_user
 from app.dao.api_key_dao import get_unsigned_secrets, save_model_api_key, get_unsigned_secret, expire_api_key
 from app.models import ApiKey, KEY_TYPE_NORMAL
 from app.authentication.auth import AuthError, requires_admin_auth, requires_auth
+from app.authentication.service_cache import service_cache
+from app.dao.services_dao import dao_fetch_service_by_id_with_api_keys, dao_suspend_service
 
 from tests.conftest import set_config
 
@@ -318,6 +320,82 @@ def test_should_return_403_when_token_is_expired(client,
     assert exc.value.api_key_id == sample_api_key.id
 
 
+@pytest.fixture
+def auth_service_cache(notify_api):
+    service_cache.clear()
+    with set_config(notify_api, 'AUTH_SERVICE_CACHE_ENABLED', True):
+        yield service_cache
+    service_cache.clear()
+
+
+def test_requires_auth_caches_service_between_requests(client, sample_api_key, auth_service_cache, mocker):
+    fetch_service = mocker.patch(
+        'app.authentication.auth.dao_fetch_service_by_id_with_api_keys',
+        wraps=dao_fetch_service_by_id_with_api_keys
+    )
+    request.headers = {'Authorization': 'Bearer {}'.format(__create_token(sample_api_key.service_id))}
+
+    requires_auth()
+    requires_auth()
+
+    fetch_service.assert_called_once_with(str(sample_api_key.service_id))
+    assert api_user.id == sample_api_key.id
+
+
+def test_requires_auth_does_not_cache_service_when_cache_disabled(client, sample_api_key, mocker):
+    fetch_service = mocker.patch(
+        'app.authentication.auth.dao_fetch_service_by_id_with_api_keys',
+        wraps=dao_fetch_service_by_id_with_api_keys
+    )
+    request.headers = {'Authorization': 'Bearer {}'.format(__create_token(sample_api_key.service_id))}
+
+    requires_auth()
+    requires_auth()
+
+    assert fetch_service.call_count == 2
+    assert service_cache.get(str(sample_api_key.service_id)) is None
+
+
+def test_requires_auth_remembers_last_used_api_key(client, sample_api_key, auth_service_cache):
+    api_key = ApiKey(
+        service=sample_api_key.service,
+        name='another key',
+        created_by=sample_api_key.created_by,
+        key_type=KEY_TYPE_NORMAL
+    )
+    save_model_api_key(api_key)
+    token = create_jwt_token(secret=get_unsigned_secret(api_key.id), client_id=str(sample_api_key.service_id))
+    request.headers = {'Authorization': 'Bearer {}'.format(token)}
+
+    requires_auth()
+
+    cached = auth_service_cache.get(str(sample_api_key.service_id))
+    assert cached.last_used_api_key_id == api_key.id
+    assert cached.api_keys()[0].id == api_key.id
+
+
+def test_requires_auth_rejects_cached_api_key_once_revoked(client, sample_api_key, auth_service_cache):
+    request.headers = {'Authorization': 'Bearer {}'.format(__create_token(sample_api_key.service_id))}
+    requires_auth()
+
+    expire_api_key(sample_api_key.service_id, sample_api_key.id)
+
+    with pytest.raises(AuthError) as exc:
+        requires_auth()
+    assert exc.value.short_message == 'Invalid token: API key revoked'
+
+
+def test_requires_auth_rejects_cached_service_once_suspended(client, sample_api_key, auth_service_cache):
+    request.headers = {'Authorization': 'Bearer {}'.format(__create_token(sample_api_key.service_id))}
+    requires_auth()
+
+    dao_suspend_service(sample_api_key.service_id)
+
+    with pytest.raises(AuthError) as exc:
+        requires_auth()
+    assert exc.value.short_message == 'Invalid token: service is archived'
+
+
 def __create_token(service_id):
     return create_jwt_token(secret=get_unsigned_secrets(service_id)[0],
                             client_id=str(service_id))
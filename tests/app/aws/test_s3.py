@@ -1,3 +1,4 @@
+from io import BytesIO
 from unittest.mock import call
 from datetime import datetime, timedelta
 import pytest
@@ -12,6 +13,7 @@ from app.aws.s3 import (
     filter_s3_bucket_objects_within_date_range,
     remove_transformed_dvla_file,
     get_list_of_files_by_suffix,
+    stream_job_from_s3,
 )
 from tests.app.conftest import datetime_in_past
 
@@ -190,3 +192,33 @@ def test_get_list_of_files_by_suffix_empty_contents_return_with_no_error(notify_
     key = get_list_of_files_by_suffix('foo-bucket', subfolder='bar', suffix='.pdf')
 
     assert sum(1 for x in key) == 0
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1024])
+def test_stream_job_from_s3_yields_lines_using_ranged_gets(notify_api, mocker, chunk_size):
+    file_contents = 'phone number,name\r\n+16502532222,"Zoë\nSmith"\r\n+16502532223,Jo'.encode('utf-8')
+    s3_object = mocker.patch('app.aws.s3.get_s3_object').return_value
+    s3_object.content_length = len(file_contents)
+
+    def get_range(Range):
+        start, end = (int(byte) for byte in Range[len('bytes='):].split('-'))
+        return {'Body': BytesIO(file_contents[start:end + 1])}
+
+    s3_object.get.side_effect = get_range
+
+    lines = list(stream_job_from_s3('service-id', 'job-id', chunk_size=chunk_size))
+
+    assert lines == ['phone number,name\r\n', '+16502532222,"Zoë\n', 'Smith"\r\n', '+16502532223,Jo']
+    assert s3_object.get.call_count == -(-len(file_contents) // chunk_size)
+
+
+def test_stream_job_from_s3_gets_job_location(notify_api, mocker):
+    get_s3_mock = mocker.patch('app.aws.s3.get_s3_object')
+    get_s3_mock.return_value.content_length = 0
+
+    assert list(stream_job_from_s3('service-id', 'job-id')) == []
+
+    get_s3_mock.assert_called_once_with(
+        current_app.config['CSV_UPLOAD_BUCKET_NAME'], 'service-service-id-notify/job-id.csv'
+    )
+    assert not get_s3_mock.return_value.get.called
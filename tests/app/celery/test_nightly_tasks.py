@@ -15,6 +15,7 @@ from app.celery.nightly_tasks import (
     delete_inbound_sms,
     delete_letter_notifications_older_than_retention,
     delete_sms_notifications_older_than_retention,
+    manage_notification_partitions,
     raise_alert_if_letter_notifications_still_sending,
     remove_letter_csv_files,
     remove_sms_email_csv_files,
@@ -46,6 +47,7 @@ from tests.app.db import (
 )
 
 from tests.app.conftest import datetime_in_past
+from tests.conftest import set_config
 
 
 def mock_s3_get_list_match(bucket_name, subfolder='', suffix='', last_modified=None):
@@ -162,6 +164,30 @@ def test_should_call_delete_sms_notifications_more_than_week_in_task(notify_api,
     mocked.assert_called_once_with('sms')
 
 
+def test_manage_notification_partitions_does_nothing_if_notifications_are_not_partitioned(notify_api, mocker):
+    mocker.patch('app.celery.nightly_tasks.notifications_are_expired_by_partition', return_value=False)
+    mock_create = mocker.patch('app.celery.nightly_tasks.dao_create_notification_partitions')
+    mock_drop = mocker.patch('app.celery.nightly_tasks.dao_drop_notification_partitions_older_than')
+
+    manage_notification_partitions()
+
+    assert mock_create.call_count == 0
+    assert mock_drop.call_count == 0
+
+
+@freeze_time('2019-08-10T12:00:00')
+def test_manage_notification_partitions_creates_and_drops_partitions(notify_api, mocker):
+    mocker.patch('app.celery.nightly_tasks.notifications_are_expired_by_partition', return_value=True)
+    mock_create = mocker.patch('app.celery.nightly_tasks.dao_create_notification_partitions')
+    mock_drop = mocker.patch('app.celery.nightly_tasks.dao_drop_notification_partitions_older_than')
+
+    manage_notification_partitions()
+
+    mock_create.assert_called_once_with(date(2019, 8, 10), current_app.config['NOTIFICATION_PARTITIONS_AHEAD'])
+    # midnight local time (EST) seven days ago
+    mock_drop.assert_called_once_with(datetime(2019, 8, 3, 4, 0))
+
+
 def test_should_call_delete_email_notifications_more_than_week_in_task(notify_api, mocker):
     mocked_notifications = mocker.patch(
         'app.celery.nightly_tasks.delete_notifications_older_than_retention_by_type')
@@ -236,6 +262,27 @@ def test_timeout_notifications_sends_status_update_to_service(client, sample_tem
     mocked.assert_called_once_with([str(notification.id), encrypted_data], queue=QueueNames.CALLBACKS)
 
 
+def test_timeout_notifications_looks_up_callback_api_once_per_service(notify_api, sample_template, mocker):
+    create_service_callback_api(service=sample_template.service)
+    mock_get_callback_api = mocker.patch(
+        'app.celery.nightly_tasks.get_service_delivery_status_callback_api_for_service',
+        wraps=nightly_tasks.get_service_delivery_status_callback_api_for_service
+    )
+    mocked = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+    for _ in range(3):
+        create_notification(
+            template=sample_template,
+            status='sending',
+            created_at=datetime.utcnow() - timedelta(
+                seconds=current_app.config.get('SENDING_NOTIFICATIONS_TIMEOUT_PERIOD') + 10))
+
+    with set_config(notify_api, 'TIMEOUT_NOTIFICATIONS_CHUNK_SIZE', 2):
+        timeout_notifications()
+
+    mock_get_callback_api.assert_called_once_with(service_id=sample_template.service_id)
+    assert mocked.call_count == 3
+
+
 def test_send_daily_performance_stats_calls_does_not_send_if_inactive(client, mocker):
     send_mock = mocker.patch(
         'app.celery.nightly_tasks.total_sent_notifications.send_total_notifications_sent_for_day_stats')  # noqa
@@ -6,9 +6,16 @@ from freezegun import freeze_time
 
 
 from app import statsd_client, encryption
-from app.celery.process_ses_receipts_tasks import process_ses_results, process_ses_smtp_results
+from app.celery.process_ses_receipts_tasks import (
+    SES_RECEIPTS_BUFFER_KEY,
+    process_buffered_ses_results,
+    process_ses_results,
+    process_ses_results_batch,
+    process_ses_smtp_results,
+)
 from app.celery.research_mode_tasks import ses_hard_bounce_callback, ses_soft_bounce_callback, ses_notification_callback
 from app.celery.service_callback_tasks import create_delivery_status_callback_data
+from app.config import QueueNames
 from app.dao.notifications_dao import get_notification_by_id
 from app.models import Complaint, Notification
 from app.notifications.notifications_ses_callback import remove_emails_from_complaint, remove_emails_from_bounce
@@ -23,6 +30,7 @@ from tests.app.db import (
     ses_smtp_soft_bounce_callback
 )
 from tests.app.conftest import sample_notification as create_sample_notification
+from tests.conftest import set_config
 
 
 def test_notifications_ses_400_with_invalid_header(client):
@@ -106,7 +114,10 @@ def test_process_ses_results(sample_email_template):
 def test_process_ses_results_retry_called(sample_email_template, notify_db, mocker):
     create_notification(sample_email_template, reference='ref1', sent_at=datetime.utcnow(), status='sending')
 
-    mocker.patch("app.dao.notifications_dao._update_notification_status", side_effect=Exception("EXPECTED"))
+    mocker.patch(
+        "app.dao.notifications_dao.dao_update_notification_statuses_by_references",
+        side_effect=Exception("EXPECTED")
+    )
     mocked = mocker.patch('app.celery.process_ses_receipts_tasks.process_ses_results.retry')
     process_ses_results(response=ses_notification_callback(reference='ref1'))
     assert mocked.call_count != 0
@@ -486,3 +497,110 @@ def test_ses_smtp_callback_should_send_on_complaint_to_user_callback_api(smtp_te
     assert process_ses_smtp_results(response)
 
     assert send_mock.call_count == 1
+
+
+def test_notifications_ses_200_buffers_receipt_when_batching_enabled(notify_api, client, mocker):
+    mocker.patch("validatesns.validate")
+    mock_redis = mocker.patch("app.celery.process_ses_receipts_tasks.redis_store", active=True)
+    process_mock = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results.apply_async")
+    data = json.dumps({"Type": "Notification", "Message": "receipt"})
+
+    with set_config(notify_api, 'SES_RECEIPT_BATCHING_ENABLED', True):
+        response = client.post(
+            path='/notifications/email/ses',
+            data=data,
+            headers=[('Content-Type', 'application/json'), ('x-amz-sns-message-type', 'Notification')]
+        )
+
+    assert response.status_code == 200
+    mock_redis.redis_store.rpush.assert_called_once_with(SES_RECEIPTS_BUFFER_KEY, "receipt")
+    assert process_mock.call_count == 0
+
+
+def test_process_buffered_ses_results_queues_batches_until_buffer_is_empty(notify_api, mocker):
+    mock_redis = mocker.patch("app.celery.process_ses_receipts_tasks.redis_store", active=True)
+    mock_redis.redis_store.pipeline.return_value.execute.side_effect = [
+        ([b'receipt-1', b'receipt-2'], True),
+        ([], True),
+    ]
+    batch_mock = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results_batch.apply_async")
+
+    with set_config(notify_api, 'SES_RECEIPT_BATCH_SIZE', 2):
+        process_buffered_ses_results()
+
+    mock_redis.redis_store.pipeline.return_value.lrange.assert_called_with(SES_RECEIPTS_BUFFER_KEY, 0, 1)
+    mock_redis.redis_store.pipeline.return_value.ltrim.assert_called_with(SES_RECEIPTS_BUFFER_KEY, 2, -1)
+    batch_mock.assert_called_once_with(
+        [[{"Message": "receipt-1"}, {"Message": "receipt-2"}]],
+        queue=QueueNames.NOTIFY
+    )
+
+
+def test_process_ses_results_batch_updates_notification_statuses(sample_email_template, mocker):
+    mocker.patch('app.statsd_client.incr')
+    delivered = create_notification(sample_email_template, reference='ref1', status='sending')
+    bounced = create_notification(sample_email_template, reference='ref2', status='sending')
+
+    assert process_ses_results_batch([
+        ses_notification_callback(reference='ref1'),
+        ses_hard_bounce_callback(reference='ref2'),
+    ])
+
+    assert get_notification_by_id(delivered.id).status == 'delivered'
+    assert get_notification_by_id(bounced.id).status == 'permanent-failure'
+    statsd_client.incr.assert_any_call('callback.ses.delivered')
+    statsd_client.incr.assert_any_call('callback.ses.permanent-failure')
+
+
+def test_process_ses_results_batch_does_not_update_notifications_that_have_moved_on(sample_email_template, mocker):
+    mock_dup = mocker.patch('app.celery.process_ses_receipts_tasks.notifications_dao._duplicate_update_warning')
+    notification = create_notification(sample_email_template, reference='ref', status='delivered')
+
+    assert process_ses_results_batch([ses_hard_bounce_callback(reference='ref')])
+
+    assert get_notification_by_id(notification.id).status == 'delivered'
+    assert mock_dup.call_count == 1
+
+
+def test_process_ses_results_batch_queues_callbacks_for_updated_notifications(sample_email_template, mocker):
+    queue_mock = mocker.patch('app.celery.process_ses_receipts_tasks.queue_delivery_status_callbacks')
+    callback_api = create_service_callback_api(service=sample_email_template.service, url="https://original_url.com")
+    notification = create_notification(sample_email_template, reference='ref', status='sending')
+
+    with freeze_time('2017-11-17T12:14:05'):
+        process_ses_results_batch([ses_notification_callback(reference='ref')])
+
+    updated_notification = Notification.query.get(notification.id)
+    queue_mock.assert_called_once_with([
+        (notification.id, create_delivery_status_callback_data(updated_notification, callback_api))
+    ])
+
+
+def test_process_ses_results_batch_hands_complaints_to_process_ses_results(sample_email_template, mocker):
+    process_mock = mocker.patch('app.celery.process_ses_receipts_tasks.process_ses_results.apply_async')
+    complaint = ses_complaint_callback()
+
+    assert process_ses_results_batch([complaint])
+
+    process_mock.assert_called_once_with([complaint], queue=QueueNames.NOTIFY)
+
+
+def test_process_ses_results_batch_requeues_receipts_for_new_notifications(notify_db, mocker):
+    process_mock = mocker.patch('app.celery.process_ses_receipts_tasks.process_ses_results.apply_async')
+    receipt = ses_notification_callback(reference='ref')
+
+    with freeze_time('2017-11-17T12:14:03.646Z'):
+        assert process_ses_results_batch([receipt])
+
+    process_mock.assert_called_once_with([receipt], queue=QueueNames.RETRY, countdown=300)
+
+
+def test_process_ses_results_batch_logs_receipts_for_missing_notifications(notify_db, mocker):
+    process_mock = mocker.patch('app.celery.process_ses_receipts_tasks.process_ses_results.apply_async')
+    mock_logger = mocker.patch('app.celery.process_ses_receipts_tasks.current_app.logger.warning')
+
+    with freeze_time('2017-11-17T12:34:03.646Z'):
+        assert process_ses_results_batch([ses_notification_callback(reference='ref')])
+
+    assert process_mock.call_count == 0
+    mock_logger.assert_called_once_with('notification not found for reference: ref (update to delivered)')
@@ -7,7 +7,10 @@ import app
 from app.celery import provider_tasks
 from app.celery.provider_tasks import deliver_sms, deliver_email
 from app.clients.email.aws_ses import AwsSesClientException
+from app.dao import notifications_dao
+from app.delivery.snapshots import DeliverySnapshot, create_delivery_snapshot
 from app.exceptions import NotificationTechnicalFailureException
+from app.models import Notification
 
 
 def test_should_have_decorated_tasks_functions():
@@ -57,6 +60,75 @@ def test_should_add_to_retry_queue_if_notification_not_found_in_deliver_email_ta
     app.celery.provider_tasks.deliver_email.retry.assert_called_with(queue="retry-tasks")
 
 
+def test_deliver_sms_sends_a_delivery_snapshot_without_reading_the_notification(sample_notification, mocker):
+    send_sms_to_provider = mocker.patch('app.delivery.send_to_providers.send_sms_to_provider')
+    get_notification_by_id = mocker.patch('app.celery.provider_tasks.notifications_dao.get_notification_by_id')
+
+    deliver_sms(sample_notification.id, create_delivery_snapshot(sample_notification, sample_notification.service))
+
+    notification = send_sms_to_provider.call_args[0][0]
+    assert isinstance(notification, DeliverySnapshot)
+    assert notification.id == str(sample_notification.id)
+    assert get_notification_by_id.call_count == 0
+
+
+def test_retries_read_the_notification_rather_than_trusting_the_delivery_snapshot(sample_email_notification, mocker):
+    task = mocker.Mock(request=mocker.Mock(retries=1))
+    snapshot = create_delivery_snapshot(sample_email_notification, sample_email_notification.service)
+
+    notification = provider_tasks._notification_to_deliver(task, sample_email_notification.id, snapshot)
+
+    assert notification == sample_email_notification
+
+
+def test_deliver_sms_does_not_send_a_delivery_snapshot_of_a_notification_that_has_moved_on(
+    sample_notification, mock_sms_client
+):
+    snapshot = create_delivery_snapshot(sample_notification, sample_notification.service)
+    sample_notification.status = 'sent'
+    notifications_dao.dao_update_notification(sample_notification)
+
+    deliver_sms(sample_notification.id, snapshot)
+
+    assert not mock_sms_client.send_sms.called
+    assert Notification.query.get(sample_notification.id).status == 'sent'
+
+
+def test_deliver_sms_claims_a_delivery_snapshot_before_sending_it(sample_notification, mocker):
+    statuses_when_sent = []
+    mocker.patch(
+        'app.delivery.send_to_providers.send_sms_to_provider',
+        side_effect=lambda notification: statuses_when_sent.append(Notification.query.get(notification.id).status)
+    )
+
+    deliver_sms(sample_notification.id, create_delivery_snapshot(sample_notification, sample_notification.service))
+
+    assert statuses_when_sent == ['sending']
+
+
+def test_deliver_email_puts_a_claimed_delivery_snapshot_back_to_created_if_it_cant_be_sent(
+    sample_email_notification, mocker
+):
+    mocker.patch('app.delivery.send_to_providers.send_email_to_provider', side_effect=Exception("EXPECTED"))
+    mocker.patch('app.celery.provider_tasks.deliver_email.retry')
+    snapshot = create_delivery_snapshot(sample_email_notification, sample_email_notification.service)
+
+    deliver_email(sample_email_notification.id, snapshot)
+
+    assert Notification.query.get(sample_email_notification.id).status == 'created'
+    provider_tasks.deliver_email.retry.assert_called_with(queue="retry-tasks")
+
+
+def test_deliver_sms_does_not_send_a_delivery_snapshot_that_is_already_claimed(sample_notification, mock_sms_client):
+    snapshot = create_delivery_snapshot(sample_notification, sample_notification.service)
+    assert DeliverySnapshot(snapshot).claim()
+
+    deliver_sms(sample_notification.id, snapshot)
+
+    assert not mock_sms_client.send_sms.called
+    assert Notification.query.get(sample_notification.id).status == 'sending'
+
+
 # DO THESE FOR THE 4 TYPES OF TASK
 
 def test_should_go_into_technical_error_if_exceeds_retries_on_deliver_sms_task(sample_notification, mocker):
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from unittest.mock import call
 
 import pytest
@@ -16,6 +16,8 @@ from app.celery.scheduled_tasks import (
     replay_created_notifications,
     check_precompiled_letter_state,
     check_templated_letter_state,
+    reconcile_daily_limit_counts,
+    reconcile_todays_stats,
 )
 from app.config import QueueNames, TaskNames
 from app.dao.jobs_dao import dao_get_job_by_id
@@ -39,6 +41,7 @@ from tests.app.db import (
     create_job,
 )
 from tests.app.conftest import sample_job as create_sample_job
+from tests.conftest import set_config_values
 
 
 def _create_slow_delivery_notification(template, provider='sns'):
@@ -125,6 +128,39 @@ def test_should_update_all_scheduled_jobs_and_put_on_queue(notify_db, notify_db_
     ])
 
 
+@pytest.mark.parametrize('is_slow, expected_switches', [
+    (True, 1),
+    (False, 0),
+])
+def test_switch_providers_on_slow_delivery_reads_latency_histograms_when_enabled(
+        notify_api,
+        mocker,
+        prepare_current_provider,
+        is_slow,
+        expected_switches,
+):
+    is_delivery_slow = mocker.patch(
+        'app.celery.scheduled_tasks.delivery_latency.is_delivery_slow', return_value=is_slow
+    )
+    is_delivery_slow_for_provider = mocker.patch('app.celery.scheduled_tasks.is_delivery_slow_for_provider')
+    mocker.patch('app.celery.scheduled_tasks.count_undelivered_notifications_for_provider', return_value=(5, 2))
+    toggle = mocker.patch('app.celery.scheduled_tasks.dao_toggle_sms_provider')
+
+    with set_config_values(notify_api, {'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': True, 'REDIS_ENABLED': True}):
+        switch_current_sms_provider_on_slow_delivery()
+
+    is_delivery_slow.assert_called_once_with(
+        provider=get_current_provider('sms').identifier,
+        threshold=0.3,
+        delivery_time=timedelta(minutes=4),
+        minutes=10,
+        undelivered=5,
+        slow_undelivered=2,
+    )
+    assert not is_delivery_slow_for_provider.called
+    assert toggle.call_count == expected_switches
+
+
 def test_switch_providers_on_slow_delivery_switches_once_then_does_not_switch_if_already_switched(
         notify_api,
         mocker,
@@ -170,6 +206,76 @@ def test_should_send_all_scheduled_notifications_to_deliver_queue(sample_templat
     assert not scheduled_notifications
 
 
+@freeze_time("2017-05-01 14:00:00")
+def test_send_scheduled_notifications_claims_notifications_in_batches(notify_api, sample_template, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms')
+    notifications = [
+        create_notification(template=sample_template, scheduled_for="2017-05-01 13:{}".format(minute))
+        for minute in ('10', '20', '30')
+    ]
+
+    with set_config_values(notify_api, {
+        'SCHEDULED_DISPATCH_BATCH_SIZE': 2,
+        'SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN': 5,
+    }):
+        send_scheduled_notifications()
+
+    assert mocked.apply_async.call_args_list == [
+        call([str(notification.id)], queue='send-sms-tasks') for notification in notifications
+    ]
+    assert not dao_get_scheduled_notifications()
+
+
+@freeze_time("2017-05-01 14:00:00")
+def test_send_scheduled_notifications_leaves_the_rest_of_the_batch_to_the_next_run_if_queueing_fails(
+    sample_template, mocker
+):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms')
+    mocked.apply_async.side_effect = [None, Exception('SQS is down')]
+    sent, failed, unsent = [
+        create_notification(template=sample_template, scheduled_for="2017-05-01 13:{}".format(minute))
+        for minute in ('10', '20', '30')
+    ]
+
+    with pytest.raises(Exception):
+        send_scheduled_notifications()
+
+    assert {notification.id for notification in dao_get_scheduled_notifications()} == {failed.id, unsent.id}
+
+    mocked.apply_async.side_effect = None
+    send_scheduled_notifications()
+
+    assert mocked.apply_async.call_args_list[-2:] == [
+        call([str(failed.id)], queue='send-sms-tasks'),
+        call([str(unsent.id)], queue='send-sms-tasks'),
+    ]
+    assert not dao_get_scheduled_notifications()
+
+
+def test_run_scheduled_jobs_stops_after_max_batches(notify_api, sample_template, mocker):
+    mocked = mocker.patch('app.celery.tasks.process_job.apply_async')
+    jobs = [
+        create_job(
+            sample_template,
+            scheduled_for=datetime.utcnow() - timedelta(minutes=minutes),
+            job_status='scheduled'
+        )
+        for minutes in (3, 2, 1)
+    ]
+
+    with set_config_values(notify_api, {
+        'SCHEDULED_DISPATCH_BATCH_SIZE': 1,
+        'SCHEDULED_DISPATCH_MAX_BATCHES_PER_RUN': 2,
+    }):
+        run_scheduled_jobs()
+
+    assert mocked.call_args_list == [
+        call([str(jobs[0].id)], queue="job-tasks"),
+        call([str(jobs[1].id)], queue="job-tasks"),
+    ]
+    assert dao_get_job_by_id(jobs[2].id).job_status == 'scheduled'
+
+
 def test_check_job_status_task_raises_job_incomplete_error(mocker, sample_template):
     mock_celery = mocker.patch('app.celery.tasks.notify_celery.send_task')
     job = create_job(template=sample_template, notification_count=3,
@@ -421,3 +527,38 @@ def test_check_templated_letter_state_during_utc(mocker, sample_letter_template)
         subject="[test] Letters still in 'created' status",
         ticket_type='incident'
     )
+
+
+def test_reconcile_daily_limit_counts_sets_counts_from_the_database(notify_api, sample_template, mocker):
+    create_notification(template=sample_template)
+    set_counts = mocker.patch('app.celery.scheduled_tasks.set_daily_limit_counts')
+
+    with set_config_values(notify_api, {'ATOMIC_SENDING_LIMITS_ENABLED': True, 'REDIS_ENABLED': True}):
+        reconcile_daily_limit_counts()
+
+    set_counts.assert_called_once_with({sample_template.service_id: 1})
+
+
+def test_reconcile_daily_limit_counts_does_nothing_if_atomic_sending_limits_are_disabled(notify_api, mocker):
+    set_counts = mocker.patch('app.celery.scheduled_tasks.set_daily_limit_counts')
+
+    with set_config_values(notify_api, {'ATOMIC_SENDING_LIMITS_ENABLED': False, 'REDIS_ENABLED': True}):
+        reconcile_daily_limit_counts()
+
+    assert not set_counts.called
+
+
+@freeze_time('2018-10-31T18:00:00')
+def test_reconcile_todays_stats_sets_todays_stats_from_the_database(notify_api, sample_template, mocker):
+    create_notification(template=sample_template, status='delivered')
+    set_todays_stats = mocker.patch('app.celery.scheduled_tasks.set_todays_stats')
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True}):
+        reconcile_todays_stats()
+
+    day, rows = set_todays_stats.call_args[0]
+    assert day == date(2018, 10, 31)
+    assert set_todays_stats.call_args[1] == {'service_ids': [sample_template.service_id]}
+    assert [(row.service_id, row.template_id, row.status, row.count) for row in rows] == [
+        (sample_template.service_id, sample_template.id, 'delivered', 1)
+    ]
@@ -6,7 +6,18 @@ import requests_mock
 from freezegun import freeze_time
 
 from app import (DATETIME_FORMAT, encryption)
-from app.celery.service_callback_tasks import send_delivery_status_to_service, send_complaint_to_service
+from app.celery import service_callback_tasks
+from app.celery.service_callback_tasks import (
+    CircuitBreaker,
+    create_delivery_status_callback_data,
+    queue_delivery_status_callbacks,
+    send_complaint_to_service,
+    send_delivery_status_to_service,
+    send_delivery_statuses_to_service,
+)
+from app.config import QueueNames
+from app.dao.service_permissions_dao import dao_add_service_permission
+from app.models import BATCHED_CALLBACKS
 from tests.app.db import (
     create_complaint,
     create_notification,
@@ -14,6 +25,7 @@ from tests.app.db import (
     create_service,
     create_template
 )
+from tests.conftest import set_config, set_config_values
 
 
 @pytest.mark.parametrize("notification_type",
@@ -160,6 +172,137 @@ def test_send_delivery_status_to_service_succeeds_if_sent_at_is_none(
     assert mocked.call_count == 0
 
 
+@pytest.fixture
+def callback_destinations():
+    service_callback_tasks._callback_destinations.clear()
+    yield service_callback_tasks._callback_destinations
+    service_callback_tasks._callback_destinations.clear()
+
+
+def test_send_delivery_statuses_to_service_posts_each_update(notify_db_session, callback_destinations):
+    callback_api, template = _set_up_test_data('sms', "delivery_status")
+    notifications = [create_notification(template=template, status='delivered') for _ in range(3)]
+    encrypted_data = [create_delivery_status_callback_data(n, callback_api) for n in notifications]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_statuses_to_service(encrypted_data)
+
+    assert request_mock.call_count == 3
+    assert sorted(r.json()['id'] for r in request_mock.request_history) == sorted(str(n.id) for n in notifications)
+    assert all(
+        r.headers["Authorization"] == "Bearer {}".format(callback_api.bearer_token)
+        for r in request_mock.request_history
+    )
+
+
+def test_send_delivery_statuses_to_service_batches_updates_when_service_opts_in(
+    notify_api, notify_db_session, callback_destinations
+):
+    callback_api, template = _set_up_test_data('sms', "delivery_status")
+    dao_add_service_permission(template.service_id, BATCHED_CALLBACKS)
+    notifications = [create_notification(template=template, status='delivered') for _ in range(3)]
+    encrypted_data = [create_delivery_status_callback_data(n, callback_api) for n in notifications]
+
+    with set_config(notify_api, 'CALLBACK_BATCH_SIZE', 2), requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_statuses_to_service(encrypted_data)
+
+    assert request_mock.call_count == 2
+    batches = sorted((r.json() for r in request_mock.request_history), key=len)
+    assert [len(batch) for batch in batches] == [1, 2]
+    assert sorted(update['id'] for batch in batches for update in batch) == sorted(str(n.id) for n in notifications)
+
+
+@pytest.mark.parametrize('status_code, retried', [(500, True), (404, False)])
+def test_send_delivery_statuses_to_service_retries_failed_updates(
+    notify_db_session, callback_destinations, mocker, status_code, retried
+):
+    callback_api, template = _set_up_test_data('sms', "delivery_status")
+    notification = create_notification(template=template, status='delivered')
+    mocked = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=status_code)
+        send_delivery_statuses_to_service([create_delivery_status_callback_data(notification, callback_api)])
+
+    assert mocked.called is retried
+    if retried:
+        args, kwargs = mocked.call_args
+        assert args[0][0] == str(notification.id)
+        assert encryption.decrypt(args[0][1])['notification_id'] == str(notification.id)
+        assert kwargs['queue'] == QueueNames.RETRY
+
+
+def test_send_delivery_statuses_to_service_skips_destination_when_circuit_is_open(
+    notify_api, notify_db_session, callback_destinations, mocker
+):
+    callback_api, template = _set_up_test_data('sms', "delivery_status")
+    first, second = [create_notification(template=template, status='delivered') for _ in range(2)]
+    mocked = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+
+    with set_config_values(notify_api, {
+        'CALLBACK_CIRCUIT_BREAKER_THRESHOLD': 1,
+        'CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS': 120,
+    }), requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=503)
+        send_delivery_statuses_to_service([create_delivery_status_callback_data(first, callback_api)])
+        send_delivery_statuses_to_service([create_delivery_status_callback_data(second, callback_api)])
+
+    assert request_mock.call_count == 1
+    assert mocked.call_count == 2
+    assert mocked.call_args[0][0][0] == str(second.id)
+    assert mocked.call_args[1]['countdown'] == 120
+
+
+def test_circuit_breaker_opens_after_threshold_and_closes_on_success():
+    circuit_breaker = CircuitBreaker(threshold=2, reset_seconds=60)
+
+    circuit_breaker.record_failure()
+    assert not circuit_breaker.is_open()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.is_open()
+
+    circuit_breaker.record_success()
+    assert not circuit_breaker.is_open()
+
+
+def test_circuit_breaker_lets_requests_through_after_reset_period(mocker):
+    mocker.patch('app.celery.service_callback_tasks.monotonic', side_effect=[1000, 1030, 1061])
+    circuit_breaker = CircuitBreaker(threshold=1, reset_seconds=60)
+
+    circuit_breaker.record_failure()
+    assert circuit_breaker.is_open()
+    assert not circuit_breaker.is_open()
+
+
+def test_queue_delivery_status_callbacks_sends_individual_tasks_when_dispatcher_disabled(notify_api, mocker):
+    single = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+    batch = mocker.patch('app.celery.service_callback_tasks.send_delivery_statuses_to_service.apply_async')
+
+    queue_delivery_status_callbacks([('id-1', 'update-1'), ('id-2', 'update-2')])
+
+    assert single.call_args_list == [
+        mocker.call(['id-1', 'update-1'], queue=QueueNames.CALLBACKS),
+        mocker.call(['id-2', 'update-2'], queue=QueueNames.CALLBACKS),
+    ]
+    assert not batch.called
+
+
+def test_queue_delivery_status_callbacks_sends_batches_when_dispatcher_enabled(notify_api, mocker):
+    single = mocker.patch('app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async')
+    batch = mocker.patch('app.celery.service_callback_tasks.send_delivery_statuses_to_service.apply_async')
+
+    with set_config_values(notify_api, {'CALLBACK_DISPATCHER_ENABLED': True, 'CALLBACK_BATCH_SIZE': 2}):
+        queue_delivery_status_callbacks([('id-1', 'update-1'), ('id-2', 'update-2'), ('id-3', 'update-3')])
+
+    assert batch.call_args_list == [
+        mocker.call([['update-1', 'update-2']], queue=QueueNames.CALLBACKS),
+        mocker.call([['update-3']], queue=QueueNames.CALLBACKS),
+    ]
+    assert not single.called
+
+
 def _set_up_test_data(notification_type, callback_type):
     service = create_service(restricted=True)
     template = create_template(service=service, template_type=notification_type, subject='Hello')
@@ -21,9 +21,12 @@ from app.celery import tasks
 from app.celery.tasks import (
     process_job,
     process_row,
+    process_row_batch,
     save_sms,
     save_email,
     save_letter,
+    save_sms_batch,
+    save_email_batch,
     process_incomplete_job,
     process_incomplete_jobs,
     get_template_class,
@@ -200,6 +203,29 @@ def test_should_not_process_email_job_if_would_exceed_send_limits_inc_today(noti
     assert tasks.process_row.called is False
 
 
+@pytest.mark.parametrize('result, expected_status', [
+    (0, 'finished'),
+    (2, 'sending limits exceeded'),
+])
+def test_process_job_reserves_the_whole_job_against_the_daily_limit(
+    notify_api, notify_db_session, mocker, result, expected_status
+):
+    service = create_service(message_limit=10)
+    template = create_template(service=service)
+    job = create_job(template=template, notification_count=10)
+    mocker.patch('app.celery.tasks.s3.get_job_from_s3', return_value=load_example_csv('multiple_sms'))
+    mocker.patch('app.celery.tasks.process_row')
+    fetch_count = mocker.patch('app.celery.tasks.fetch_todays_total_message_count')
+    consume = mocker.patch('app.celery.tasks.consume_sending_allowance', return_value=(result, 10))
+
+    with set_config_values(notify_api, {'ATOMIC_SENDING_LIMITS_ENABLED': True, 'REDIS_ENABLED': True}):
+        process_job(job.id)
+
+    consume.assert_called_once_with(service, 'normal', notification_count=10, check_rate_limit=False)
+    assert not fetch_count.called
+    assert jobs_dao.dao_get_job_by_id(job.id).job_status == expected_status
+
+
 def test_should_not_process_job_if_already_pending(sample_template, mocker):
     job = create_job(template=sample_template, job_status='scheduled')
 
@@ -366,6 +392,43 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template,
     assert job.job_status == 'finished'
 
 
+def test_should_process_sms_job_in_batches_when_batch_processing_enabled(
+    notify_api, sample_job_with_placeholdered_template, mocker
+):
+    mocker.patch('app.celery.tasks.s3.get_job_from_s3', return_value=load_example_csv('multiple_sms'))
+    mocker.patch('app.celery.tasks.save_sms.apply_async')
+    mocker.patch('app.celery.tasks.save_sms_batch.apply_async')
+    mocker.patch('app.encryption.encrypt', return_value="something_encrypted")
+
+    with set_config_values(notify_api, {'BATCH_JOB_PROCESSING_ENABLED': True, 'JOB_BATCH_SIZE': 4}):
+        process_job(sample_job_with_placeholdered_template.id)
+
+    assert not tasks.save_sms.apply_async.called
+    assert tasks.save_sms_batch.apply_async.call_count == 3
+    assert [len(c[0][0]['rows']) for c in encryption.encrypt.call_args_list] == [4, 4, 2]
+    assert encryption.encrypt.call_args[0][0]['rows'][-1]['to'] == '+441234123120'
+    assert encryption.encrypt.call_args[0][0]['rows'][-1]['row_number'] == 9
+    tasks.save_sms_batch.apply_async.assert_called_with(
+        (str(sample_job_with_placeholdered_template.service_id), "something_encrypted"),
+        {},
+        queue="database-tasks"
+    )
+    job = jobs_dao.dao_get_job_by_id(sample_job_with_placeholdered_template.id)
+    assert job.job_status == 'finished'
+
+
+def test_should_not_batch_letter_job_when_batch_processing_enabled(notify_api, sample_letter_job, mocker):
+    mocker.patch('app.celery.tasks.s3.get_job_from_s3', return_value=load_example_csv('multiple_letter'))
+    process_row_mock = mocker.patch('app.celery.tasks.process_row')
+    process_row_batch_mock = mocker.patch('app.celery.tasks.process_row_batch')
+
+    with set_config_values(notify_api, {'BATCH_JOB_PROCESSING_ENABLED': True, 'JOB_BATCH_SIZE': 4}):
+        process_job(sample_letter_job.id)
+
+    assert process_row_mock.called
+    assert not process_row_batch_mock.called
+
+
 # -------------- process_row tests -------------- #
 
 
@@ -377,6 +440,7 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template,
     (LETTER_TYPE, False, 'save_letter', 'database-tasks'),
     (LETTER_TYPE, True, 'save_letter', 'research-mode-tasks'),
 ])
+@freeze_time('2016-01-01 11:09:00.061258')
 def test_process_row_sends_letter_task(template_type, research_mode, expected_function, expected_queue, mocker):
     mocker.patch('app.celery.tasks.create_uuid', return_value='noti_uuid')
     task_mock = mocker.patch('app.celery.tasks.{}.apply_async'.format(expected_function))
@@ -405,7 +469,8 @@ def test_process_row_sends_letter_task(template_type, research_mode, expected_fu
         'job': 'job_id',
         'to': 'recip',
         'row_number': 'row_num',
-        'personalisation': {'foo': 'bar'}
+        'personalisation': {'foo': 'bar'},
+        'created_at': '2016-01-01T11:09:00.061258Z'
     })
     task_mock.assert_called_once_with(
         (
@@ -452,9 +517,207 @@ def test_process_row_when_sender_id_is_provided(mocker, fake_uuid):
         {'sender_id': fake_uuid},
         queue='database-tasks'
     )
+
+
+@pytest.mark.parametrize('template_type, research_mode, expected_function, expected_queue', [
+    (SMS_TYPE, False, 'save_sms_batch', 'database-tasks'),
+    (SMS_TYPE, True, 'save_sms_batch', 'research-mode-tasks'),
+    (EMAIL_TYPE, False, 'save_email_batch', 'database-tasks'),
+    (EMAIL_TYPE, True, 'save_email_batch', 'research-mode-tasks'),
+])
+@freeze_time('2016-01-01 11:09:00.061258')
+def test_process_row_batch_sends_one_task_for_all_rows(
+    template_type, research_mode, expected_function, expected_queue, mocker
+):
+    mocker.patch('app.celery.tasks.create_uuid', side_effect=['noti_uuid_1', 'noti_uuid_2'])
+    task_mock = mocker.patch('app.celery.tasks.{}.apply_async'.format(expected_function))
+    encrypt_mock = mocker.patch('app.celery.tasks.encryption.encrypt')
+    template = Mock(id='template_id', template_type=template_type)
+    job = Mock(id='job_id', template_version='temp_vers')
+    service = Mock(id='service_id', research_mode=research_mode)
+    rows = [
+        Row(
+            {'foo': 'bar', 'to': 'recip_{}'.format(index)},
+            index=index,
+            error_fn=lambda k, v: None,
+            recipient_column_headers=['to'],
+            placeholders={'foo'},
+            template=template,
+        )
+        for index in range(2)
+    ]
+
+    process_row_batch(rows, template, job, service)
+
+    encrypt_mock.assert_called_once_with({
+        'template': 'template_id',
+        'template_version': 'temp_vers',
+        'job': 'job_id',
+        'created_at': '2016-01-01T11:09:00.061258Z',
+        'rows': [
+            {'id': 'noti_uuid_1', 'to': 'recip_0', 'row_number': 0, 'personalisation': {'foo': 'bar'}},
+            {'id': 'noti_uuid_2', 'to': 'recip_1', 'row_number': 1, 'personalisation': {'foo': 'bar'}},
+        ]
+    })
+    task_mock.assert_called_once_with(
+        (
+            'service_id',
+            # encrypted data
+            encrypt_mock.return_value,
+        ),
+        {},
+        queue=expected_queue
+    )
+
+
+# -------- save_sms_batch and save_email_batch tests -------- #
+
+
+def _notification_batch_json(template, recipients, job_id, personalisation=None):
+    return {
+        "template": str(template.id),
+        "template_version": template.version,
+        "job": str(job_id),
+        "rows": [
+            {
+                "id": str(uuid.uuid4()),
+                "to": to,
+                "row_number": row_number,
+                "personalisation": personalisation or {}
+            }
+            for row_number, to in enumerate(recipients)
+        ]
+    }
+
+
+def test_save_sms_batch_persists_notifications_and_queues_delivery(sample_job, mocker):
+    batch = _notification_batch_json(sample_job.template, ['+16502532222', '+16502532223'], sample_job.id)
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+
+    save_sms_batch(sample_job.service_id, encryption.encrypt(batch))
+
+    persisted_notifications = Notification.query.order_by(Notification.job_row_number).all()
+    assert [str(n.id) for n in persisted_notifications] == [row['id'] for row in batch['rows']]
+    assert [n.to for n in persisted_notifications] == ['+16502532222', '+16502532223']
+    assert [n.job_row_number for n in persisted_notifications] == [0, 1]
+    for persisted_notification in persisted_notifications:
+        assert persisted_notification.job_id == sample_job.id
+        assert persisted_notification.template_version == sample_job.template.version
+        assert persisted_notification.status == 'created'
+        assert persisted_notification.notification_type == 'sms'
+        assert persisted_notification.billable_units == 0
+        assert not persisted_notification.international
+        assert not persisted_notification.sent_at
+
+    assert provider_tasks.deliver_sms.apply_async.call_args_list == [
+        call([row['id']], queue='send-sms-tasks') for row in batch['rows']
+    ]
+
+
+def test_save_sms_batch_queues_delivery_on_the_queues_of_the_services_fair_share(sample_job, mocker):
+    batch = _notification_batch_json(sample_job.template, ['+16502532222', '+16502532223'], sample_job.id)
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    send_queues = mocker.patch(
+        'app.celery.tasks.send_queues', return_value=['send-sms-tasks', 'bulk-sms-tasks']
+    )
+
+    save_sms_batch(sample_job.service_id, encryption.encrypt(batch))
+
+    send_queues.assert_called_once_with('sms', sample_job.service, 2)
+    assert provider_tasks.deliver_sms.apply_async.call_args_list == [
+        call([batch['rows'][0]['id']], queue='send-sms-tasks'),
+        call([batch['rows'][1]['id']], queue='bulk-sms-tasks'),
+    ]
+
+
+def test_save_email_batch_persists_notifications_with_reply_to_text(sample_email_job, mocker):
+    service = sample_email_job.service
+    reply_to = create_reply_to_email(service=service, email_address='reply_to@digital.gov.uk', is_default=False)
+    batch = _notification_batch_json(sample_email_job.template, ['one@example.com', 'two@example.com'],
+                                     sample_email_job.id)
+    mocker.patch('app.celery.provider_tasks.deliver_email.apply_async')
+
+    save_email_batch(service.id, encryption.encrypt(batch), sender_id=reply_to.id)
+
+    persisted_notifications = Notification.query.all()
+    assert len(persisted_notifications) == 2
+    assert {n.reply_to_text for n in persisted_notifications} == {'reply_to@digital.gov.uk'}
+    assert {n.normalised_to for n in persisted_notifications} == {'one@example.com', 'two@example.com'}
+    assert provider_tasks.deliver_email.apply_async.call_count == 2
+
+
+def test_save_sms_batch_skips_recipients_not_allowed_for_restricted_service(notify_db_session, mocker):
+    user = create_user(mobile_number="6502532222")
+    service = create_service(user=user, restricted=True)
+    template = create_template(service=service)
+    job = create_job(template=template)
+    batch = _notification_batch_json(template, ['+16502532222', '+16502532299'], job.id)
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+
+    save_sms_batch(service.id, encryption.encrypt(batch))
+
+    persisted_notification = Notification.query.one()
+    assert persisted_notification.to == '+16502532222'
+    provider_tasks.deliver_sms.apply_async.assert_called_once_with(
+        [str(persisted_notification.id)], queue='send-sms-tasks'
+    )
+
+
+def test_save_sms_batch_does_not_queue_notifications_that_already_exist(sample_job, mocker):
+    batch = _notification_batch_json(sample_job.template, ['+16502532222', '+16502532223'], sample_job.id)
+    partial_batch = dict(batch, rows=batch['rows'][:1])
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    retry = mocker.patch('app.celery.tasks.save_sms_batch.retry', side_effect=Exception())
+
+    save_sms_batch(sample_job.service_id, encryption.encrypt(partial_batch))
+    save_sms_batch(sample_job.service_id, encryption.encrypt(batch))
+
+    assert Notification.query.count() == 2
+    assert provider_tasks.deliver_sms.apply_async.call_args_list == [
+        call([row['id']], queue='send-sms-tasks') for row in batch['rows']
+    ]
+    assert not retry.called
+
+
+def test_save_sms_batch_creates_the_notifications_when_the_batch_was_queued(sample_job, mocker):
+    batch = _notification_batch_json(sample_job.template, ['+16502532222'], sample_job.id)
+    batch['created_at'] = '2016-01-01T11:09:00.061258Z'
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+
+    save_sms_batch(sample_job.service_id, encryption.encrypt(batch))
+
+    assert Notification.query.one().created_at == datetime(2016, 1, 1, 11, 9, 0, 61258)
+
+
+def test_save_sms_batch_should_go_to_retry_queue_if_database_errors(sample_job, mocker):
+    batch = _notification_batch_json(sample_job.template, ['+16502532222'], sample_job.id)
+    expected_exception = SQLAlchemyError()
+
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    mocker.patch('app.celery.tasks.save_sms_batch.retry', side_effect=Retry)
+    mocker.patch('app.notifications.process_notifications.dao_create_notifications', side_effect=expected_exception)
+
+    with pytest.raises(Retry):
+        save_sms_batch(sample_job.service_id, encryption.encrypt(batch))
+
+    assert provider_tasks.deliver_sms.apply_async.called is False
+    tasks.save_sms_batch.retry.assert_called_with(exc=expected_exception, queue="retry-tasks")
+    assert Notification.query.count() == 0
+
+
 # -------- save_sms and save_email tests -------- #
 
 
+def test_save_sms_creates_the_notification_when_the_row_was_queued(sample_job, mocker):
+    notification = _notification_json(sample_job.template, '+16502532222', job_id=sample_job.id)
+    notification['created_at'] = '2016-01-01T11:09:00.061258Z'
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+
+    save_sms(sample_job.service_id, uuid.uuid4(), encryption.encrypt(notification))
+
+    assert Notification.query.one().created_at == datetime(2016, 1, 1, 11, 9, 0, 61258)
+
+
 def test_should_send_template_to_correct_sms_task_and_persist(sample_template_with_placeholders, mocker):
     notification = _notification_json(sample_template_with_placeholders,
                                       to="+1 650 253 2222", personalisation={"name": "Jo"})
@@ -1347,7 +1610,7 @@ def test_send_inbound_sms_to_service_retries_if_request_throws_unknown(notify_ap
                                      provider_date=datetime(2017, 6, 20), content="Here is some content")
 
     mocked = mocker.patch('app.celery.tasks.send_inbound_sms_to_service.retry')
-    mocker.patch("app.celery.tasks.request", side_effect=RequestException())
+    mocker.patch("app.celery.tasks.http_session.request", side_effect=RequestException())
 
     send_inbound_sms_to_service(inbound_sms.id, inbound_sms.service_id)
 
@@ -1396,6 +1659,54 @@ def test_process_incomplete_job_sms(mocker, sample_template):
     assert save_sms.call_count == 8  # There are 10 in the file and we've added two already
 
 
+def _stream_example_csv(file):
+    return iter(load_example_csv(file).splitlines(keepends=True))
+
+
+def test_process_incomplete_job_streams_csv_from_resume_row_when_streaming_enabled(
+    notify_api, mocker, sample_template
+):
+    stream_mock = mocker.patch('app.celery.tasks.s3.stream_job_from_s3',
+                               return_value=_stream_example_csv('multiple_sms'))
+    get_job_mock = mocker.patch('app.celery.tasks.s3.get_job_from_s3')
+    mocker.patch('app.celery.tasks.save_sms.apply_async')
+    encrypt_mock = mocker.patch('app.encryption.encrypt', return_value="something_encrypted")
+
+    job = create_job(template=sample_template, notification_count=10,
+                     created_at=datetime.utcnow() - timedelta(hours=2),
+                     scheduled_for=datetime.utcnow() - timedelta(minutes=31),
+                     processing_started=datetime.utcnow() - timedelta(minutes=31),
+                     job_status=JOB_STATUS_ERROR)
+
+    create_notification(sample_template, job, 0)
+    create_notification(sample_template, job, 1)
+
+    with set_config_values(notify_api, {'JOB_CSV_STREAMING_ENABLED': True, 'JOB_CSV_STREAMING_ROWS': 3}):
+        process_incomplete_job(str(job.id))
+
+    stream_mock.assert_called_once_with(str(job.service_id), str(job.id))
+    assert not get_job_mock.called
+    assert [c[0][0]['row_number'] for c in encrypt_mock.call_args_list] == list(range(2, 10))
+    assert [c[0][0]['to'] for c in encrypt_mock.call_args_list] == [
+        '+441234123123', '+441234123124', '+441234123125', '+441234123126',
+        '+441234123127', '+441234123128', '+441234123129', '+441234123120',
+    ]
+    assert Job.query.get(job.id).job_status == JOB_STATUS_FINISHED
+
+
+def test_process_job_streams_csv_when_streaming_enabled(notify_api, sample_job_with_placeholdered_template, mocker):
+    mocker.patch('app.celery.tasks.s3.stream_job_from_s3', return_value=_stream_example_csv('multiple_sms'))
+    mocker.patch('app.celery.tasks.save_sms.apply_async')
+    encrypt_mock = mocker.patch('app.encryption.encrypt', return_value="something_encrypted")
+
+    with set_config_values(notify_api, {'JOB_CSV_STREAMING_ENABLED': True, 'JOB_CSV_STREAMING_ROWS': 4}):
+        process_job(sample_job_with_placeholdered_template.id)
+
+    assert tasks.save_sms.apply_async.call_count == 10
+    assert [c[0][0]['row_number'] for c in encrypt_mock.call_args_list] == list(range(10))
+    assert encrypt_mock.call_args[0][0]['personalisation'] == {'phonenumber': '+441234123120', 'name': 'chris'}
+
+
 def test_process_incomplete_job_with_notifications_all_sent(mocker, sample_template):
 
     mocker.patch('app.celery.tasks.s3.get_job_from_s3', return_value=load_example_csv('multiple_sms'))
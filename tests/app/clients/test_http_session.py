@@ -0,0 +1,70 @@
+import requests_mock
+import pytest
+from requests.adapters import HTTPAdapter
+
+from app.clients.http_session import HTTPSession, PooledHTTPAdapter
+
+
+@pytest.fixture(scope='function')
+def http_session(mocker):
+    http_session = HTTPSession()
+    app = mocker.Mock(config={
+        'HTTP_POOL_CONNECTIONS': 4,
+        'HTTP_POOL_MAXSIZE': 8,
+        'HTTP_CONNECT_TIMEOUT': 2,
+        'HTTP_READ_TIMEOUT': 30,
+    })
+    http_session.init_app(app, statsd_client=mocker.Mock())
+    return http_session
+
+
+def test_post_uses_separate_connect_and_read_timeouts(http_session):
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post('https://example.com/callback', json={}, status_code=200)
+        http_session.post('https://example.com/callback', json={'foo': 'bar'})
+
+    assert request_mock.last_request.timeout == (2, 30)
+    assert request_mock.last_request.json() == {'foo': 'bar'}
+
+
+def test_request_allows_timeout_to_be_overridden(http_session):
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post('https://example.com/callback', json={}, status_code=200)
+        http_session.request('POST', 'https://example.com/callback', timeout=1)
+
+    assert request_mock.last_request.timeout == 1
+
+
+def test_session_is_reused_within_a_process(http_session):
+    assert http_session.session is http_session.session
+
+    adapter = http_session.session.get_adapter('https://example.com')
+    assert isinstance(adapter, PooledHTTPAdapter)
+    assert adapter._pool_connections == 4
+    assert adapter._pool_maxsize == 8
+
+
+def test_session_is_rebuilt_after_fork(http_session, mocker):
+    session = http_session.session
+
+    mocker.patch('app.clients.http_session.os.getpid', return_value=-1)
+
+    assert http_session.session is not session
+
+
+@pytest.mark.parametrize('new_connections, expected_metric', [
+    (0, 'clients.http-pool.hit'),
+    (1, 'clients.http-pool.miss'),
+])
+def test_adapter_records_pool_hits_and_misses(mocker, new_connections, expected_metric):
+    statsd_client = mocker.Mock()
+    adapter = PooledHTTPAdapter(statsd_client=statsd_client)
+    pool = adapter.get_connection('https://example.com/')
+
+    def send(self, request, **kwargs):
+        pool.num_connections += new_connections
+
+    mocker.patch.object(HTTPAdapter, 'send', send)
+    adapter.send(mocker.Mock(url='https://example.com/'))
+
+    statsd_client.incr.assert_called_once_with(expected_metric)
@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime, timedelta
 from functools import partial
+from types import SimpleNamespace
 
 import pytest
 from freezegun import freeze_time
@@ -10,14 +11,22 @@ from sqlalchemy.orm.exc import NoResultFound
 
 from app.dao.notifications_dao import (
     dao_create_notification,
+    dao_create_notifications,
     dao_created_scheduled_notification,
     dao_delete_notifications_by_id,
     dao_get_last_notification_added_for_job_id,
     dao_get_last_template_usage,
     dao_get_notifications_by_to_field,
+    dao_claim_scheduled_notifications,
+    dao_set_scheduled_notifications_to_pending,
     dao_get_scheduled_notifications,
     dao_timeout_notifications,
+    dao_timeout_notifications_in_chunks,
     dao_update_notification,
+    dao_update_notification_if_status,
+    dao_update_notification_statuses,
+    dao_update_notification_statuses_by_references,
+    dao_update_sent_notifications,
     dao_update_notifications_by_reference,
     delete_notifications_older_than_retention_by_type,
     get_notification_by_id,
@@ -25,6 +34,7 @@ from app.dao.notifications_dao import (
     get_notification_with_personalisation,
     get_notifications_for_job,
     get_notifications_for_service,
+    count_undelivered_notifications_for_provider,
     is_delivery_slow_for_provider,
     set_scheduled_notification_to_processed,
     update_notification_status_by_id,
@@ -34,6 +44,7 @@ from app.dao.notifications_dao import (
     dao_get_notification_history_by_reference,
     notifications_not_yet_sent,
 )
+from app.delivery.sent_status_buffer import SentStatus
 from app.models import (
     Job,
     Notification,
@@ -58,6 +69,7 @@ from tests.app.db import (
     create_template,
     create_notification_history
 )
+from tests.conftest import set_config
 
 
 def test_should_have_decorated_notifications_dao_functions():
@@ -311,6 +323,39 @@ def test_save_notification_creates_sms(sample_template, sample_job):
     assert notification_from_db.status == 'created'
 
 
+def test_dao_create_notifications_creates_all_notifications(sample_template, sample_job):
+    notifications = [
+        Notification(**_notification_json(sample_template, job_id=sample_job.id, id=uuid.uuid4()))
+        for _ in range(3)
+    ]
+
+    created_ids = dao_create_notifications(notifications)
+
+    assert sorted(created_ids) == sorted(n.id for n in notifications)
+    assert Notification.query.count() == 3
+    for notification_from_db in Notification.query.all():
+        assert notification_from_db.job_id == sample_job.id
+        assert notification_from_db.service_id == sample_template.service_id
+        assert notification_from_db.status == 'created'
+        assert notification_from_db.international is False
+
+
+def test_dao_create_notifications_skips_notifications_that_already_exist(sample_template):
+    existing = create_notification(template=sample_template)
+    new_notification = Notification(**_notification_json(sample_template, id=uuid.uuid4()))
+    duplicate = Notification(**_notification_json(sample_template, id=existing.id))
+
+    created_ids = dao_create_notifications([duplicate, new_notification])
+
+    assert created_ids == [new_notification.id]
+    assert Notification.query.count() == 2
+
+
+def test_dao_create_notifications_does_nothing_for_empty_list(sample_template):
+    assert dao_create_notifications([]) == []
+    assert Notification.query.count() == 0
+
+
 def test_save_notification_and_create_email(sample_email_template, sample_job):
     assert Notification.query.count() == 0
 
@@ -704,6 +749,36 @@ def test_dao_timeout_notifications_doesnt_affect_letters(sample_letter_template)
     technical_failure_notifications, temporary_failure_notifications = dao_timeout_notifications(1)
 
 
+def test_dao_timeout_notifications_in_chunks_commits_each_chunk(sample_template):
+    with freeze_time(datetime.utcnow() - timedelta(minutes=2)):
+        created = create_notification(sample_template, status='created')
+        sending = create_notification(sample_template, status='sending')
+        pending = create_notification(sample_template, status='pending')
+        delivered = create_notification(sample_template, status='delivered')
+
+    chunks = []
+    for notifications in dao_timeout_notifications_in_chunks(1, chunk_size=2):
+        # each chunk is already committed by the time it's handed back
+        assert all(Notification.query.get(n.id).status == n.status for n in notifications)
+        chunks.append([(n.id, n.status) for n in notifications])
+
+    assert chunks[0] == [(created.id, 'technical-failure')]
+    assert sorted(chunks[1]) == sorted([(sending.id, 'temporary-failure'), (pending.id, 'temporary-failure')])
+    assert len(chunks) == 2
+    assert Notification.query.get(delivered.id).status == 'delivered'
+
+
+def test_dao_timeout_notifications_uses_the_configured_chunk_size(notify_api, sample_template, mocker):
+    in_chunks = mocker.patch(
+        'app.dao.notifications_dao.dao_timeout_notifications_in_chunks', return_value=iter([])
+    )
+
+    with set_config(notify_api, 'TIMEOUT_NOTIFICATIONS_CHUNK_SIZE', 3):
+        dao_timeout_notifications(1)
+
+    in_chunks.assert_called_once_with(1, 3)
+
+
 def test_should_return_notifications_excluding_jobs_by_default(sample_template, sample_job, sample_api_key):
     create_notification(sample_template, job=sample_job)
     without_job = create_notification(sample_template, api_key=sample_api_key)
@@ -745,6 +820,32 @@ def test_should_not_count_pages_when_given_a_flag(sample_user, sample_template):
     assert pagination.items[0].id == notification.id
 
 
+def test_get_notifications_for_service_estimates_total_when_given_a_flag(sample_template):
+    create_notification(sample_template)
+    create_notification(sample_template)
+
+    pagination = get_notifications_for_service(sample_template.service_id, estimate_count=True, page_size=1)
+    assert len(pagination.items) == 1
+    assert isinstance(pagination.total, int)
+
+
+def test_get_notifications_for_service_older_than_pages_through_notifications_created_at_the_same_time(
+        sample_template
+):
+    created_at = datetime.utcnow()
+    notifications = [create_notification(sample_template, created_at=created_at) for _ in range(3)]
+
+    first_page = get_notifications_for_service(sample_template.service_id, page_size=2, count_pages=False).items
+    second_page = get_notifications_for_service(
+        sample_template.service_id, page_size=2, count_pages=False, older_than=first_page[-1].id
+    ).items
+
+    assert len(first_page) == 2
+    assert len(second_page) == 1
+    assert sorted(n.id for n in first_page + second_page) == sorted(n.id for n in notifications)
+    assert [n.id for n in first_page] == sorted((n.id for n in notifications), reverse=True)[:2]
+
+
 def test_get_notifications_created_by_api_or_csv_are_returned_correctly_excluding_test_key_notifications(
         notify_db,
         notify_db_session,
@@ -975,6 +1076,20 @@ def test_is_delivery_slow_for_provider(
     assert is_delivery_slow_for_provider(datetime.utcnow(), "mmg", threshold, timedelta(minutes=4)) is expected_result
 
 
+@freeze_time("2018-12-04 12:00:00.000000")
+def test_count_undelivered_notifications_for_provider(sample_template):
+    slow = partial(create_notification, template=sample_template, sent_at=datetime.now() - timedelta(minutes=5))
+    slow(status='sending', sent_by='mmg')
+    slow(status='pending', sent_by='mmg')
+    slow(status='delivered', sent_by='mmg')
+    slow(status='sending', sent_by='firetext')
+    create_notification(template=sample_template, status='sending', sent_by='mmg', sent_at=datetime.now())
+
+    assert count_undelivered_notifications_for_provider(
+        datetime.utcnow() - timedelta(minutes=10), 'mmg', timedelta(minutes=4)
+    ) == (3, 2)
+
+
 @pytest.mark.parametrize("options,expected_result", [
     ({"status": NOTIFICATION_DELIVERED, "sent_by": "mmg"}, True),
     ({"status": NOTIFICATION_PENDING, "sent_by": "mmg"}, True),
@@ -1210,6 +1325,51 @@ def test_dao_get_notifications_by_to_field_only_searches_one_notification_type(
     assert results[0].id == email.id
 
 
+def test_dao_get_notifications_by_to_field_prefers_exact_matches_for_full_recipients(sample_email_template):
+    notification = create_notification(
+        template=sample_email_template, to_field='jack@gmail.com', normalised_to='jack@gmail.com'
+    )
+    create_notification(template=sample_email_template, to_field='xjack@gmail.com', normalised_to='xjack@gmail.com')
+
+    results = dao_get_notifications_by_to_field(notification.service_id, 'Jack@gmail.com', notification_type='email')
+
+    assert [result.id for result in results] == [notification.id]
+
+
+def test_dao_get_notifications_by_to_field_pages_through_results(sample_template):
+    notifications = [
+        create_notification(
+            template=sample_template,
+            to_field='+16502532222',
+            normalised_to='+16502532222',
+            created_at=datetime(2020, 1, 1, 12, 0) + timedelta(minutes=i)
+        )
+        for i in range(3)
+    ]
+    # a notification created at the same time must not be skipped between pages
+    notifications.append(create_notification(
+        template=sample_template,
+        to_field='+16502532222',
+        normalised_to='+16502532222',
+        created_at=notifications[1].created_at
+    ))
+    service_id = sample_template.service_id
+
+    first_page = dao_get_notifications_by_to_field(service_id, '+16502532222', page_size=2)
+    second_page = dao_get_notifications_by_to_field(
+        service_id, '+16502532222', page_size=2, older_than=first_page[-1].id
+    )
+    third_page = dao_get_notifications_by_to_field(
+        service_id, '+16502532222', page_size=2, older_than=second_page[-1].id
+    )
+
+    assert len(first_page) == 2
+    assert first_page[0].id == notifications[2].id
+    assert len(second_page) == 2
+    assert third_page == []
+    assert {n.id for n in first_page + second_page} == {n.id for n in notifications}
+
+
 def test_dao_created_scheduled_notification(sample_notification):
 
     scheduled_notification = ScheduledNotification(notification_id=sample_notification.id,
@@ -1246,6 +1406,29 @@ def test_set_scheduled_notification_to_processed(sample_template):
     assert not scheduled_notifications
 
 
+@freeze_time('2017-05-05 15:00:00')
+def test_dao_claim_scheduled_notifications_claims_the_earliest_due_notifications(sample_template):
+    later = create_notification(template=sample_template, scheduled_for='2017-05-05 14:30')
+    earlier = create_notification(template=sample_template, scheduled_for='2017-05-05 14:15')
+    create_notification(template=sample_template, scheduled_for='2017-05-05 14:00', status='delivered')
+    create_notification(template=sample_template, scheduled_for='2017-05-05 15:15')
+
+    assert dao_claim_scheduled_notifications(1) == [earlier]
+    assert dao_claim_scheduled_notifications(5) == [later]
+    assert dao_claim_scheduled_notifications(5) == []
+    assert not earlier.scheduled_notification.pending
+
+
+@freeze_time('2017-05-05 15:00:00')
+def test_dao_set_scheduled_notifications_to_pending_lets_them_be_claimed_again(sample_template):
+    notification = create_notification(template=sample_template, scheduled_for='2017-05-05 14:30')
+    assert dao_claim_scheduled_notifications(5) == [notification]
+
+    dao_set_scheduled_notifications_to_pending([notification.id])
+
+    assert dao_claim_scheduled_notifications(5) == [notification]
+
+
 def test_dao_get_notifications_by_to_field_filters_status(sample_template):
     notification = create_notification(
         template=sample_template, to_field='+16502532222',
@@ -1353,6 +1536,217 @@ def test_dao_get_last_notification_added_for_job_id_no_job(sample_template, fake
     assert dao_get_last_notification_added_for_job_id(fake_uuid) is None
 
 
+def test_dao_update_notification_statuses_updates_each_notification_to_its_own_status(sample_email_template):
+    sending = create_notification(template=sample_email_template, status='sending')
+    pending = create_notification(template=sample_email_template, status='pending')
+
+    with freeze_time('2020-01-01 12:00:00'):
+        updated_ids = dao_update_notification_statuses({
+            sending.id: 'delivered',
+            pending.id: 'permanent-failure',
+        })
+
+    assert set(updated_ids) == {sending.id, pending.id}
+    assert Notification.query.get(sending.id).status == 'delivered'
+    assert Notification.query.get(pending.id).status == 'permanent-failure'
+    assert Notification.query.get(sending.id).updated_at == datetime(2020, 1, 1, 12, 0, 0)
+
+
+def test_dao_update_notification_statuses_does_not_update_notifications_that_have_moved_on(sample_email_template):
+    delivered = create_notification(template=sample_email_template, status='delivered')
+    sending = create_notification(template=sample_email_template, status='sending')
+
+    updated_ids = dao_update_notification_statuses({
+        delivered.id: 'permanent-failure',
+        sending.id: 'delivered',
+    })
+
+    assert updated_ids == [sending.id]
+    assert Notification.query.get(delivered.id).status == 'delivered'
+
+
+def test_dao_update_notification_statuses_returns_empty_list_when_nothing_to_update(notify_db):
+    assert dao_update_notification_statuses({}) == []
+
+
+def test_dao_update_notification_statuses_records_the_old_status_of_each_notification(sample_email_template, mocker):
+    record_status_changes = mocker.patch('app.dao.notifications_dao.record_status_changes')
+    sending = create_notification(template=sample_email_template, status='sending')
+    pending = create_notification(template=sample_email_template, status='pending')
+
+    dao_update_notification_statuses({
+        sending.id: 'delivered',
+        pending.id: 'permanent-failure',
+    })
+
+    changes = {row.id: (row.old_status, row.status) for row, _ in record_status_changes.call_args[0][0]}
+    assert changes == {
+        sending.id: ('sending', 'delivered'),
+        pending.id: ('pending', 'permanent-failure'),
+    }
+
+
+def test_update_notification_status_by_id_records_the_status_change(sample_template, mocker):
+    notification = create_notification(template=sample_template, status='sending')
+    record_status_changes = mocker.patch('app.dao.notifications_dao.record_status_changes')
+
+    update_notification_status_by_id(notification.id, 'delivered')
+
+    record_status_changes.assert_called_once_with([(notification, 'sending')])
+    assert notification.status == 'delivered'
+
+
+def test_update_notification_status_by_id_records_the_delivery_latency(sample_template, mocker):
+    notification = create_notification(template=sample_template, status='sending', sent_at=datetime.utcnow())
+    record_delivery_latencies = mocker.patch('app.dao.notifications_dao.record_delivery_latencies')
+
+    update_notification_status_by_id(notification.id, 'delivered')
+
+    record_delivery_latencies.assert_called_once_with([notification])
+
+
+def test_update_notification_status_by_id_does_not_overwrite_sent_by(sample_template):
+    notification = create_notification(template=sample_template, status='sending', sent_by='firetext')
+
+    updated = update_notification_status_by_id(notification.id, 'delivered', sent_by='mmg')
+
+    assert updated.status == 'delivered'
+    assert updated.sent_by == 'firetext'
+
+
+def test_update_notification_status_by_id_logs_duplicate_updates(sample_template, mocker):
+    duplicate_update_warning = mocker.patch('app.dao.notifications_dao._duplicate_update_warning')
+    notification = create_notification(template=sample_template, status='delivered')
+
+    assert update_notification_status_by_id(notification.id, 'permanent-failure') is None
+
+    duplicate_update_warning.assert_called_once_with(notification, 'permanent-failure')
+
+
+def test_update_notification_status_by_id_does_not_log_updates_for_countries_without_receipts(sample_template, mocker):
+    duplicate_update_warning = mocker.patch('app.dao.notifications_dao._duplicate_update_warning')
+    notification = create_notification(
+        sample_template,
+        status=NOTIFICATION_SENT,
+        international=True,
+        phone_prefix='249'
+    )
+
+    assert update_notification_status_by_id(notification.id, 'delivered') is None
+
+    assert duplicate_update_warning.call_count == 0
+
+
+def test_update_notification_status_by_reference_from_pending_to_temporary_failure(sample_email_template):
+    notification = create_notification(template=sample_email_template, status='pending', reference='reference')
+
+    updated = update_notification_status_by_reference('reference', 'permanent-failure')
+
+    assert updated.status == 'temporary-failure'
+    assert Notification.query.get(notification.id).status == 'temporary-failure'
+
+
+def test_dao_update_notification_statuses_by_references_updates_each_notification(sample_email_template):
+    sending = create_notification(template=sample_email_template, status='sending', reference='ref1')
+    pending = create_notification(template=sample_email_template, status='pending', reference='ref2')
+    delivered = create_notification(template=sample_email_template, status='delivered', reference='ref3')
+
+    with freeze_time('2020-01-01 12:00:00'):
+        updated = dao_update_notification_statuses_by_references({
+            'ref1': 'delivered',
+            'ref2': 'permanent-failure',
+            'ref3': 'permanent-failure',
+            'ref4': 'delivered',
+        })
+
+    assert {notification.id: notification.status for notification in updated} == {
+        sending.id: 'delivered',
+        pending.id: 'temporary-failure',
+    }
+    assert all(notification.updated_at == datetime(2020, 1, 1, 12, 0, 0) for notification in updated)
+    assert Notification.query.get(sending.id).status == 'delivered'
+    assert Notification.query.get(pending.id).status == 'temporary-failure'
+    assert Notification.query.get(delivered.id).status == 'delivered'
+
+
+def test_dao_update_notification_statuses_by_references_returns_empty_list_when_nothing_to_update(notify_db):
+    assert dao_update_notification_statuses_by_references({}) == []
+
+
+def test_dao_update_notification_statuses_by_references_records_the_old_statuses(sample_email_template, mocker):
+    record_status_changes = mocker.patch('app.dao.notifications_dao.record_status_changes')
+    record_delivery_latencies = mocker.patch('app.dao.notifications_dao.record_delivery_latencies')
+    notification = create_notification(template=sample_email_template, status='sending', reference='ref1')
+
+    updated = dao_update_notification_statuses_by_references({'ref1': 'delivered'})
+
+    assert [(n.id, n.status, old_status) for n, old_status in record_status_changes.call_args[0][0]] == [
+        (notification.id, 'delivered', 'sending')
+    ]
+    record_delivery_latencies.assert_called_once_with(updated)
+
+
+def test_dao_update_notification_if_status_writes_the_given_fields(sample_template, mocker):
+    record_status_changes = mocker.patch('app.dao.notifications_dao.record_status_changes')
+    notification = create_notification(template=sample_template, status='created')
+    changes = SimpleNamespace(id=notification.id, status='sending', sent_by='ses', reference='changed')
+
+    assert dao_update_notification_if_status(changes, 'created', ('status', 'sent_by'))
+
+    updated = Notification.query.get(notification.id)
+    assert (updated.status, updated.sent_by, updated.reference) == ('sending', 'ses', None)
+    record_status_changes.assert_called_once_with([(changes, 'created')])
+
+
+def test_dao_update_notification_if_status_does_not_update_notifications_that_have_moved_on(sample_template):
+    notification = create_notification(template=sample_template, status='delivered')
+    changes = SimpleNamespace(id=notification.id, status='sending')
+
+    assert not dao_update_notification_if_status(changes, 'created', ('status',))
+
+    assert Notification.query.get(notification.id).status == 'delivered'
+
+
+def test_dao_update_sent_notifications_writes_each_notification(sample_template, mocker):
+    record_status_changes = mocker.patch('app.dao.notifications_dao.record_status_changes')
+    first = create_notification(template=sample_template, status='created')
+    second = create_notification(template=sample_template, status='created')
+    sent_at = datetime(2020, 1, 1, 12, 0, 0)
+
+    assert dao_update_sent_notifications([
+        SentStatus(first.id, sent_at, 'sns', 'sent', 'ref1', 1),
+        SentStatus(second.id, sent_at, 'mmg', 'sent', 'ref2', 2),
+    ]) == 2
+
+    updated = {notification.id: notification for notification in Notification.query.all()}
+    assert (updated[first.id].status, updated[first.id].sent_by, updated[first.id].reference) == ('sent', 'sns', 'ref1')
+    assert (updated[second.id].sent_at, updated[second.id].billable_units) == (sent_at, 2)
+    changes = {row.id: (old_status, row.status) for row, old_status in record_status_changes.call_args[0][0]}
+    assert changes == {first.id: ('created', 'sent'), second.id: ('created', 'sent')}
+
+
+def test_dao_update_sent_notifications_keeps_the_status_of_notifications_that_have_moved_on(sample_email_template):
+    notification = create_notification(template=sample_email_template, status='delivered')
+
+    dao_update_sent_notifications([SentStatus(notification.id, datetime.utcnow(), 'ses', 'sending', 'ref', 0)])
+
+    updated = Notification.query.get(notification.id)
+    assert (updated.status, updated.sent_by, updated.reference) == ('delivered', 'ses', 'ref')
+
+
+def test_dao_update_sent_notifications_does_nothing_when_nothing_was_sent(notify_db):
+    assert dao_update_sent_notifications([]) == 0
+
+
+def test_dao_create_notification_records_the_new_notification(sample_template, mocker):
+    record_notifications_created = mocker.patch('app.dao.notifications_dao.record_notifications_created')
+    notification = Notification(**_notification_json(sample_template))
+
+    dao_create_notification(notification)
+
+    record_notifications_created.assert_called_once_with([notification])
+
+
 def test_dao_update_notifications_by_reference_updated_notifications(sample_template):
     notification_1 = create_notification(template=sample_template, reference='ref1')
     notification_2 = create_notification(template=sample_template, reference='ref2')
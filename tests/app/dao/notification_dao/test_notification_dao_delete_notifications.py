@@ -3,15 +3,25 @@ from datetime import (
     date,
     timedelta
 )
+import uuid
+
 import pytest
 from flask import current_app
 from freezegun import freeze_time
 
+from app import db
 from app.dao.notifications_dao import (
+    dao_create_notification_partitions,
+    dao_create_notifications,
+    dao_drop_notification_partitions_older_than,
+    dao_get_notification_partitions,
+    dao_partition_notifications_table,
     delete_notifications_older_than_retention_by_type,
-    insert_update_notification_history
+    insert_update_notification_history,
+    is_notifications_table_partitioned,
+    notification_partition_name,
 )
-from app.models import Notification, NotificationHistory
+from app.models import KEY_TYPE_NORMAL, Notification, NotificationHistory
 from tests.app.db import (
     create_template,
     create_notification,
@@ -304,3 +314,122 @@ def test_insert_update_notification_history_updates_history_with_new_status(samp
     history = NotificationHistory.query.get(notification_2.id)
     assert history.status == 'delivered'
     assert not NotificationHistory.query.get(notification_1.id)
+
+
+@pytest.mark.parametrize('notification_type', ['sms', 'email'])
+def test_delete_notifications_leaves_default_retention_to_partitions_when_partitioned(
+    sample_service, notification_type, mocker
+):
+    mocker.patch("app.dao.notifications_dao.notifications_are_expired_by_partition", return_value=True)
+    create_test_data(notification_type, sample_service)
+
+    delete_notifications_older_than_retention_by_type(notification_type)
+
+    # only the notification older than the service's own retention is deleted
+    assert Notification.query.count() == 8
+    assert Notification.query.filter_by(notification_type=notification_type).count() == 2
+
+
+def test_delete_notifications_still_deletes_letters_row_by_row_when_partitioned(sample_service, mocker):
+    mocker.patch("app.dao.notifications_dao.get_s3_bucket_objects")
+    mocker.patch("app.dao.notifications_dao.notifications_are_expired_by_partition", return_value=True)
+    create_test_data('letter', sample_service)
+
+    delete_notifications_older_than_retention_by_type('letter')
+
+    assert Notification.query.filter_by(notification_type='letter').count() == 1
+
+
+def test_notifications_table_is_not_partitioned_by_default(notify_db_session):
+    assert not is_notifications_table_partitioned()
+    assert dao_get_notification_partitions() == []
+
+
+def test_notification_partition_name():
+    assert notification_partition_name(date(2019, 8, 3)) == 'notifications_p20190803'
+
+
+@pytest.fixture
+def notifications_partitioned_in_one_transaction(notify_db_session, mocker):
+    """
+    Partitions notifications without committing, so the table is put back when the session is rolled back at the
+    end of the test.
+    """
+    mocker.patch.object(db.session, 'commit')
+    with freeze_time('2019-08-01 12:00'):
+        dao_partition_notifications_table()
+    yield
+    db.session.remove()
+
+
+def _notification(template, created_at, notification_id=None):
+    return Notification(
+        id=notification_id or uuid.uuid4(),
+        to='+447700900855',
+        service_id=template.service_id,
+        template_id=template.id,
+        template_version=template.version,
+        created_at=created_at,
+        notification_type=template.template_type,
+        key_type=KEY_TYPE_NORMAL
+    )
+
+
+def test_dao_partition_notifications_table_attaches_the_existing_notifications(sample_template, mocker):
+    mocker.patch.object(db.session, 'commit')
+    notification = create_notification(template=sample_template, created_at=datetime(2019, 7, 31, 12))
+
+    with freeze_time('2019-08-01 12:00'):
+        dao_partition_notifications_table()
+
+    assert is_notifications_table_partitioned()
+    assert dao_get_notification_partitions() == [('notifications_unpartitioned', datetime(2019, 8, 2))]
+    assert Notification.query.one().id == notification.id
+
+
+def test_dao_create_notification_partitions_creates_the_days_not_already_covered(
+    notifications_partitioned_in_one_transaction
+):
+    assert dao_create_notification_partitions(date(2019, 8, 1), 3) == [
+        'notifications_p20190802', 'notifications_p20190803'
+    ]
+    assert dao_create_notification_partitions(date(2019, 8, 1), 3) == []
+    assert dao_get_notification_partitions() == [
+        ('notifications_unpartitioned', datetime(2019, 8, 2)),
+        ('notifications_p20190802', datetime(2019, 8, 3)),
+        ('notifications_p20190803', datetime(2019, 8, 4)),
+    ]
+
+
+def test_dao_drop_notification_partitions_older_than_archives_and_drops_the_days(
+    sample_template, sample_letter_template, notifications_partitioned_in_one_transaction
+):
+    dao_create_notification_partitions(date(2019, 8, 1), 3)
+    sms = create_notification(template=sample_template, created_at=datetime(2019, 8, 2, 12))
+    letter = create_notification(template=sample_letter_template, created_at=datetime(2019, 8, 2, 12))
+    later_sms = create_notification(template=sample_template, created_at=datetime(2019, 8, 3, 12))
+
+    assert dao_drop_notification_partitions_older_than(datetime(2019, 8, 3)) == [
+        'notifications_unpartitioned', 'notifications_p20190802'
+    ]
+
+    assert dao_get_notification_partitions() == [('notifications_p20190803', datetime(2019, 8, 4))]
+    assert NotificationHistory.query.get(sms.id)
+    # letters are still expired row by row, so they're kept in the default partition
+    assert sorted(n.id for n in Notification.query.all()) == sorted([letter.id, later_sms.id])
+
+
+def test_dao_create_notifications_skips_a_redelivered_batch_when_partitioned(
+    sample_template, notifications_partitioned_in_one_transaction
+):
+    dao_create_notification_partitions(date(2019, 8, 1), 2)
+    notification_id = uuid.uuid4()
+
+    created_ids = dao_create_notifications([_notification(sample_template, datetime(2019, 8, 2, 12), notification_id)])
+    redelivered_ids = dao_create_notifications(
+        [_notification(sample_template, datetime(2019, 8, 2, 12), notification_id)]
+    )
+
+    assert created_ids == [notification_id]
+    assert redelivered_ids == []
+    assert Notification.query.count() == 1
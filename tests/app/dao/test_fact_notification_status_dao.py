@@ -7,6 +7,7 @@ import mock
 from app.dao.fact_notification_status_dao import (
     update_fact_notification_status,
     fetch_monthly_notification_statuses_per_service,
+    fetch_notification_status_counts_for_day,
     fetch_notification_status_for_day,
     fetch_notification_status_for_service_by_month,
     fetch_notification_status_for_service_for_day,
@@ -17,7 +18,8 @@ from app.dao.fact_notification_status_dao import (
     get_total_sent_notifications_for_day_and_type,
     get_total_notifications_sent_for_api_key,
     get_last_send_for_api_key,
-    get_api_key_ranked_by_notifications_created
+    get_api_key_ranked_by_notifications_created,
+    rebuild_fact_notification_status_for_day,
 )
 from app.models import (
     FactNotificationStatus,
@@ -36,12 +38,14 @@ from app.models import (
     NOTIFICATION_TECHNICAL_FAILURE,
     NOTIFICATION_TEMPORARY_FAILURE,
 )
+from app.notifications.todays_stats import TodaysStat
 from freezegun import freeze_time
 
 from tests.app.db import (
     create_notification, create_service, create_template, create_ft_notification_status,
     create_job, create_notification_history, create_api_key
 )
+from tests.conftest import set_config_values
 
 
 def test_update_fact_notification_status(notify_db_session):
@@ -121,6 +125,53 @@ def test__update_fact_notification_status_updates_row(notify_db_session):
     assert updated_fact_data[0].notification_count == 2
 
 
+def test_rebuild_fact_notification_status_for_day(notify_db_session):
+    first_service = create_service(service_name='First Service')
+    first_template = create_template(service=first_service)
+    second_service = create_service(service_name='second Service')
+    second_template = create_template(service=second_service, template_type='email')
+
+    create_notification(template=first_template, status='delivered')
+    create_notification(template=first_template, status='delivered')
+    create_notification(template=first_template, status='delivered', key_type=KEY_TYPE_TEST)
+    create_notification(template=first_template, created_at=datetime.utcnow() - timedelta(days=1))
+    # history rows are ignored for a service and type that still has notifications for the day
+    create_notification_history(template=first_template, status='delivered')
+    # simulate a service with data retention - data has been moved to history and does not exist in notifications
+    create_notification_history(template=second_template, status='temporary-failure')
+
+    process_day = datetime.utcnow().date()
+    assert rebuild_fact_notification_status_for_day(process_day) == 2
+
+    new_fact_data = FactNotificationStatus.query.order_by(FactNotificationStatus.notification_type).all()
+    assert [
+        (row.bst_date, row.service_id, row.notification_type, row.key_type, row.notification_status,
+         row.notification_count, row.job_id)
+        for row in new_fact_data
+    ] == [
+        (process_day, second_service.id, 'email', KEY_TYPE_NORMAL, 'temporary-failure', 1,
+         UUID('00000000-0000-0000-0000-000000000000')),
+        (process_day, first_service.id, 'sms', KEY_TYPE_NORMAL, 'delivered', 2,
+         UUID('00000000-0000-0000-0000-000000000000')),
+    ]
+
+
+def test_rebuild_fact_notification_status_for_day_replaces_only_that_day(notify_db_session):
+    service = create_service()
+    template = create_template(service=service)
+    create_ft_notification_status(date(2019, 1, 1), service=service, template=template, count=10)
+    create_ft_notification_status(date(2019, 1, 2), service=service, template=template, count=20)
+    create_notification(template=template, status='delivered', created_at=datetime(2019, 1, 2, 12, 0))
+
+    rebuild_fact_notification_status_for_day(date(2019, 1, 2))
+
+    new_fact_data = FactNotificationStatus.query.order_by(FactNotificationStatus.bst_date).all()
+    assert [(row.bst_date, row.notification_count) for row in new_fact_data] == [
+        (date(2019, 1, 1), 10),
+        (date(2019, 1, 2), 1),
+    ]
+
+
 def test_fetch_notification_status_for_service_by_month(notify_db_session):
     service_1 = create_service(service_name='service_1')
     service_2 = create_service(service_name='service_2')
@@ -256,6 +307,59 @@ def test_fetch_notification_status_for_service_for_today_and_7_previous_days(not
     assert results[3].count == 11
 
 
+@freeze_time('2018-10-31T18:00:00')
+@pytest.mark.parametrize('by_template', [False, True])
+def test_fetch_notification_status_for_service_for_today_and_7_previous_days_reads_today_from_redis(
+    notify_api, notify_db_session, mocker, by_template
+):
+    service_1 = create_service(service_name='service_1')
+    sms_template = create_template(service=service_1, template_type=SMS_TYPE)
+    create_ft_notification_status(date(2018, 10, 29), 'sms', service_1, template=sms_template, count=10)
+    # only counted from redis
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 11, 0, 0), status='delivered')
+
+    mocker.patch(
+        'app.dao.fact_notification_status_dao.get_todays_stats_for_service',
+        return_value=[
+            TodaysStat(str(sms_template.id), 'sms', KEY_TYPE_NORMAL, 'delivered', 2),
+            TodaysStat(str(sms_template.id), 'sms', KEY_TYPE_TEST, 'delivered', 5),
+            TodaysStat(str(sms_template.id), 'sms', KEY_TYPE_NORMAL, 'sending', 1),
+        ]
+    )
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True}):
+        results = sorted(
+            fetch_notification_status_for_service_for_today_and_7_previous_days(service_1.id, by_template=by_template),
+            key=lambda x: (x.notification_type, x.status)
+        )
+
+    assert [(row.notification_type, row.status, row.count) for row in results] == [
+        ('sms', 'delivered', 12),
+        ('sms', 'sending', 1),
+    ]
+    if by_template:
+        assert {row.template_id for row in results} == {sms_template.id}
+
+
+@freeze_time('2018-10-31T18:00:00')
+def test_fetch_notification_status_counts_for_day_counts_notifications_created_on_the_local_day(notify_db_session):
+    service_1 = create_service(service_name='service_1')
+    sms_template = create_template(service=service_1, template_type=SMS_TYPE)
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 11, 0, 0), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 12, 0, 0), status='delivered')
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 12, 0, 0), key_type=KEY_TYPE_TEST)
+    # before midnight in Toronto
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 3, 0, 0), status='delivered')
+
+    results = sorted(fetch_notification_status_counts_for_day(date(2018, 10, 31)), key=lambda row: row.key_type)
+
+    assert [(row.service_id, row.template_id, row.notification_type, row.key_type, row.status, row.count)
+            for row in results] == [
+        (service_1.id, sms_template.id, 'sms', KEY_TYPE_NORMAL, 'delivered', 2),
+        (service_1.id, sms_template.id, 'sms', KEY_TYPE_TEST, 'created', 1),
+    ]
+
+
 @freeze_time('2018-10-31T18:00:00')
 # This test assumes the local timezone is EST
 def test_fetch_notification_status_by_template_for_service_for_today_and_7_previous_days(notify_db_session):
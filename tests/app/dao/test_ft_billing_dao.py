@@ -17,6 +17,7 @@ from app.dao.fact_billing_dao import (
     fetch_monthly_billing_for_year,
     get_rate,
     get_rates_for_billing,
+    update_fact_billing_for_day,
     fetch_sms_free_allowance_remainder,
     fetch_sms_billing_for_all_services,
     fetch_letter_costs_for_all_services, fetch_letter_line_items_for_all_services)
@@ -291,6 +292,71 @@ def test_fetch_billing_data_for_day_bills_correctly_for_status(notify_db_session
     assert 3 == letter_results[0][7]
 
 
+def test_fetch_billing_data_for_day_only_uses_notification_history_for_services_without_notifications(
+    notify_db_session
+):
+    service = create_service()
+    purged_service = create_service(service_name='Purged service')
+    template = create_template(service=service)
+    purged_template = create_template(service=purged_service)
+    create_notification(template=template, status='delivered')
+    create_notification_history(template=template, status='delivered')
+    create_notification_history(template=template, status='delivered')
+    create_notification_history(template=purged_template, status='delivered')
+    create_notification_history(template=purged_template, status='delivered')
+
+    today = convert_utc_to_local_timezone(datetime.utcnow())
+    results = fetch_billing_data_for_day(today)
+
+    assert len(results) == 2
+    notifications_sent = {row.service_id: row.notifications_sent for row in results}
+    assert notifications_sent[service.id] == 1
+    assert notifications_sent[purged_service.id] == 2
+
+
+@freeze_time('2018-04-02 12:00')
+def test_update_fact_billing_for_day_upserts_every_row(notify_db_session):
+    create_rate(start_date=datetime(2016, 1, 1), value=0.0158, notification_type='sms')
+    service = create_service()
+    sms_template = create_template(service=service, template_type='sms')
+    email_template = create_template(service=service, template_type='email')
+    create_notification(template=sms_template, status='delivered', sent_by='mmg', billable_units=2)
+    create_notification(template=sms_template, status='delivered', sent_by='mmg', billable_units=1)
+    create_notification(template=email_template, status='delivered', sent_by='ses')
+    today = convert_utc_to_local_timezone(datetime.utcnow()).date()
+
+    assert update_fact_billing_for_day(fetch_billing_data_for_day(today), today) == 2
+    assert update_fact_billing_for_day(fetch_billing_data_for_day(today), today) == 2
+
+    records = FactBilling.query.order_by(FactBilling.notification_type).all()
+    assert [(r.notification_type, r.notifications_sent, r.rate) for r in records] == [
+        ('email', 1, 0),
+        ('sms', 2, Decimal('0.0158')),
+    ]
+    assert records[1].billable_units == 3
+
+
+def test_update_fact_billing_for_day_combines_rows_with_the_same_primary_key(notify_db_session):
+    create_letter_rate(sheet_count=1, rate=0.3)
+    create_letter_rate(sheet_count=2, rate=0.3)
+    service = create_service()
+    template = create_template(service=service, template_type='letter')
+    create_notification(template=template, status='delivered', billable_units=1, postage='second')
+    create_notification(template=template, status='delivered', billable_units=2, postage='second')
+    today = convert_utc_to_local_timezone(datetime.utcnow()).date()
+
+    assert update_fact_billing_for_day(fetch_billing_data_for_day(today), today) == 1
+
+    record = FactBilling.query.one()
+    assert record.notifications_sent == 2
+    assert record.billable_units == 3
+
+
+def test_update_fact_billing_for_day_does_nothing_without_data(notify_db_session):
+    assert update_fact_billing_for_day([], date(2018, 4, 2)) == 0
+    assert FactBilling.query.count() == 0
+
+
 def test_get_rates_for_billing(notify_db_session):
     create_rate(start_date=datetime.utcnow(), value=12, notification_type='email')
     create_rate(start_date=datetime.utcnow(), value=22, notification_type='sms')
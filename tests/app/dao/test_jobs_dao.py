@@ -212,6 +212,18 @@ def test_set_scheduled_jobs_to_pending_updates_rows(sample_template):
     assert jobs[1].job_status == 'pending'
 
 
+def test_set_scheduled_jobs_to_pending_only_claims_up_to_the_limit(sample_template):
+    one_minute_ago = datetime.utcnow() - timedelta(minutes=1)
+    one_hour_ago = datetime.utcnow() - timedelta(minutes=60)
+    job_new = create_job(sample_template, scheduled_for=one_minute_ago, job_status='scheduled')
+    job_old = create_job(sample_template, scheduled_for=one_hour_ago, job_status='scheduled')
+
+    jobs = dao_set_scheduled_jobs_to_pending(limit=1)
+
+    assert [job.id for job in jobs] == [job_old.id]
+    assert job_new.job_status == 'scheduled'
+
+
 def test_get_future_scheduled_job_gets_a_job_yet_to_send(sample_scheduled_job):
     result = dao_get_future_scheduled_job_by_id_and_service_id(sample_scheduled_job.id, sample_scheduled_job.service_id)
     assert result.id == sample_scheduled_job.id
@@ -15,7 +15,9 @@ from app.dao.provider_details_dao import (
     dao_update_provider_details,
     dao_get_provider_stats,
     dao_get_provider_versions,
-    dao_get_sms_provider_with_equal_priority
+    dao_get_sms_provider_with_equal_priority,
+    dao_get_active_provider_identifiers,
+    provider_cache,
 )
 from app.models import ProviderDetails, ProviderDetailsHistory, ProviderRates
 from tests.app.db import (
@@ -206,6 +208,48 @@ def test_can_get_email_providers(setup_provider_details):
     assert all('email' == notification_type for notification_type in types)
 
 
+def test_get_active_provider_identifiers_returns_active_providers_in_priority_order(restore_provider_details):
+    provider_cache.clear()
+    providers = get_provider_details_by_notification_type('sms')
+    providers[0].active = False
+    dao_update_provider_details(providers[0])
+
+    assert dao_get_active_provider_identifiers('sms') == [provider.identifier for provider in providers[1:]]
+
+
+def test_get_active_provider_identifiers_is_cached(restore_provider_details, mocker):
+    provider_cache.clear()
+    expected = dao_get_active_provider_identifiers('sms', True)
+
+    mock_get_providers = mocker.patch('app.dao.provider_details_dao.get_provider_details_by_notification_type')
+
+    assert dao_get_active_provider_identifiers('sms', True) == expected
+    assert not mock_get_providers.called
+
+
+def test_update_provider_details_invalidates_active_provider_identifiers(restore_provider_details):
+    provider_cache.clear()
+    first, second = get_provider_details_by_notification_type('sms')[:2]
+    assert dao_get_active_provider_identifiers('sms')[0] == first.identifier
+
+    first.priority, second.priority = second.priority, first.priority
+    dao_update_provider_details(first)
+    dao_update_provider_details(second)
+
+    assert dao_get_active_provider_identifiers('sms')[0] == second.identifier
+
+
+def test_toggle_sms_provider_invalidates_active_provider_identifiers(mocker, sample_user, setup_sms_providers):
+    provider_cache.clear()
+    [inactive_provider, old_provider, alternative_provider] = setup_sms_providers
+    mocker.patch('app.provider_details.switch_providers.get_user_by_id', return_value=sample_user)
+    assert dao_get_active_provider_identifiers('sms')[0] == old_provider.identifier
+
+    dao_toggle_sms_provider(old_provider.identifier)
+
+    assert dao_get_active_provider_identifiers('sms')[0] == alternative_provider.identifier
+
+
 def test_should_not_error_if_any_provider_in_code_not_in_database(restore_provider_details):
     ProviderDetails.query.filter_by(identifier='sns').delete()
 
@@ -1,5 +1,5 @@
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 # from unittest import mock
 
 import pytest
@@ -28,6 +28,7 @@ from app.dao.services_dao import (
     dao_fetch_stats_for_service,
     dao_fetch_todays_stats_for_service,
     fetch_todays_total_message_count,
+    fetch_todays_total_message_counts_by_service,
     dao_fetch_todays_stats_for_all_services,
     dao_suspend_service,
     dao_resume_service,
@@ -62,6 +63,7 @@ from app.models import (
     user_folder_permissions,
     Organisation
 )
+from app.notifications.todays_stats import TodaysStat
 from tests.app.db import (
     create_ft_billing,
     create_inbound_number,
@@ -75,10 +77,12 @@ from tests.app.db import (
     create_notification,
     create_api_key,
     create_invited_user,
+    create_job,
     create_letter_branding,
     create_notification_history,
     create_annual_billing,
 )
+from tests.conftest import set_config_values
 
 
 def test_should_have_decorated_services_dao_functions():
@@ -850,6 +854,25 @@ def test_dao_fetch_todays_total_message_count_returns_0_when_no_messages_for_tod
     assert fetch_todays_total_message_count(uuid.uuid4()) == 0
 
 
+def test_fetch_todays_total_message_counts_by_service_counts_jobs_in_full(notify_db_session):
+    service_1 = create_service(service_name='service 1')
+    service_2 = create_service(service_name='service 2')
+    template_1 = create_template(service=service_1)
+    template_2 = create_template(service=service_2)
+
+    job = create_job(template_1, notification_count=10, job_status='in progress', processing_started=datetime.utcnow())
+    create_notification(template=template_1, job=job)
+    create_notification(template=template_1)
+    create_notification(template=template_1, key_type=KEY_TYPE_TEST)
+    create_notification(template=template_2)
+    create_notification(template=template_2, created_at=datetime.utcnow() - timedelta(days=1))
+    create_job(
+        template_2, notification_count=10, job_status='sending limits exceeded', processing_started=datetime.utcnow()
+    )
+
+    assert fetch_todays_total_message_counts_by_service() == {service_1.id: 11, service_2.id: 1}
+
+
 def test_dao_fetch_todays_stats_for_all_services_includes_all_services(notify_db_session):
     # two services, each with an email and sms notification
     service1 = create_service(service_name='service 1', email_from='service.1')
@@ -870,6 +893,53 @@ def test_dao_fetch_todays_stats_for_all_services_includes_all_services(notify_db
     assert stats == sorted(stats, key=lambda x: x.service_id)
 
 
+def test_dao_fetch_todays_stats_for_service_reads_from_redis_when_enabled(notify_api, sample_service, mocker):
+    mocker.patch('app.dao.services_dao.get_todays_stats_for_service', return_value=[
+        TodaysStat('template-1', 'sms', 'normal', 'delivered', 2),
+        TodaysStat('template-2', 'sms', 'team', 'delivered', 1),
+        TodaysStat('template-2', 'sms', 'test', 'delivered', 5),
+    ])
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True}):
+        stats = dao_fetch_todays_stats_for_service(sample_service.id)
+
+    assert [(row.notification_type, row.status, row.count) for row in stats] == [('sms', 'delivered', 3)]
+
+
+def test_dao_fetch_todays_stats_for_all_services_reads_from_redis_when_enabled(notify_api, notify_db_session, mocker):
+    service_1 = create_service(service_name='service 1', email_from='service.1')
+    service_2 = create_service(service_name='service 2', email_from='service.2')
+    mocker.patch('app.dao.services_dao.get_todays_stats_for_services', return_value={
+        service_1.id: [
+            TodaysStat('template-1', 'sms', 'normal', 'delivered', 2),
+            TodaysStat('template-1', 'sms', 'test', 'delivered', 1),
+        ],
+        service_2.id: [],
+    })
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True}):
+        stats = dao_fetch_todays_stats_for_all_services(include_from_test_key=False)
+
+    assert [(row.service_id, row.name, row.notification_type, row.status, row.count) for row in stats] == sorted([
+        (service_1.id, 'service 1', 'sms', 'delivered', 2),
+        (service_2.id, 'service 2', None, None, None),
+    ], key=lambda row: row[0])
+
+
+def test_dao_fetch_todays_stats_for_all_services_reads_from_the_database_if_a_service_is_missing_from_redis(
+    notify_api, sample_template, mocker
+):
+    create_notification(template=sample_template, status='delivered')
+    mocker.patch('app.dao.services_dao.get_todays_stats_for_services', return_value={sample_template.service_id: None})
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True}):
+        stats = dao_fetch_todays_stats_for_all_services()
+
+    assert [(row.service_id, row.notification_type, row.status, row.count) for row in stats] == [
+        (sample_template.service_id, 'sms', 'delivered', 1)
+    ]
+
+
 # This test assumes the local timezone is EST
 def test_dao_fetch_todays_stats_for_all_services_only_includes_today(notify_db_session):
     template = create_template(service=create_service())
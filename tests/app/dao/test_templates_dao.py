@@ -11,7 +11,9 @@ from app.dao.templates_dao import (
     dao_get_all_templates_for_service,
     dao_update_template,
     dao_get_template_versions,
-    dao_redact_template, dao_update_template_reply_to
+    dao_redact_template, dao_update_template_reply_to,
+    dao_get_template_by_id,
+    template_history_cache,
 )
 from app.models import (
     Template,
@@ -21,6 +23,7 @@ from app.models import (
 )
 
 from tests.app.db import create_template, create_letter_contact
+from tests.conftest import set_config
 
 
 @pytest.mark.parametrize('template_type, subject', [
@@ -376,6 +379,47 @@ def test_get_template_by_id_and_service_returns_none_if_no_template(sample_servi
     assert 'No row was found for one' in str(e.value)
 
 
+@pytest.fixture
+def cached_template_history(notify_api):
+    template_history_cache.clear()
+    with set_config(notify_api, 'TEMPLATE_CACHE_ENABLED', True):
+        yield template_history_cache
+    template_history_cache.clear()
+
+
+def test_get_template_version_is_cached(sample_service, cached_template_history, mocker):
+    sample_template = create_template(template_name='Test Template', service=sample_service)
+    dao_get_template_by_id(sample_template.id, 1)
+
+    mock_history = mocker.patch('app.dao.templates_dao.TemplateHistory')
+    template = dao_get_template_by_id(sample_template.id, 1)
+
+    assert not mock_history.query.filter_by.called
+    assert template.id == sample_template.id
+    assert template.version == 1
+    assert template.content == sample_template.content
+    assert cached_template_history.get('{}-1'.format(sample_template.id)) is not None
+
+
+def test_get_cached_template_version_checks_service_id(sample_service, cached_template_history, fake_uuid):
+    sample_template = create_template(template_name='Test Template', service=sample_service)
+    dao_get_template_by_id(sample_template.id, 1)
+
+    with pytest.raises(NoResultFound):
+        dao_get_template_by_id_and_service_id(sample_template.id, fake_uuid, 1)
+
+    template = dao_get_template_by_id_and_service_id(sample_template.id, sample_service.id, 1)
+    assert template.id == sample_template.id
+
+
+def test_get_cached_template_version_returns_none_for_hidden_templates(sample_service, cached_template_history):
+    sample_template = create_template(template_name='Test Template', hidden=True, service=sample_service)
+    dao_get_template_by_id(sample_template.id, 1)
+
+    with pytest.raises(NoResultFound):
+        dao_get_template_by_id_and_service_id(sample_template.id, sample_service.id, 1)
+
+
 def test_create_template_creates_a_history_record_with_current_data(sample_service, sample_user):
     assert Template.query.count() == 0
     assert TemplateHistory.query.count() == 0
@@ -7,6 +7,7 @@ from sqlalchemy.orm.exc import NoResultFound
 import pytest
 
 from app import db
+from app.encryption import hashpw
 from app.dao.service_user_dao import dao_get_service_user, dao_update_service_user
 from app.dao.users_dao import (
     save_model_user,
@@ -20,6 +21,8 @@ from app.dao.users_dao import (
     update_user_password,
     count_user_verify_codes,
     create_secret_code,
+    create_user_code,
+    get_user_code,
     user_can_be_archived,
     dao_archive_user,
     verify_within_time
@@ -131,6 +134,36 @@ def test_will_find_verify_codes_sent_within_seconds(notify_api, notify_db, notif
     assert count == 2
 
 
+def test_create_user_code_saves_a_digest_of_the_code(sample_user):
+    verify_code = create_user_code(sample_user, '12345', 'sms')
+
+    assert verify_code._code is None
+    assert verify_code.code_digest == VerifyCode.digest('12345')
+    assert verify_code.check_code('12345')
+    assert not verify_code.check_code('54321')
+
+
+def test_get_user_code_finds_code_by_its_digest(sample_user, mocker):
+    check_code = mocker.patch.object(VerifyCode, 'check_code')
+    create_user_code(sample_user, '11111', 'sms')
+    verify_code = create_user_code(sample_user, '12345', 'sms')
+    create_user_code(sample_user, '12345', 'email')
+
+    assert get_user_code(sample_user, '12345', 'sms') == verify_code
+    assert get_user_code(sample_user, '54321', 'sms') is None
+    assert check_code.call_count == 0
+
+
+def test_get_user_code_checks_codes_saved_without_a_digest(sample_user):
+    make_verify_code(sample_user, code=hashpw('12345'))
+    create_user_code(sample_user, '11111', 'sms')
+
+    verify_code = get_user_code(sample_user, '12345', 'sms')
+
+    assert verify_code.code_digest is None
+    assert get_user_code(sample_user, '54321', 'sms') is None
+
+
 def make_verify_code(user, age=timedelta(hours=0), expiry_age=timedelta(0), code="12335", code_used=False):
     verify_code = VerifyCode(
         code_type='sms',
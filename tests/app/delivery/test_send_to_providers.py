@@ -14,6 +14,7 @@ from app import aws_sns_client, mmg_client
 from app.dao import (provider_details_dao, notifications_dao)
 from app.dao.provider_details_dao import dao_switch_sms_provider_to_provider_with_identifier
 from app.delivery import send_to_providers
+from app.delivery.snapshots import DeliverySnapshot, create_delivery_snapshot
 from app.exceptions import NotificationTechnicalFailureException, MalwarePendingException
 
 from app.models import (
@@ -953,3 +954,81 @@ def test_notification_passes_if_message_contains_phone_number(sample_email_templ
     mock_email_client.send_email.assert_called()
 
     assert Notification.query.get(db_notification.id).status == 'sending'
+
+
+def test_should_send_sms_from_a_delivery_snapshot_and_persist(
+    sample_sms_template_with_html,
+    mock_sms_client,
+    mocker
+):
+    db_notification = create_notification(template=sample_sms_template_with_html,
+                                          to_field="+16502532222", personalisation={"name": "Jo"},
+                                          status='created',
+                                          reply_to_text=sample_sms_template_with_html.service.get_default_sms_sender())
+    snapshot = DeliverySnapshot(create_delivery_snapshot(db_notification, db_notification.service))
+    get_notification_by_id = mocker.patch('app.dao.notifications_dao.get_notification_by_id')
+
+    send_to_providers.send_sms_to_provider(snapshot)
+
+    mock_sms_client.send_sms.assert_called_once_with(
+        to=validate_and_format_phone_number("+16502532222"),
+        content="Sample service: Hello Jo\nHere is <em>some HTML</em> & entities",
+        reference=str(db_notification.id),
+        sender=current_app.config['FROM_NUMBER']
+    )
+    assert get_notification_by_id.call_count == 0
+
+    notification = Notification.query.filter_by(id=db_notification.id).one()
+    assert notification.status == 'sent'
+    assert notification.sent_by == mock_sms_client.get_name()
+    assert notification.billable_units == 1
+
+
+def test_should_send_email_from_a_delivery_snapshot_with_branding(sample_email_template, mock_email_client):
+    sample_email_template.service.email_branding = EmailBranding(
+        brand_type=BRANDING_ORG_BANNER,
+        colour='#000000',
+        logo='justice-league.png',
+        name='Justice League',
+        text='League'
+    )
+    db_notification = create_notification(template=sample_email_template, to_field="jo.smith@example.com")
+    snapshot = DeliverySnapshot(create_delivery_snapshot(db_notification, db_notification.service))
+
+    send_to_providers.send_email_to_provider(snapshot)
+
+    html_body = mock_email_client.send_email.call_args[1]['html_body']
+    assert 'justice-league.png' in html_body
+    notification = Notification.query.filter_by(id=db_notification.id).one()
+    assert notification.status == 'sending'
+    assert notification.reference == mock_email_client.send_email.return_value
+
+
+def test_should_not_save_a_delivery_snapshot_over_a_notification_that_has_moved_on(sample_template, mock_sms_client):
+    db_notification = create_notification(template=sample_template, status='created')
+    snapshot = DeliverySnapshot(create_delivery_snapshot(db_notification, db_notification.service))
+    db_notification.status = 'technical-failure'
+    notifications_dao.dao_update_notification(db_notification)
+
+    send_to_providers.send_sms_to_provider(snapshot)
+
+    assert Notification.query.get(db_notification.id).status == 'technical-failure'
+
+
+def test_should_buffer_the_sent_status_when_the_sent_status_buffer_is_enabled(
+    notify_api,
+    sample_sms_template_with_html,
+    mock_sms_client,
+    mocker
+):
+    db_notification = create_notification(template=sample_sms_template_with_html, status='created')
+    add = mocker.patch('app.delivery.send_to_providers.sent_status_buffer.add')
+    dao_update_notification = mocker.patch('app.delivery.send_to_providers.dao_update_notification')
+
+    with set_config_values(notify_api, {'SENT_STATUS_BUFFER_ENABLED': True}):
+        send_to_providers.send_sms_to_provider(db_notification)
+
+    add.assert_called_once_with(db_notification)
+    assert db_notification.status == 'sent'
+    assert db_notification.sent_by == mock_sms_client.get_name()
+    dao_update_notification.assert_not_called()
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+
+from app.delivery.sent_status_buffer import SentStatus, SentStatusBuffer
+from app.models import Notification
+from tests.app.db import create_notification
+from tests.conftest import set_config_values
+
+
+@pytest.fixture
+def mock_timer(mocker):
+    return mocker.patch('app.delivery.sent_status_buffer.threading.Timer')
+
+
+def _sent(notification, sent_by='sns'):
+    notification.status = 'sent'
+    notification.sent_at = datetime(2020, 1, 1, 12, 0, 0)
+    notification.sent_by = sent_by
+    notification.reference = 'ref-{}'.format(notification.id)
+    return notification
+
+
+def test_add_waits_for_the_timer_until_the_buffer_is_full(notify_api, sample_template, mock_timer, mocker):
+    dao_update_sent_notifications = mocker.patch('app.delivery.sent_status_buffer.dao_update_sent_notifications')
+    buffer = SentStatusBuffer()
+
+    with set_config_values(notify_api, {'SENT_STATUS_BUFFER_SIZE': 2, 'SENT_STATUS_BUFFER_INTERVAL_MS': 250}):
+        buffer.add(_sent(create_notification(template=sample_template)))
+
+    dao_update_sent_notifications.assert_not_called()
+    mock_timer.assert_called_once_with(0.25, buffer._flush_in_app_context)
+    mock_timer.return_value.start.assert_called_once_with()
+
+
+def test_add_flushes_when_the_buffer_is_full(notify_api, sample_template, mock_timer, mocker):
+    dao_update_sent_notifications = mocker.patch('app.delivery.sent_status_buffer.dao_update_sent_notifications')
+    first = create_notification(template=sample_template)
+    second = create_notification(template=sample_template)
+    buffer = SentStatusBuffer()
+
+    with set_config_values(notify_api, {'SENT_STATUS_BUFFER_SIZE': 2, 'SENT_STATUS_BUFFER_INTERVAL_MS': 250}):
+        buffer.add(_sent(first))
+        buffer.add(_sent(second))
+
+    dao_update_sent_notifications.assert_called_once_with([
+        SentStatus(first.id, first.sent_at, 'sns', 'sent', first.reference, first.billable_units),
+        SentStatus(second.id, second.sent_at, 'sns', 'sent', second.reference, second.billable_units),
+    ])
+    mock_timer.return_value.cancel.assert_called_once_with()
+    assert buffer._statuses == []
+
+
+def test_flush_writes_the_sent_notifications(notify_api, sample_template, mock_timer):
+    notification = create_notification(template=sample_template)
+    buffer = SentStatusBuffer()
+
+    with set_config_values(notify_api, {'SENT_STATUS_BUFFER_SIZE': 10}):
+        buffer.add(_sent(notification, sent_by='mmg'))
+    assert Notification.query.get(notification.id).status == 'created'
+
+    buffer.flush()
+
+    updated = Notification.query.get(notification.id)
+    assert (updated.status, updated.sent_by) == ('sent', 'mmg')
+    assert updated.sent_at == datetime(2020, 1, 1, 12, 0, 0)
+
+
+def test_flush_keeps_the_statuses_for_the_next_flush_if_they_cant_be_written(sample_template, mock_timer, mocker):
+    mocker.patch('app.delivery.sent_status_buffer.dao_update_sent_notifications', side_effect=Exception('db down'))
+    buffer = SentStatusBuffer()
+
+    buffer.add(_sent(create_notification(template=sample_template)))
+    buffer.flush()
+
+    assert len(buffer._statuses) == 1
+    # one timer for the add, and another to try again after the failed flush
+    assert mock_timer.return_value.start.call_count == 2
+    assert buffer._timer is not None
+
+
+def test_flush_keeps_only_the_newest_statuses_if_too_many_cant_be_written(
+    notify_api, sample_template, mock_timer, mocker
+):
+    mocker.patch('app.delivery.sent_status_buffer.dao_update_sent_notifications', side_effect=Exception('db down'))
+    notifications = [create_notification(template=sample_template) for _ in range(3)]
+    buffer = SentStatusBuffer()
+
+    with set_config_values(notify_api, {'SENT_STATUS_BUFFER_SIZE': 10, 'SENT_STATUS_BUFFER_MAX_SIZE': 2}):
+        for notification in notifications:
+            buffer.add(_sent(notification))
+        buffer.flush()
+
+    assert [status.id for status in buffer._statuses] == [notification.id for notification in notifications[1:]]
+
+
+def test_flush_does_nothing_when_the_buffer_is_empty(notify_api, mocker):
+    dao_update_sent_notifications = mocker.patch('app.delivery.sent_status_buffer.dao_update_sent_notifications')
+
+    SentStatusBuffer().flush()
+
+    dao_update_sent_notifications.assert_not_called()
@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+from freezegun import freeze_time
+
+from app.notifications.delivery_latency import (
+    get_delivery_latency_histogram,
+    is_delivery_slow,
+    latency_percentile,
+    record_delivery_latencies,
+    slow_delivery_ratio,
+)
+from tests.conftest import set_config_values
+
+
+def _notification(latency_in_seconds, status='delivered', key_type='normal', sent_by='mmg'):
+    sent_at = datetime(2018, 1, 10, 15)
+    return Mock(
+        status=status,
+        key_type=key_type,
+        sent_by=sent_by,
+        sent_at=sent_at,
+        updated_at=sent_at + timedelta(seconds=latency_in_seconds)
+    )
+
+
+@freeze_time('2018-01-10 15:10:30')
+def test_record_delivery_latencies_counts_deliveries_in_the_current_minute(notify_api, mocker):
+    client = mocker.patch('app.notifications.delivery_latency.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    with set_config_values(notify_api, {'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': True, 'REDIS_ENABLED': True}):
+        record_delivery_latencies([
+            _notification(3),
+            _notification(4),
+            _notification(240),
+            _notification(10000),
+            _notification(3, status='permanent-failure'),
+            _notification(3, key_type='test'),
+            _notification(3, sent_by=None),
+        ])
+
+    cache_key = 'delivery-latency-mmg-2018-01-10T15:10'
+    assert pipeline.hincrby.call_args_list == [
+        mocker.call(cache_key, '5', 2),
+        mocker.call(cache_key, '300', 1),
+        mocker.call(cache_key, '+Inf', 1),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+def test_record_delivery_latencies_does_nothing_if_histograms_are_disabled(notify_api, mocker):
+    client = mocker.patch('app.notifications.delivery_latency.redis_store.redis_store')
+
+    with set_config_values(notify_api, {'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': False, 'REDIS_ENABLED': True}):
+        record_delivery_latencies([_notification(3)])
+
+    assert not client.pipeline.called
+
+
+@freeze_time('2018-01-10 15:10:30')
+def test_get_delivery_latency_histogram_adds_up_the_last_minutes(notify_api, mocker):
+    client = mocker.patch('app.notifications.delivery_latency.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+    pipeline.execute.return_value = [{b'5': b'2', b'300': b'1'}, {b'5': b'1'}]
+
+    assert get_delivery_latency_histogram('mmg', 2) == {'5': 3, '300': 1}
+    assert pipeline.hgetall.call_args_list == [
+        mocker.call('delivery-latency-mmg-2018-01-10T15:10'),
+        mocker.call('delivery-latency-mmg-2018-01-10T15:09'),
+    ]
+
+
+@pytest.mark.parametrize('percentile, expected_bound', [
+    (50, 5),
+    (90, 60),
+    (95, 300),
+    (99, float('inf')),
+])
+def test_latency_percentile_returns_the_upper_bound_of_the_percentiles_bucket(percentile, expected_bound):
+    histogram = Counter({'5': 50, '60': 40, '300': 8, '+Inf': 2})
+
+    assert latency_percentile(histogram, percentile) == expected_bound
+
+
+def test_latency_percentile_returns_none_without_deliveries():
+    assert latency_percentile(Counter(), 50) is None
+
+
+def test_slow_delivery_ratio_counts_deliveries_that_took_at_least_the_delivery_time():
+    histogram = Counter({'5': 6, '240': 1, '300': 2, '+Inf': 1})
+
+    assert slow_delivery_ratio(histogram, timedelta(minutes=4)) == 0.3
+
+
+@pytest.mark.parametrize('histogram, expected_result', [
+    (Counter({'5': 7, '300': 3}), True),
+    (Counter({'5': 8, '300': 2}), False),
+    (Counter(), False),
+])
+def test_is_delivery_slow(notify_api, mocker, histogram, expected_result):
+    get_histogram = mocker.patch(
+        'app.notifications.delivery_latency.get_delivery_latency_histogram', return_value=histogram
+    )
+
+    assert is_delivery_slow('mmg', 0.3, timedelta(minutes=4), 10) is expected_result
+    get_histogram.assert_called_once_with('mmg', 10)
+
+
+@pytest.mark.parametrize('histogram, undelivered, slow_undelivered, expected_result', [
+    (Counter(), 10, 3, True),
+    (Counter(), 10, 2, False),
+    (Counter({'5': 8, '300': 1}), 1, 1, False),
+    (Counter({'5': 7, '300': 1}), 2, 2, True),
+])
+def test_is_delivery_slow_counts_notifications_still_waiting_for_a_receipt(
+    notify_api, mocker, histogram, undelivered, slow_undelivered, expected_result
+):
+    mocker.patch('app.notifications.delivery_latency.get_delivery_latency_histogram', return_value=histogram)
+
+    assert is_delivery_slow(
+        'mmg', 0.3, timedelta(minutes=4), 10, undelivered=undelivered, slow_undelivered=slow_undelivered
+    ) is expected_result
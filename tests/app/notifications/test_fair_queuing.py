@@ -0,0 +1,75 @@
+import pytest
+from freezegun import freeze_time
+
+from app.notifications.fair_queuing import send_queue, send_queues
+from tests.conftest import set_config_values
+
+
+@pytest.fixture
+def fair_queuing(notify_api):
+    with set_config_values(notify_api, {
+        'FAIR_QUEUING_ENABLED': True,
+        'REDIS_ENABLED': True,
+        'FAIR_QUEUING_MAX_LAG_SECONDS': 60,
+    }):
+        yield
+
+
+def test_send_queues_uses_the_send_queue_when_fair_queuing_is_disabled(notify_api, sample_service, mocker):
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+
+    assert send_queues('sms', sample_service, 2) == ['send-sms-tasks', 'send-sms-tasks']
+    client.register_script.assert_not_called()
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_send_queues_advances_the_virtual_clock_at_the_services_rate_limit(fair_queuing, sample_service, mocker):
+    sample_service.rate_limit = 3000
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+    script = client.register_script.return_value
+    script.return_value = b'0'
+
+    assert send_queues('email', sample_service, 2) == ['send-email-tasks', 'send-email-tasks']
+    script.assert_called_once_with(
+        keys=['service-{}-email-virtual-clock'.format(sample_service.id)],
+        args=[2, '50.0', '1451649600.0']
+    )
+
+
+@pytest.mark.parametrize('lag, expected_queues', [
+    (b'59.9', ['send-sms-tasks'] * 6 + ['bulk-sms-tasks'] * 4),
+    (b'60.5', ['bulk-sms-tasks'] * 10),
+])
+def test_send_queues_sends_notifications_beyond_the_services_share_to_the_bulk_queue(
+    fair_queuing, sample_service, mocker, lag, expected_queues
+):
+    sample_service.rate_limit = 3000
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+    client.register_script.return_value.return_value = lag
+
+    assert send_queues('sms', sample_service, 10) == expected_queues
+
+
+def test_send_queues_uses_the_send_queue_if_redis_fails(fair_queuing, sample_service, mocker):
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+    client.register_script.return_value.side_effect = Exception('Redis is down')
+
+    assert send_queues('sms', sample_service) == ['send-sms-tasks']
+
+
+def test_send_queue_uses_the_notifications_service(fair_queuing, sample_notification_with_job, mocker):
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+    client.register_script.return_value.return_value = b'120'
+
+    assert send_queue(sample_notification_with_job) == 'bulk-sms-tasks'
+    assert client.register_script.return_value.call_args[1]['keys'] == [
+        'service-{}-sms-virtual-clock'.format(sample_notification_with_job.service_id)
+    ]
+
+
+def test_send_queue_uses_the_send_queue_for_notifications_not_from_a_job(fair_queuing, sample_notification, mocker):
+    client = mocker.patch('app.notifications.fair_queuing.redis_store.redis_store')
+    client.register_script.return_value.return_value = b'120'
+
+    assert send_queue(sample_notification) == 'send-sms-tasks'
+    client.register_script.assert_not_called()
@@ -6,6 +6,7 @@ from boto3.exceptions import Boto3Error
 from sqlalchemy.exc import SQLAlchemyError
 from freezegun import freeze_time
 from collections import namedtuple
+from unittest.mock import call
 
 from app.models import (
     Notification,
@@ -16,16 +17,21 @@ from app.models import (
 )
 from app.notifications.process_notifications import (
     create_content_for_notification,
+    increment_daily_limit_counts,
     persist_notification,
+    persist_notifications_bulk,
     persist_scheduled_notification,
     send_notification_to_queue,
+    send_notifications_to_queue,
     simulated_recipient
 )
 from notifications_utils.recipients import validate_and_format_phone_number, validate_and_format_email_address
+from app.delivery.snapshots import DeliverySnapshot
 from app.v2.errors import BadRequestError
 from tests.app.conftest import sample_api_key as create_api_key
 
-from tests.app.db import create_service, create_template
+from tests.app.db import create_notification, create_service, create_template
+from tests.conftest import set_config
 
 
 def test_create_content_for_notification_passes(sample_email_template):
@@ -160,6 +166,93 @@ def test_persist_notification_does_not_increment_cache_if_test_key(
     assert not template_usage_cache.called
 
 
+def _bulk_notification_kwargs(template, api_key, recipient, **kwargs):
+    return dict(
+        template_id=template.id,
+        template_version=template.version,
+        recipient=recipient,
+        service=template.service,
+        personalisation={},
+        notification_type=template.template_type,
+        api_key_id=api_key.id,
+        key_type=api_key.key_type,
+        **kwargs
+    )
+
+
+def test_persist_notifications_bulk_creates_all_notifications(sample_template, sample_api_key, sample_job, mocker):
+    increment_counts = mocker.patch('app.notifications.process_notifications.increment_daily_limit_counts')
+    notification_ids = [uuid.uuid4(), uuid.uuid4()]
+
+    created = persist_notifications_bulk([
+        _bulk_notification_kwargs(sample_template, sample_api_key, '+16502532222',
+                                  notification_id=notification_ids[0], job_id=sample_job.id, job_row_number=0),
+        _bulk_notification_kwargs(sample_template, sample_api_key, '+16502532223',
+                                  notification_id=notification_ids[1], job_id=sample_job.id, job_row_number=1),
+    ])
+
+    assert [n.id for n in created] == notification_ids
+    persisted = Notification.query.order_by(Notification.job_row_number).all()
+    assert [n.id for n in persisted] == notification_ids
+    assert [n.normalised_to for n in persisted] == ['+16502532222', '+16502532223']
+    assert all(n.phone_prefix == '1' and n.rate_multiplier == 1 for n in persisted)
+    increment_counts.assert_called_once_with({sample_template.service_id: 2})
+
+
+def test_persist_notifications_bulk_skips_notifications_that_already_exist(
+    sample_template, sample_api_key, mocker
+):
+    increment_counts = mocker.patch('app.notifications.process_notifications.increment_daily_limit_counts')
+    existing = persist_notification(**_bulk_notification_kwargs(sample_template, sample_api_key, '+16502532222'))
+
+    created = persist_notifications_bulk([
+        _bulk_notification_kwargs(sample_template, sample_api_key, '+16502532222', notification_id=existing.id),
+        _bulk_notification_kwargs(sample_template, sample_api_key, '+16502532223'),
+    ])
+
+    assert [n.to for n in created] == ['+16502532223']
+    assert Notification.query.count() == 2
+    increment_counts.assert_called_once_with({sample_template.service_id: 1})
+
+
+def test_persist_notifications_bulk_does_not_count_test_key_notifications(
+    notify_db, notify_db_session, sample_template, mocker
+):
+    api_key = create_api_key(notify_db=notify_db, notify_db_session=notify_db_session, service=sample_template.service,
+                             key_type='test')
+    increment_counts = mocker.patch('app.notifications.process_notifications.increment_daily_limit_counts')
+
+    persist_notifications_bulk([_bulk_notification_kwargs(sample_template, api_key, '+16502532222')])
+
+    assert Notification.query.count() == 1
+    increment_counts.assert_called_once_with({})
+
+
+def test_increment_daily_limit_counts_runs_one_script_call_per_service_in_a_pipeline(notify_api, mocker):
+    mocker.patch('app.notifications.process_notifications.redis_store.active', True)
+    client = mocker.patch('app.notifications.process_notifications.redis_store.redis_store')
+    script = client.register_script.return_value
+    pipeline = client.pipeline.return_value
+
+    with freeze_time("2016-01-01 11:09:00"):
+        increment_daily_limit_counts({'service-1': 3, 'service-2': 1})
+
+    assert script.call_args_list == [
+        mocker.call(keys=['service-1-2016-01-01-count'], args=[3], client=pipeline),
+        mocker.call(keys=['service-2-2016-01-01-count'], args=[1], client=pipeline),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+def test_increment_daily_limit_counts_does_nothing_if_redis_is_not_active(notify_api, mocker):
+    mocker.patch('app.notifications.process_notifications.redis_store.active', False)
+    client = mocker.patch('app.notifications.process_notifications.redis_store.redis_store')
+
+    increment_daily_limit_counts({'service-1': 3})
+
+    assert not client.pipeline.called
+
+
 @freeze_time("2016-01-01 11:09:00.061258")
 def test_persist_notification_with_optionals(sample_job, sample_api_key, mocker):
     assert Notification.query.count() == 0
@@ -241,6 +334,27 @@ def test_persist_notification_increments_cache_if_key_exists(sample_template, sa
     mock_incr.assert_called_once_with(str(sample_template.service_id) + "-2016-01-01-count", )
 
 
+def test_persist_notification_does_not_increment_cache_with_atomic_sending_limits(
+    notify_api, sample_template, sample_api_key, mocker
+):
+    mock_incr = mocker.patch('app.notifications.process_notifications.redis_store.incr')
+    mocker.patch('app.notifications.process_notifications.redis_store.get', return_value=1)
+
+    with set_config(notify_api, 'ATOMIC_SENDING_LIMITS_ENABLED', True):
+        persist_notification(
+            template_id=sample_template.id,
+            template_version=sample_template.version,
+            recipient='+16502532222',
+            service=sample_template.service,
+            personalisation={},
+            notification_type='sms',
+            api_key_id=sample_api_key.id,
+            key_type=sample_api_key.key_type,
+            reference="ref2")
+
+    mock_incr.assert_not_called()
+
+
 @pytest.mark.parametrize((
     'research_mode, requested_queue, notification_type, key_type, expected_queue, expected_task'
 ), [
@@ -283,6 +397,17 @@ def test_send_notification_to_queue(
     mocked.assert_called_once_with([str(notification.id)], queue=expected_queue)
 
 
+def test_send_notification_to_queue_includes_a_delivery_snapshot_when_enabled(notify_api, sample_notification, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+
+    with set_config(notify_api, 'DELIVERY_SNAPSHOTS_ENABLED', True):
+        send_notification_to_queue(sample_notification, False)
+
+    (notification_id, snapshot), = mocked.call_args[0]
+    assert notification_id == str(sample_notification.id)
+    assert DeliverySnapshot(snapshot).to == sample_notification.to
+
+
 def test_send_notification_to_queue_throws_exception_deletes_notification(sample_notification, mocker):
     mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async', side_effect=Boto3Error("EXPECTED"))
     with pytest.raises(Boto3Error):
@@ -293,6 +418,24 @@ def test_send_notification_to_queue_throws_exception_deletes_notification(sample
     assert NotificationHistory.query.count() == 0
 
 
+def test_send_notifications_to_queue_queues_every_notification(sample_template, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    notifications = [create_notification(template=sample_template) for _ in range(2)]
+
+    assert send_notifications_to_queue(notifications, False) == [n.id for n in notifications]
+
+    assert mocked.call_args_list == [call([str(n.id)], queue='send-sms-tasks') for n in notifications]
+
+
+def test_send_notifications_to_queue_deletes_the_notifications_it_could_not_queue(sample_template, mocker):
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async', side_effect=[None, Boto3Error("EXPECTED")])
+    notifications = [create_notification(template=sample_template) for _ in range(3)]
+
+    assert send_notifications_to_queue(notifications, False) == [notifications[0].id]
+
+    assert Notification.query.one().id == notifications[0].id
+
+
 @pytest.mark.parametrize("to_address, notification_type, expected", [
     ("+16132532222", "sms", True),
     ("+16132532223", "sms", True),
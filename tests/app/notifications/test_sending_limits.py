@@ -0,0 +1,79 @@
+import pytest
+from freezegun import freeze_time
+
+from app.notifications.sending_limits import (
+    consume_sending_allowance,
+    set_daily_limit_counts,
+    OVER_DAILY_LIMIT,
+    OVER_RATE_LIMIT,
+    WITHIN_LIMITS,
+)
+
+
+@freeze_time("2016-01-01 12:00:00")
+@pytest.mark.parametrize('check_rate_limit, check_daily_limit, expected_limits', [
+    (True, True, [10, 3000]),
+    (False, True, [10, -1]),
+    (True, False, [-1, 3000]),
+])
+def test_consume_sending_allowance_checks_both_limits_in_one_script_call(
+    notify_api, sample_service, mocker, check_rate_limit, check_daily_limit, expected_limits
+):
+    sample_service.message_limit = 10
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    script = client.register_script.return_value
+    script.return_value = [0, 4]
+
+    result = consume_sending_allowance(
+        sample_service, 'normal', notification_count=2,
+        check_rate_limit=check_rate_limit, check_daily_limit=check_daily_limit
+    )
+
+    assert result == (WITHIN_LIMITS, 4)
+    daily_limit, rate_limit = expected_limits
+    script.assert_called_once_with(
+        keys=['{}-2016-01-01-count'.format(sample_service.id), '{}-normal-bucket'.format(sample_service.id)],
+        args=[2, daily_limit, notify_api.config['DAILY_LIMIT_COUNT_TTL'], rate_limit, 60, '1451649600.0']
+    )
+
+
+def test_consume_sending_allowance_returns_the_limit_that_was_exceeded(notify_api, sample_service, mocker):
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    client.register_script.return_value.return_value = [2, 1000]
+
+    assert consume_sending_allowance(sample_service, 'normal') == (OVER_DAILY_LIMIT, 1000)
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_consume_sending_allowance_charges_the_rate_limit_for_every_notification(notify_api, sample_service, mocker):
+    sample_service.rate_limit = 100
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    script = client.register_script.return_value
+    script.return_value = [1, 20]
+
+    assert consume_sending_allowance(sample_service, 'normal', notification_count=150) == (OVER_RATE_LIMIT, 20)
+    assert script.call_args[1]['args'][0] == 150
+    assert script.call_args[1]['args'][3] == 100
+    assert 'tokens < notification_count' in client.register_script.call_args[0][0]
+
+
+def test_consume_sending_allowance_lets_the_service_through_if_redis_fails(notify_api, sample_service, mocker):
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    client.register_script.return_value.side_effect = Exception('Redis is down')
+
+    assert consume_sending_allowance(sample_service, 'normal') == (WITHIN_LIMITS, None)
+
+
+@freeze_time("2016-01-01 12:00:00")
+def test_set_daily_limit_counts_sets_every_count_in_one_pipeline(notify_api, mocker):
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    set_daily_limit_counts({'service-1': 3, 'service-2': 1})
+
+    ttl = notify_api.config['DAILY_LIMIT_COUNT_TTL']
+    assert pipeline.set.call_args_list == [
+        mocker.call('service-1-2016-01-01-count', 3, ex=ttl),
+        mocker.call('service-2-2016-01-01-count', 1, ex=ttl),
+    ]
+    pipeline.execute.assert_called_once_with()
@@ -0,0 +1,152 @@
+from datetime import date, datetime
+from unittest.mock import Mock
+
+from freezegun import freeze_time
+
+from app.notifications.todays_stats import (
+    count_by,
+    get_todays_stats_for_services,
+    record_notifications_created,
+    record_status_changes,
+    set_todays_stats,
+    TodaysStat,
+)
+from tests.conftest import set_config_values
+
+
+def _notification(status, created_at=datetime(2018, 1, 10, 15)):
+    return Mock(
+        service_id='service-1',
+        template_id='template-1',
+        notification_type='sms',
+        key_type='normal',
+        status=status,
+        created_at=created_at
+    )
+
+
+def _enable_todays_stats(notify_api):
+    return set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': True, 'REDIS_ENABLED': True})
+
+
+def test_record_notifications_created_increments_counts_for_the_local_day(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    with _enable_todays_stats(notify_api):
+        record_notifications_created([
+            _notification('created'),
+            _notification('created'),
+            # 1am UTC is still the previous day in Toronto
+            _notification('created', created_at=datetime(2018, 1, 11, 1)),
+        ])
+
+    assert pipeline.hincrby.call_args_list == [
+        mocker.call('service-service-1-notification-statuses-2018-01-10', 'template-1:sms:normal:created', 3),
+    ]
+    pipeline.execute.assert_called_once_with()
+
+
+def test_record_status_changes_moves_counts_to_the_new_status(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    with _enable_todays_stats(notify_api):
+        record_status_changes([
+            (_notification('delivered'), 'sending'),
+            (_notification('sending'), 'sending'),
+        ])
+
+    cache_key = 'service-service-1-notification-statuses-2018-01-10'
+    assert pipeline.hincrby.call_args_list == [
+        mocker.call(cache_key, 'template-1:sms:normal:sending', -1),
+        mocker.call(cache_key, 'template-1:sms:normal:delivered', 1),
+    ]
+
+
+def test_record_notifications_created_does_nothing_if_todays_stats_are_disabled(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+
+    with set_config_values(notify_api, {'TODAYS_STATS_CACHE_ENABLED': False, 'REDIS_ENABLED': True}):
+        record_notifications_created([_notification('created')])
+
+    assert not client.pipeline.called
+
+
+@freeze_time('2018-01-10 15:00')
+def test_get_todays_stats_for_services_ignores_counts_that_are_not_positive(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+    pipeline.execute.return_value = [
+        {b'template-1:sms:normal:delivered': b'3', b'template-1:sms:normal:sending': b'0', b'reconciled': b'1'},
+        {b'reconciled': b'1'},
+    ]
+
+    stats = get_todays_stats_for_services(['service-1', 'service-2'])
+
+    assert stats == {
+        'service-1': [TodaysStat('template-1', 'sms', 'normal', 'delivered', 3)],
+        'service-2': [],
+    }
+    assert pipeline.hgetall.call_args_list == [
+        mocker.call('service-service-1-notification-statuses-2018-01-10'),
+        mocker.call('service-service-2-notification-statuses-2018-01-10'),
+    ]
+
+
+def test_get_todays_stats_for_services_returns_none_for_services_not_counted_from_the_database(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    client.pipeline.return_value.execute.return_value = [
+        {},
+        {b'template-1:sms:normal:delivered': b'2'},
+        {b'reconciled': b'1'},
+    ]
+
+    assert get_todays_stats_for_services(['missing', 'only-counted-since-lost', 'reconciled']) == {
+        'missing': None,
+        'only-counted-since-lost': None,
+        'reconciled': [],
+    }
+
+
+def test_get_todays_stats_for_services_returns_none_if_redis_fails(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    client.pipeline.return_value.execute.side_effect = Exception('Redis is down')
+
+    assert get_todays_stats_for_services(['service-1']) is None
+
+
+def test_count_by_sums_stats_over_the_other_fields():
+    stats = [
+        TodaysStat('template-1', 'sms', 'normal', 'delivered', 3),
+        TodaysStat('template-2', 'sms', 'team', 'delivered', 2),
+        TodaysStat('template-2', 'sms', 'normal', 'sending', 1),
+    ]
+
+    assert sorted(count_by(stats, 'notification_type', 'status')) == [('sms', 'delivered', 5), ('sms', 'sending', 1)]
+
+
+def test_set_todays_stats_replaces_each_services_hash(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    set_todays_stats(date(2018, 1, 10), [
+        Mock(service_id='service-1', template_id='template-1', notification_type='sms', key_type='normal',
+             status='delivered', count=3),
+    ])
+
+    cache_key = 'service-service-1-notification-statuses-2018-01-10'
+    pipeline.delete.assert_called_once_with(cache_key)
+    pipeline.hset.assert_called_once_with(cache_key, mapping={'template-1:sms:normal:delivered': 3, 'reconciled': 1})
+    pipeline.execute.assert_called_once_with()
+
+
+def test_set_todays_stats_saves_services_without_notifications(notify_api, mocker):
+    client = mocker.patch('app.notifications.todays_stats.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+
+    set_todays_stats(date(2018, 1, 10), [], service_ids=['service-1'])
+
+    pipeline.hset.assert_called_once_with(
+        'service-service-1-notification-statuses-2018-01-10', mapping={'reconciled': 1}
+    )
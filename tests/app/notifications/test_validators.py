@@ -12,6 +12,7 @@ from app.notifications.validators import (
     service_can_send_to_recipient,
     check_sms_content_char_count,
     check_service_over_api_rate_limit,
+    check_rate_limiting,
     validate_and_format_recipient,
     check_service_email_reply_to_id,
     check_service_sms_sender_id,
@@ -24,7 +25,7 @@ from app.v2.errors import (
     TooManyRequestsError,
     RateLimitError)
 
-from tests.conftest import set_config
+from tests.conftest import set_config, set_config_values
 from tests.app.conftest import (
     sample_notification as create_notification,
     sample_service as create_service,
@@ -161,6 +162,16 @@ def test_check_service_message_limit_in_cache_over_message_limit_fails(
         assert not app.notifications.validators.services_dao.mock_calls
 
 
+def test_check_service_message_limit_counts_every_notification_in_a_bulk_request(sample_service, mocker):
+    current_app.config['API_MESSAGE_LIMIT_ENABLED'] = True
+    sample_service.message_limit = 10
+    mocker.patch('app.notifications.validators.redis_store.get', return_value=9)
+
+    check_service_over_daily_message_limit('normal', sample_service, notification_count=1)
+    with pytest.raises(TooManyRequestsError):
+        check_service_over_daily_message_limit('normal', sample_service, notification_count=2)
+
+
 @pytest.mark.parametrize('template_type, notification_type',
                          [(EMAIL_TYPE, EMAIL_TYPE),
                           (SMS_TYPE, SMS_TYPE)])
@@ -353,6 +364,36 @@ def test_that_when_not_exceeded_rate_limit_request_succeeds(
         )
 
 
+@pytest.mark.parametrize('sorted_set_size, expected_error', [
+    (3000, None),
+    (3001, RateLimitError),
+])
+def test_check_service_over_api_rate_limit_counts_every_notification_in_a_bulk_request(
+        notify_api,
+        sample_service,
+        sample_api_key,
+        mocker,
+        sorted_set_size,
+        expected_error,
+):
+    client = mocker.patch('app.notifications.sending_limits.redis_store.redis_store')
+    pipeline = client.pipeline.return_value
+    pipeline.execute.return_value = [5, 0, sorted_set_size, True]
+    exceeded_rate_limit = mocker.patch('app.redis_store.exceeded_rate_limit')
+
+    with set_config(notify_api, 'API_RATE_LIMIT_ENABLED', True):
+        if expected_error:
+            with pytest.raises(expected_error):
+                check_service_over_api_rate_limit(sample_service, sample_api_key, notification_count=5)
+        else:
+            check_service_over_api_rate_limit(sample_service, sample_api_key, notification_count=5)
+
+    (cache_key, members), _ = pipeline.zadd.call_args
+    assert cache_key == '{}-normal'.format(sample_service.id)
+    assert len(members) == 5
+    assert not exceeded_rate_limit.called
+
+
 def test_should_not_rate_limit_if_limiting_is_disabled(
         notify_db,
         notify_db_session,
@@ -370,6 +411,56 @@ def test_should_not_rate_limit_if_limiting_is_disabled(
         assert not app.redis_store.exceeded_rate_limit.called
 
 
+@pytest.mark.parametrize('result, expected_error', [
+    (1, RateLimitError),
+    (2, TooManyRequestsError),
+])
+def test_check_rate_limiting_with_atomic_limits_raises_for_the_exceeded_limit(
+        notify_api,
+        sample_service,
+        sample_api_key,
+        mocker,
+        result,
+        expected_error,
+):
+    consume = mocker.patch('app.notifications.validators.consume_sending_allowance', return_value=(result, 50))
+    exceeded_rate_limit = mocker.patch('app.redis_store.exceeded_rate_limit')
+
+    with set_config_values(notify_api, {
+        'ATOMIC_SENDING_LIMITS_ENABLED': True,
+        'API_RATE_LIMIT_ENABLED': True,
+        'API_MESSAGE_LIMIT_ENABLED': True,
+    }):
+        with pytest.raises(expected_error):
+            check_rate_limiting(sample_service, sample_api_key, notification_count=5)
+
+    consume.assert_called_once_with(
+        sample_service, 'normal', notification_count=5, check_rate_limit=True, check_daily_limit=True
+    )
+    assert not exceeded_rate_limit.called
+
+
+def test_check_service_over_daily_message_limit_with_atomic_limits_only_checks_daily_limit(
+        notify_api,
+        sample_service,
+        mocker,
+):
+    consume = mocker.patch('app.notifications.validators.consume_sending_allowance', return_value=(0, 1))
+    redis_get = mocker.patch('app.notifications.validators.redis_store.get')
+
+    with set_config_values(notify_api, {
+        'ATOMIC_SENDING_LIMITS_ENABLED': True,
+        'API_RATE_LIMIT_ENABLED': True,
+        'API_MESSAGE_LIMIT_ENABLED': True,
+    }):
+        check_service_over_daily_message_limit('normal', sample_service)
+
+    consume.assert_called_once_with(
+        sample_service, 'normal', notification_count=1, check_rate_limit=False, check_daily_limit=True
+    )
+    assert not redis_get.called
+
+
 @pytest.mark.parametrize('key_type', ['test', 'normal'])
 def test_rejects_api_calls_with_international_numbers_if_service_does_not_allow_int_sms(
         key_type,
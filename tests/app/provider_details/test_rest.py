@@ -1,3 +1,5 @@
+from collections import Counter
+
 import pytest
 from flask import json
 from freezegun import freeze_time
@@ -7,6 +9,7 @@ from app.models import ProviderDetails, ProviderDetailsHistory
 
 from tests import create_authorization_header
 from tests.app.db import create_ft_billing
+from tests.conftest import set_config_values
 
 
 def test_get_provider_details_returns_information_about_providers(client, notify_db, mocked_provider_stats, mocker):
@@ -151,3 +154,60 @@ def test_update_provider_should_store_user_id(client, restore_provider_details,
     assert update_resp_1['identifier'] == provider.identifier
     assert not update_resp_1['active']
     assert not provider.active
+
+
+def test_get_provider_delivery_latency_returns_percentiles(client, notify_api, mocker):
+    provider = ProviderDetails.query.filter_by(identifier='mmg').one()
+    get_histogram = mocker.patch(
+        'app.provider_details.rest.get_delivery_latency_histogram',
+        return_value=Counter({'5': 90, '60': 8, '+Inf': 2})
+    )
+
+    with set_config_values(notify_api, {'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': True, 'REDIS_ENABLED': True}):
+        response = client.get(
+            '/provider-details/{}/delivery-latency?minutes=5'.format(provider.id),
+            headers=[create_authorization_header()]
+        )
+
+    assert response.status_code == 200
+    get_histogram.assert_called_once_with('mmg', 5)
+    assert json.loads(response.get_data(as_text=True))['data'] == {
+        'identifier': 'mmg',
+        'minutes': 5,
+        'deliveries': 100,
+        'p50': 5,
+        'p95': 60,
+        'p99': '+Inf',
+        'histogram': {'5': 90, '60': 8, '+Inf': 2},
+    }
+
+
+@pytest.mark.parametrize('config, query_string', [
+    ({'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': False, 'REDIS_ENABLED': True}, ''),
+    ({'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': True, 'REDIS_ENABLED': True}, '?minutes=61'),
+])
+def test_get_provider_delivery_latency_rejects_bad_requests(client, notify_api, mocker, config, query_string):
+    provider = ProviderDetails.query.first()
+    get_histogram = mocker.patch('app.provider_details.rest.get_delivery_latency_histogram')
+
+    with set_config_values(notify_api, config):
+        response = client.get(
+            '/provider-details/{}/delivery-latency{}'.format(provider.id, query_string),
+            headers=[create_authorization_header()]
+        )
+
+    assert response.status_code == 400
+    assert not get_histogram.called
+
+
+def test_get_provider_delivery_latency_returns_404_for_an_unknown_provider(client, notify_api, mocker, fake_uuid):
+    get_histogram = mocker.patch('app.provider_details.rest.get_delivery_latency_histogram')
+
+    with set_config_values(notify_api, {'DELIVERY_LATENCY_HISTOGRAMS_ENABLED': True, 'REDIS_ENABLED': True}):
+        response = client.get(
+            '/provider-details/{}/delivery-latency'.format(fake_uuid),
+            headers=[create_authorization_header()]
+        )
+
+    assert response.status_code == 404
+    assert not get_histogram.called
@@ -8,6 +8,7 @@ import pytest
 from flask import url_for, current_app
 from freezegun import freeze_time
 
+from app.dao import notifications_dao
 from app.dao.organisation_dao import dao_add_service_to_organisation
 from app.dao.service_sms_sender_dao import dao_get_sms_senders_by_service_id
 from app.dao.services_dao import dao_remove_user_from_service
@@ -1741,6 +1742,64 @@ def test_get_notifications_for_service_without_page_count(
     assert resp['notifications'][0]['id'] == str(without_job.id)
 
 
+def test_get_notifications_for_service_older_than_links_to_the_next_page(
+    admin_request,
+    sample_template,
+):
+    oldest = create_notification(sample_template, created_at=datetime.utcnow() - timedelta(minutes=3))
+    middle = create_notification(sample_template, created_at=datetime.utcnow() - timedelta(minutes=2))
+    newer = create_notification(sample_template, created_at=datetime.utcnow() - timedelta(minutes=1))
+    create_notification(sample_template)
+
+    resp = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        page_size=2,
+        older_than=newer.id,
+        count_pages=False
+    )
+
+    assert [n['id'] for n in resp['notifications']] == [str(middle.id), str(oldest.id)]
+    assert resp['total'] is None
+    assert 'older_than={}'.format(oldest.id) in resp['links']['next']
+    assert 'prev' not in resp['links']
+
+
+def test_get_notifications_for_service_older_than_does_not_count_by_default(admin_request, sample_template, mocker):
+    newer = create_notification(sample_template)
+    get_notifications = mocker.spy(notifications_dao, 'get_notifications_for_service')
+
+    resp = admin_request.get(
+        'service.get_all_notifications_for_service',
+        service_id=sample_template.service_id,
+        older_than=newer.id
+    )
+
+    assert resp['total'] is None
+    assert get_notifications.call_args[1]['count_pages'] is False
+
+
+def test_get_notifications_for_service_older_than_keeps_repeated_filters_in_the_next_link(
+    client, sample_template
+):
+    now = datetime.utcnow()
+    create_notification(sample_template, status='delivered', created_at=now - timedelta(minutes=3))
+    middle = create_notification(sample_template, status='failed', created_at=now - timedelta(minutes=2))
+    newer = create_notification(sample_template, status='delivered', created_at=now - timedelta(minutes=1))
+
+    response = client.get(
+        '/service/{}/notifications?status=delivered&status=failed&page_size=1&older_than={}'.format(
+            sample_template.service_id, newer.id
+        ),
+        headers=[create_authorization_header()]
+    )
+
+    next_link = json.loads(response.get_data(as_text=True))['links']['next']
+    assert 'status=delivered' in next_link
+    assert 'status=failed' in next_link
+    assert 'older_than={}'.format(middle.id) in next_link
+
+
 @pytest.mark.parametrize('should_prefix', [
     True,
     False,
@@ -2068,6 +2127,44 @@ def test_search_for_notification_by_to_field_return_multiple_matches(client, not
     assert str(notification4.id) not in notification_ids
 
 
+def test_search_for_notification_by_to_field_returns_next_link_for_a_full_page(client, sample_template):
+    for _ in range(3):
+        notification = create_notification(
+            template=sample_template, to_field='+16502532222', normalised_to='+16502532222'
+        )
+
+    response = client.get(
+        '/service/{}/notifications?to={}&template_type={}&page_size=2'.format(
+            notification.service_id, '+16502532222', 'sms'
+        ),
+        headers=[create_authorization_header()]
+    )
+    json_response = json.loads(response.get_data(as_text=True))
+
+    assert response.status_code == 200
+    assert len(json_response['notifications']) == 2
+    assert 'older_than={}'.format(json_response['notifications'][-1]['id']) in json_response['links']['next']
+
+
+def test_search_for_notification_by_to_field_keeps_every_status_in_the_next_link(client, sample_template):
+    for _ in range(2):
+        notification = create_notification(
+            template=sample_template, to_field='+16502532222', normalised_to='+16502532222', status='delivered'
+        )
+
+    response = client.get(
+        '/service/{}/notifications?to={}&template_type=sms&status=delivered&status=sending&page_size=2'.format(
+            notification.service_id, '+16502532222'
+        ),
+        headers=[create_authorization_header()]
+    )
+    json_response = json.loads(response.get_data(as_text=True))
+
+    assert response.status_code == 200
+    assert 'status=delivered' in json_response['links']['next']
+    assert 'status=sending' in json_response['links']['next']
+
+
 def test_search_for_notification_by_to_field_return_400_for_letter_type(
         client, notify_db, notify_db_session, sample_service
 ):
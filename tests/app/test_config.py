@@ -58,13 +58,15 @@ def test_load_config_if_cloudfoundry_not_available(monkeypatch, reload_config):
 def test_queue_names_all_queues_correct():
     # Need to ensure that all_queues() only returns queue names used in API
     queues = QueueNames.all_queues()
-    assert len(queues) == 11
+    assert len(queues) == 13
     assert set([
         QueueNames.PRIORITY,
         QueueNames.PERIODIC,
         QueueNames.DATABASE,
         QueueNames.SEND_SMS,
         QueueNames.SEND_EMAIL,
+        QueueNames.BULK_SMS,
+        QueueNames.BULK_EMAIL,
         QueueNames.RESEARCH_MODE,
         QueueNames.REPORTING,
         QueueNames.JOBS,
@@ -3,6 +3,7 @@ import pytest
 from flask import json, url_for
 
 from app import DATETIME_FORMAT
+from app.dao.notifications_dao import get_notifications_for_service
 from tests import create_authorization_header
 from tests.app.db import (
     create_notification,
@@ -607,6 +608,20 @@ def test_get_all_notifications_filter_multiple_query_parameters(client, sample_e
     assert json_response['notifications'][0]['id'] == str(older_notification.id)
 
 
+def test_get_all_notifications_does_not_count_notifications(client, sample_template, mocker):
+    create_notification(template=sample_template)
+    dao_mock = mocker.patch(
+        'app.v2.notifications.get_notifications.notifications_dao.get_notifications_for_service',
+        wraps=get_notifications_for_service
+    )
+
+    auth_header = create_authorization_header(service_id=sample_template.service_id)
+    response = client.get(path='/v2/notifications', headers=[('Content-Type', 'application/json'), auth_header])
+
+    assert response.status_code == 200
+    assert dao_mock.call_args[1]['count_pages'] is False
+
+
 def test_get_all_notifications_renames_letter_statuses(
     client,
     sample_letter_notification,
@@ -18,8 +18,9 @@ from flask import json, current_app
 from app.models import Notification
 from app.schema_validation import validate
 from app.v2.errors import RateLimitError
-from app.v2.notifications.notification_schemas import post_sms_response, post_email_response
+from app.v2.notifications.notification_schemas import post_bulk_response, post_sms_response, post_email_response
 from tests import create_authorization_header
+from tests.conftest import set_config
 
 from tests.app.db import (
     create_service,
@@ -871,3 +872,225 @@ def test_post_notification_returns_400_when_get_json_throws_exception(client, sa
         data="[",
         headers=[('Content-Type', 'application/json'), auth_header])
     assert response.status_code == 400
+
+
+def _post_bulk(client, service_id, notification_type, data):
+    return client.post(
+        path='/v2/notifications/{}/bulk'.format(notification_type),
+        data=json.dumps(data),
+        headers=[('Content-Type', 'application/json'), create_authorization_header(service_id=service_id)])
+
+
+def test_post_bulk_sms_notifications_returns_201_and_persists_all_rows(
+    client, sample_template_with_placeholders, mocker
+):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    data = {
+        'template_id': str(sample_template_with_placeholders.id),
+        'recipients': [
+            {'phone_number': '+16502532222', 'personalisation': {' Name': 'Jo'}, 'reference': 'first'},
+            {'phone_number': '+16502532223', 'personalisation': {' Name': 'Sam'}},
+        ]
+    }
+
+    response = _post_bulk(client, sample_template_with_placeholders.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 201
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert validate(resp_json, post_bulk_response) == resp_json
+    assert resp_json['errors'] == []
+    assert [row['row'] for row in resp_json['notifications']] == [0, 1]
+    assert [row['reference'] for row in resp_json['notifications']] == ['first', None]
+
+    notifications = {str(n.id): n for n in Notification.query.all()}
+    assert len(notifications) == 2
+    assert notifications[resp_json['notifications'][0]['id']].to == '+16502532222'
+    assert notifications[resp_json['notifications'][0]['id']].personalisation == {' Name': 'Jo'}
+    assert notifications[resp_json['notifications'][1]['id']].to == '+16502532223'
+    assert all(n.status == NOTIFICATION_CREATED for n in notifications.values())
+    assert mocked.call_args_list == [
+        mocker.call([row['id']], queue='send-sms-tasks') for row in resp_json['notifications']
+    ]
+
+
+def test_post_bulk_email_notifications_returns_errors_for_invalid_rows(client, sample_email_template_with_placeholders,
+                                                                       mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_email.apply_async')
+    data = {
+        'template_id': str(sample_email_template_with_placeholders.id),
+        'recipients': [
+            {'email_address': 'not-an-email', 'personalisation': {'name': 'Jo'}},
+            {'email_address': 'jo@example.com', 'personalisation': {'name': 'Jo'}},
+            {'email_address': 'sam@example.com'},
+        ]
+    }
+
+    response = _post_bulk(client, sample_email_template_with_placeholders.service_id, EMAIL_TYPE, data)
+
+    assert response.status_code == 201
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert validate(resp_json, post_bulk_response) == resp_json
+    assert [row['row'] for row in resp_json['notifications']] == [1]
+    assert [(error['row'], error['error']) for error in resp_json['errors']] == [
+        (0, 'InvalidEmailError'),
+        (2, 'BadRequestError'),
+    ]
+    assert resp_json['errors'][1]['message'] == 'Missing personalisation: name'
+    notification = Notification.query.one()
+    assert str(notification.id) == resp_json['notifications'][0]['id']
+    mocked.assert_called_once_with([str(notification.id)], queue='send-email-tasks')
+
+
+def test_post_bulk_sms_notifications_returns_400_if_every_row_is_invalid(client, sample_template, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [{'phone_number': 'not a number'}]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 400
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert resp_json['notifications'] == []
+    assert resp_json['errors'][0]['row'] == 0
+    assert Notification.query.count() == 0
+    assert not mocked.called
+
+
+def test_post_bulk_sms_notifications_does_not_persist_simulated_recipients(client, sample_template, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [{'phone_number': '+16132532222'}, {'phone_number': '+16502532222'}]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 201
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert [(row['row'], row['queued']) for row in resp_json['notifications']] == [(0, False), (1, True)]
+    notification = Notification.query.one()
+    assert str(notification.id) == resp_json['notifications'][1]['id']
+    mocked.assert_called_once_with([str(notification.id)], queue='send-sms-tasks')
+
+
+def test_post_bulk_notifications_only_uses_up_the_allowance_for_the_rows_it_saves(client, sample_template, mocker):
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    check_rate_limiting = mocker.patch('app.v2.notifications.post_notifications.check_rate_limiting')
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [
+            {'phone_number': 'not a number'},
+            {'phone_number': '+16132532222'},
+            {'phone_number': '+16502532222'},
+        ]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 201
+    assert check_rate_limiting.call_args[1] == {'notification_count': 1}
+
+
+def test_post_bulk_notifications_does_not_use_up_the_allowance_if_every_row_is_invalid(
+    client, sample_template, mocker
+):
+    check_rate_limiting = mocker.patch('app.v2.notifications.post_notifications.check_rate_limiting')
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [{'phone_number': 'not a number'}]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 400
+    assert not check_rate_limiting.called
+
+
+def test_post_bulk_notifications_deletes_and_reports_the_rows_it_could_not_queue(client, sample_template, mocker):
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async', side_effect=[None, Exception('SQS is down')])
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [
+            {'phone_number': '+16132532222'},
+            {'phone_number': '+16502532222'},
+            {'phone_number': '+16502532223'},
+            {'phone_number': '+16502532224'},
+        ]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 201
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert validate(resp_json, post_bulk_response) == resp_json
+    assert [(row['row'], row['queued']) for row in resp_json['notifications']] == [(0, False), (1, True)]
+    assert [(error['row'], error['error']) for error in resp_json['errors']] == [(2, 'QueueError'), (3, 'QueueError')]
+    assert str(Notification.query.one().id) == resp_json['notifications'][1]['id']
+
+
+def test_post_bulk_notifications_returns_500_if_no_row_could_be_queued(client, sample_template, mocker):
+    mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async', side_effect=Exception('SQS is down'))
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [{'phone_number': '+16502532222'}]
+    }
+
+    response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 500
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert resp_json['notifications'] == []
+    assert resp_json['errors'][0]['error'] == 'QueueError'
+    assert Notification.query.count() == 0
+
+
+def test_post_bulk_notifications_rejects_too_many_recipients(notify_api, client, sample_template, mocker):
+    mocked = mocker.patch('app.celery.provider_tasks.deliver_sms.apply_async')
+    data = {
+        'template_id': str(sample_template.id),
+        'recipients': [{'phone_number': '+16502532222'}] * 3
+    }
+
+    with set_config(notify_api, 'BULK_NOTIFICATIONS_MAX_RECIPIENTS', 2):
+        response = _post_bulk(client, sample_template.service_id, SMS_TYPE, data)
+
+    assert response.status_code == 400
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert resp_json['errors'] == [
+        {'error': 'BadRequestError', 'message': 'Too many recipients: a request can contain at most 2'}
+    ]
+    assert Notification.query.count() == 0
+    assert not mocked.called
+
+
+@pytest.mark.parametrize('notification_type, template_type', [
+    (SMS_TYPE, EMAIL_TYPE),
+    (EMAIL_TYPE, SMS_TYPE),
+])
+def test_post_bulk_notifications_rejects_template_of_wrong_type(client, notify_db_session, notification_type,
+                                                                template_type):
+    service = create_service()
+    template = create_template(service=service, template_type=template_type)
+    recipient = {'phone_number': '+16502532222'} if notification_type == SMS_TYPE else {'email_address': 'a@b.com'}
+
+    response = _post_bulk(client, service.id, notification_type, {
+        'template_id': str(template.id),
+        'recipients': [recipient]
+    })
+
+    assert response.status_code == 400
+    resp_json = json.loads(response.get_data(as_text=True))
+    assert resp_json['errors'][0]['message'] == '{} template is not suitable for {} notification'.format(
+        template_type, notification_type
+    )
+
+
+def test_post_bulk_letter_notifications_is_not_found(client, sample_letter_template):
+    response = _post_bulk(client, sample_letter_template.service_id, 'letter', {
+        'template_id': str(sample_letter_template.id),
+        'recipients': [{'address_line_1': 'foo'}]
+    })
+
+    assert response.status_code == 404